@@ -0,0 +1,270 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import NamedTuple
+
+from starlette.datastructures import QueryParams
+from starlette.routing import Match
+
+from fast_json import dumps
+
+# Adaptive concurrency limits per route class. On an F1 instance a few full-collection reads
+# can take all the CPU and Firestore workers, so requests are admitted per class (cheap reads,
+# writes, full scans) up to a limit that follows observed latency with AIMD: it grows by about
+# one per limit's worth of fast responses while the class is busy and is cut by
+# ADMISSION_BACKOFF when a response is slower than the class's latency target or fails. A slow
+# response cuts the lowest priority class that has requests in flight first, so scans give way
+# to reads and reads to writes (checkout). Long-running exports and streams have their own class
+# below scans, so they do not hold the slots of dashboard reads. Requests over the limit wait up
+# to the class's max_wait_ms for a slot and are then answered 503 with Retry-After.
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "false").lower() == "true"
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+
+READ = "read"
+WRITE = "write"
+SCAN = "scan"
+EXPORT = "export"
+# Not limited, e.g. long-lived event streams and health checks
+EXEMPT = "exempt"
+
+
+class RouteClassLimits(NamedTuple):
+    initial_limit: int
+    min_limit: int
+    max_limit: int
+    latency_target_ms: float
+    max_wait_ms: float
+    retry_after_seconds: int
+
+
+# Highest priority first
+ROUTE_CLASS_LIMITS = {
+    WRITE: RouteClassLimits(8, 2, 32, float(os.getenv("ADMISSION_WRITE_TARGET_MS", "500")), 100, 1),
+    READ: RouteClassLimits(8, 2, 32, float(os.getenv("ADMISSION_READ_TARGET_MS", "300")), 50, 1),
+    SCAN: RouteClassLimits(2, 1, 4, float(os.getenv("ADMISSION_SCAN_TARGET_MS", "5000")), 0, 5),
+    EXPORT: RouteClassLimits(2, 1, 4, float(os.getenv("ADMISSION_EXPORT_TARGET_MS", "5000")), 0, 30),
+}
+
+
+def route_class(name):
+    """
+    Put a route handler in a route class; routes without one are READ for GET and HEAD, else WRITE.
+
+    Args:
+    - name: The route class, or a function of the request's ``QueryParams`` returning it, for
+      routes whose cost depends on the request.
+    """
+    def decorator(endpoint):
+        endpoint.route_class = name
+        return endpoint
+
+    return decorator
+
+
+def _is_true(value) -> bool:
+    # The values pydantic parses as True for a bool query parameter
+    return value is not None and value.lower() in ("1", "on", "t", "true", "y", "yes")
+
+
+def paged_route_class(query_params: QueryParams) -> str:
+    """
+    Route class of list endpoints: a streamed list (``stream=true``) is an EXPORT, a page
+    (``limit``/``page_token``) a READ and the full list a SCAN.
+    """
+    if _is_true(query_params.get("stream")):
+        return EXPORT
+    if query_params.get("limit") or query_params.get("page_token"):
+        return READ
+    return SCAN
+
+
+class AdaptiveLimit:
+    def __init__(self, limits: RouteClassLimits):
+        self.limits = limits
+        self.limit = float(limits.initial_limit)
+        self.in_flight = 0
+        self.waiters = deque()
+        self.last_decrease = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.decreases = 0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def increase(self):
+        # Only grow while the limit is in use, so an idle class does not build up headroom
+        if self.in_flight * 2 >= self.limit:
+            self.limit = min(self.limits.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self, now: float):
+        self.limit = max(self.limits.min_limit, self.limit * ADMISSION_BACKOFF)
+        self.last_decrease = now
+        self.decreases += 1
+
+
+class AdmissionController:
+    """
+    Per route class concurrency limits, adapted with AIMD. Runs on the event loop only.
+
+    Args:
+    - route_class_limits (dict): Limits per route class, highest priority first.
+    """
+
+    def __init__(self, route_class_limits: dict = ROUTE_CLASS_LIMITS):
+        self.classes = {name: AdaptiveLimit(limits) for name, limits in route_class_limits.items()}
+
+    async def acquire(self, name: str) -> bool:
+        """
+        Take a slot of the route class, waiting up to its ``max_wait_ms``.
+
+        Returns:
+        - bool: False if the request should be shed.
+        """
+        limit = self.classes[name]
+        if limit.has_capacity() and not limit.waiters:
+            limit.in_flight += 1
+            limit.admitted += 1
+            return True
+        if not limit.limits.max_wait_ms or len(limit.waiters) >= int(limit.limit):
+            limit.shed += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        limit.waiters.append(waiter)
+        timeout = asyncio.get_running_loop().call_later(
+            limit.limits.max_wait_ms / 1000, lambda: waiter.done() or waiter.set_result(False))
+        try:
+            admitted = await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                # The slot was handed over just as the request went away
+                limit.in_flight -= 1
+                self._wake(limit)
+            raise
+        finally:
+            timeout.cancel()
+        if admitted:
+            limit.admitted += 1
+        else:
+            limit.shed += 1
+            if waiter in limit.waiters:
+                limit.waiters.remove(waiter)
+        return admitted
+
+    def release(self, name: str, started: float, latency_ms: float, failed: bool = False):
+        """
+        Give back the slot of a request admitted at ``started`` (``time.monotonic()``) and adapt
+        the limits to its latency.
+        """
+        limit = self.classes[name]
+        limit.in_flight -= 1
+        if failed or latency_ms > limit.limits.latency_target_ms:
+            victim = self._shed_victim(name)
+            # Requests admitted before the last cut already count towards it
+            if started >= victim.last_decrease:
+                victim.decrease(time.monotonic())
+        else:
+            limit.increase()
+        self._wake(limit)
+
+    def _shed_victim(self, name: str) -> AdaptiveLimit:
+        # The lowest priority class down to this one that is busy and can still shrink
+        names = list(self.classes)
+        for candidate in reversed(names[names.index(name):]):
+            limit = self.classes[candidate]
+            if limit.in_flight and limit.limit > limit.limits.min_limit:
+                return limit
+        return self.classes[name]
+
+    @staticmethod
+    def _wake(limit: AdaptiveLimit):
+        while limit.waiters and limit.has_capacity():
+            waiter = limit.waiters.popleft()
+            if not waiter.done():
+                limit.in_flight += 1
+                waiter.set_result(True)
+
+    def render(self) -> str:
+        """
+        Render the admission metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric, kind, value in (("admission_limit", "gauge", lambda limit: f"{limit.limit:.2f}"),
+                                    ("admission_in_flight", "gauge", lambda limit: limit.in_flight),
+                                    ("admission_admitted_total", "counter", lambda limit: limit.admitted),
+                                    ("admission_shed_total", "counter", lambda limit: limit.shed),
+                                    ("admission_limit_decreases_total", "counter", lambda limit: limit.decreases)):
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, limit in self.classes.items():
+                lines.append(f'{metric}{{route_class="{name}"}} {value(limit)}')
+        return "\n".join(lines) + "\n"
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware admitting requests through ``admission_controller`` by route class and
+    answering shed requests with 503 and Retry-After. Latency is measured to the start of the
+    response, so streamed responses are judged by how fast they start; the slot is held until
+    the response is complete.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+        self._route_classes = {}
+
+    def _route_class(self, scope) -> str:
+        endpoint = None
+        for route in scope["app"].routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                endpoint = child_scope.get("endpoint")
+                break
+        name = self._route_classes.get(endpoint)
+        if name is None:
+            name = getattr(endpoint, "route_class", None) or (READ if scope["method"] in ("GET", "HEAD") else WRITE)
+            if endpoint is not None:
+                self._route_classes[endpoint] = name
+        if callable(name):
+            return name(QueryParams(scope["query_string"]))
+        return name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = self._route_class(scope)
+        if name == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(name):
+            body = dumps({"detail": "Server is busy, please retry"})
+            retry_after = self.controller.classes[name].limits.retry_after_seconds
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"retry-after", str(retry_after).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.monotonic()
+        first_byte = None
+        status_code = 500
+
+        async def send_timed(message):
+            nonlocal first_byte, status_code
+            if message["type"] == "http.response.start":
+                first_byte = time.monotonic()
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            latency_ms = ((first_byte or time.monotonic()) - started) * 1000
+            self.controller.release(name, started, latency_ms, failed=status_code >= 500)
@@ -0,0 +1,81 @@
+"""
+Per-request dependency-resolution overhead of the controller providers.
+
+Compares the previous provider shape (``Depends(get_firestore_client)`` plus a new controller
+per request) with process-scoped controllers from ``ControllerContainer``, on otherwise
+identical no-op routes served through the ASGI app.
+
+Run from the repository root:
+
+    python -m benchmarks.dependency_resolution
+"""
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+
+from benchmarks.endpoints import asgi_request
+from controller_container import ControllerContainer
+from firestore_client import get_firestore_db
+
+REQUESTS = 5000
+COLLECTIONS = ("Orders", "Products", "ProductRequest", "AddNewStock", "riders")
+
+
+class SampleController:
+    # Stands in for a feature controller that sets up its collection references once
+    def __init__(self, firestore_db):
+        self.firestore_db = firestore_db
+        self.collections = {name: firestore_db.collection(name) for name in COLLECTIONS}
+
+    def ping(self):
+        return {"collections": len(self.collections)}
+
+
+container = ControllerContainer()
+
+
+def get_firestore_client():
+    return get_firestore_db()
+
+
+def get_controller_per_request(firestore_client=Depends(get_firestore_client)) -> SampleController:
+    return SampleController(firestore_db=firestore_client)
+
+
+def get_controller_from_container() -> SampleController:
+    return container.get(SampleController)
+
+
+app = FastAPI()
+
+
+@app.get("/per-request")
+async def per_request(controller: SampleController = Depends(get_controller_per_request)):
+    return controller.ping()
+
+
+@app.get("/container")
+async def from_container(controller: SampleController = Depends(get_controller_from_container)):
+    return controller.ping()
+
+
+async def measure(path):
+    for _ in range(100):
+        await asgi_request(app, "GET", path)
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await asgi_request(app, "GET", path)
+    return (time.perf_counter() - started) / REQUESTS * 1e6
+
+
+async def run():
+    per_request_us = await measure("/per-request")
+    container_us = await measure("/container")
+    print(f"new controller per request: {per_request_us:7.1f} us/request")
+    print(f"process-scoped controller:  {container_us:7.1f} us/request")
+    print(f"saved per request:          {per_request_us - container_us:7.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,191 @@
+"""
+Endpoint benchmark suite running main.py against the in-memory Firestore stand-in.
+
+For each collection size it seeds Orders, Products, ProductRequest and riders, then drives
+order, stock intake and catalog routes through the ASGI app with a fixed concurrency and
+reports throughput, p50/p99 latency and Firestore documents read/written per request.
+
+Run from the repository root:
+
+    python -m benchmarks.endpoints --sizes 1000,100000 --requests 200 --concurrency 8 --latency-ms 5
+
+1M documents needs a few GB of memory for the stand-in.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+SUB_CATEGORIES = 100
+RIDERS = 50
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def asgi_request(app, method, url, body=None):
+    parts = urlsplit(url)
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "headers": [(b"host", b"benchmark"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    received = False
+    response = {"status": None}
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await app(scope, receive, send)
+    return response["status"]
+
+
+def seed(firestore_db, size, order_statuses):
+    now = datetime.now(timezone.utc)
+    firestore_db.seed("riders", {f"rider{i}": {"rider_id": f"rider{i}", "name": f"Rider {i}"} for i in range(RIDERS)})
+    firestore_db.seed("Orders", {
+        f"order{i:08d}": {
+            "order_id": f"order{i:08d}",
+            "user_id": f"user{i % 1000}",
+            "order_status": order_statuses[i % len(order_statuses)],
+            "rider_id": f"rider{i % RIDERS}",
+            "modified_timestamp": now - timedelta(seconds=i),
+            "refunds": [],
+        } for i in range(size)})
+    firestore_db.seed("Products", {
+        f"product{i:08d}": {
+            "product_id": f"product{i:08d}",
+            "sub_category_id": f"sub{i % SUB_CATEGORIES}",
+            "current_inventory": random.randrange(0, 300),
+        } for i in range(size)})
+    firestore_db.seed("ProductRequest", {
+        f"request{i:08d}": {
+            "request_id": f"request{i:08d}",
+            "product_id": f"product{i:08d}",
+            "product_unit_request": 10,
+            "status": "pending",
+        } for i in range(size)})
+
+
+def scenarios(size, order_statuses):
+    def order_id():
+        return f"order{random.randrange(size):08d}"
+
+    return {
+        "orders: GET /orders/{id}": lambda: ("GET", f"/orders/{order_id()}", None),
+        "orders: GET /orders/?limit=50": lambda: ("GET", "/orders/?limit=50", None),
+        "orders: GET /get_orders_by_status": lambda: (
+            "GET", f"/get_orders_by_status?status={random.choice(order_statuses)}&limit=50", None),
+        "orders: POST /orders/batch (30)": lambda: ("POST", "/orders/batch", [order_id() for _ in range(30)]),
+        "orders: GET /order_status_count": lambda: ("GET", "/order_status_count", None),
+        "stock: POST /add-new-stock-updation": lambda: ("POST", "/add-new-stock-updation", {
+            "product_id": f"product{random.randrange(size):08d}",
+            "request_id": f"request{random.randrange(size):08d}",
+            "add_new_stock_units": 10}),
+        "catalog: GET /get_products_based/{sub}": lambda: (
+            "GET", f"/get_products_based/sub{random.randrange(SUB_CATEGORIES)}", None),
+        "catalog: GET /products_inventory_range/": lambda: (
+            "GET", "/products_inventory_range/?inventory_range=0-100&limit=50", None),
+    }
+
+
+async def run_scenario(app, firestore_db, make_request, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        method, url, body = make_request()
+        async with semaphore:
+            started = time.perf_counter()
+            status_code = await asgi_request(app, method, url, body)
+            latencies.append(time.perf_counter() - started)
+            if status_code >= 500:
+                errors += 1
+
+    firestore_db.stats.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stats = firestore_db.stats.snapshot()
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "reads_per_request": stats["documents_read"] / requests,
+        "writes_per_request": stats["documents_written"] / requests,
+        "errors": errors,
+    }
+
+
+async def run(sizes, requests, concurrency, latency_ms):
+    import main
+    from firestore_client import get_firestore_db
+    from order_counters import rebuild_status_counts
+    from orders.models.orders_model import OrderStatus
+
+    order_statuses = [order_status.value for order_status in OrderStatus]
+    firestore_db = get_firestore_db()
+    firestore_db.latency_ms = latency_ms
+    await main.app.router.startup()
+    try:
+        for size in sizes:
+            firestore_db._collections.clear()
+            main.catalog_cache.clear()
+            seed(firestore_db, size, order_statuses)
+            rebuild_status_counts(firestore_db)
+            print(f"\n{size} documents per collection, {requests} requests, concurrency {concurrency}, "
+                  f"{latency_ms} ms per RPC")
+            print(f"{'scenario':<42} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'reads/req':>10} "
+                  f"{'writes/req':>10} {'5xx':>5}")
+            for name, make_request in scenarios(size, order_statuses).items():
+                result = await run_scenario(main.app, firestore_db, make_request, requests, concurrency)
+                print(f"{name:<42} {result['throughput']:8.1f} {result['p50_ms']:8.1f} {result['p99_ms']:8.1f} "
+                      f"{result['reads_per_request']:10.1f} {result['writes_per_request']:10.1f} "
+                      f"{result['errors']:5d}")
+    finally:
+        await main.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000", help="comma separated documents per collection")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="latency injected per Firestore RPC")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    asyncio.run(run(sizes, args.requests, args.concurrency, args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Concurrency benchmark for blocking Firestore calls inside ``async def`` handlers.
+
+One slow query (``SLOW_QUERY_SECONDS``) is put in flight, then a burst of fast requests
+(``FAST_QUERY_SECONDS`` each) arrives. The Firestore round trip is simulated with
+``time.sleep`` so the benchmark runs without credentials.
+
+Run from the repository root:
+
+    python -m benchmarks.event_loop_blocking
+"""
+import asyncio
+import statistics
+import time
+
+from firestore_executor import run_firestore
+
+SLOW_QUERY_SECONDS = 1.0
+FAST_QUERY_SECONDS = 0.01
+FAST_REQUESTS = 50
+
+
+def blocking_query(seconds):
+    time.sleep(seconds)
+
+
+async def inline_handler(seconds):
+    blocking_query(seconds)
+
+
+async def executor_handler(seconds):
+    await run_firestore(blocking_query, seconds)
+
+
+async def timed(handler, seconds, arrived):
+    await handler(seconds)
+    return time.perf_counter() - arrived
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(handler):
+    slow = asyncio.ensure_future(handler(SLOW_QUERY_SECONDS))
+    arrived = time.perf_counter()
+    fast = [asyncio.ensure_future(timed(handler, FAST_QUERY_SECONDS, arrived)) for _ in range(FAST_REQUESTS)]
+    latencies = await asyncio.gather(*fast)
+    await slow
+    return latencies
+
+
+def main():
+    for name, handler in (("blocking in event loop", inline_handler), ("bounded executor", executor_handler)):
+        latencies = asyncio.run(run_scenario(handler))
+        print(f"{name:<24} p50={statistics.median(latencies) * 1000:8.1f} ms  "
+              f"p99={percentile(latencies, 99) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Checkout latency while full-collection reads overload the app, with and without admission control.
+
+Seeds ``--orders`` orders into the in-memory stand-in, then for ``--seconds`` runs
+``--scan-clients`` clients looping on ``GET /orders/`` (a full scan) next to
+``--checkout-clients`` clients looping on ``POST /orders``. Clients back off for the Retry-After
+of a 503. Reported per mode: checkout p50/p99 latency and throughput, scans completed, and
+requests shed per route class.
+
+Run from the repository root:
+
+    python -m benchmarks.load_shedding --orders 20000 --scan-clients 8 --checkout-clients 8 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+import main as app_main  # noqa: E402
+from admission_control import AdmissionControlMiddleware, AdmissionController  # noqa: E402
+from benchmarks.endpoints import asgi_request, percentile, seed  # noqa: E402
+from firestore_client import get_firestore_db  # noqa: E402
+from orders.models.orders_model import OrderStatus  # noqa: E402
+
+CHECKOUT_ORDER = {"user_id": "checkout", "order_status": OrderStatus.PENDING.value}
+
+
+async def run_mode(name, app, seconds, scan_clients, checkout_clients, retry_after_seconds):
+    deadline = time.perf_counter() + seconds
+    checkout_latencies = []
+    outcomes = Counter()
+
+    async def client(kind, method, path, body):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await asgi_request(app, method, path, body)
+            outcomes[(kind, status)] += 1
+            if kind == "checkout" and status == 200:
+                checkout_latencies.append((time.perf_counter() - started) * 1000)
+            if status == 503:
+                await asyncio.sleep(retry_after_seconds)
+
+    await asyncio.gather(*[client("scan", "GET", "/orders/", None) for _ in range(scan_clients)],
+                         *[client("checkout", "POST", "/orders", CHECKOUT_ORDER) for _ in range(checkout_clients)])
+    print(f"{name:<20} {len(checkout_latencies) / seconds:10.1f} {percentile(checkout_latencies, 50):8.1f} "
+          f"{percentile(checkout_latencies, 99):8.1f} {outcomes[('scan', 200)]:6d} "
+          f"{outcomes[('scan', 503)]:11d} {outcomes[('checkout', 503)]:15d}")
+
+
+async def run(args):
+    firestore_db = get_firestore_db()
+    seed(firestore_db, args.orders, [status.value for status in OrderStatus])
+    firestore_db.latency_ms = args.latency_ms
+    controller = AdmissionController()
+    guarded = AdmissionControlMiddleware(app_main.app, controller)
+
+    async def guarded_app(scope, receive, send):
+        # Starlette sets scope["app"] itself, but this middleware wraps the app from the outside
+        scope["app"] = app_main.app
+        await guarded(scope, receive, send)
+
+    print(f"{args.orders} orders, {args.scan_clients} scan clients, {args.checkout_clients} checkout clients, "
+          f"{args.seconds:.0f} s per mode, {args.latency_ms} ms per RPC")
+    print(f"{'mode':<20} {'checkout/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'scans':>6} {'scans shed':>11} "
+          f"{'checkouts shed':>15}")
+    await run_mode("unlimited", app_main.app, args.seconds, args.scan_clients, args.checkout_clients, 0)
+    await run_mode("admission control", guarded_app, args.seconds, args.scan_clients, args.checkout_clients,
+                   args.retry_after_seconds)
+    print(controller.render())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--scan-clients", type=int, default=8)
+    parser.add_argument("--checkout-clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="per RPC latency of the in-memory stand-in")
+    parser.add_argument("--retry-after-seconds", type=float, default=0.5,
+                        help="back-off of shed clients, shorter than Retry-After to keep the pressure up")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
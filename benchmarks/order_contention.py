@@ -0,0 +1,140 @@
+"""
+Contention benchmark for rider pickups: the former transactional pickup against the guarded
+transition in ``order_transitions``.
+
+For each of ``--orders`` pending orders, ``--riders`` riders try to pick it up at the same time.
+Reported per implementation: p50/p99 pickup latency, Firestore RPCs per pickup, and the
+correctness checks: exactly one rider wins each order, the other pickups are refused (409 for
+the guarded transition), and the delivered status counter matches the number of orders.
+"guarded + view" serves the first read from a running order status view.
+
+Run from the repository root:
+
+    python -m benchmarks.order_contention --orders 200 --riders 8 --latency-ms 5
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+from fastapi import HTTPException  # noqa: E402
+from firebase_admin import firestore  # noqa: E402
+
+from daily_rollups import record_order_transition  # noqa: E402
+from main import pickup_plan  # noqa: E402
+from memory_firestore import MemoryFirestore  # noqa: E402
+from order_counters import read_status_counts, record_status_change  # noqa: E402
+import order_transitions  # noqa: E402
+from order_transitions import transition_order  # noqa: E402
+from order_views import OrderStatusView  # noqa: E402
+from orders.models.orders_model import OrderStatus  # noqa: E402
+
+
+@firestore.transactional
+def transactional_pickup(transaction, firestore_db, order_ref, rider_id: str):
+    # pickup_order as it was before guarded transitions
+    order_doc = order_ref.get(transaction=transaction)
+    if not order_doc.exists:
+        raise HTTPException(status_code=404, detail="Order not found")
+    order_data = order_doc.to_dict()
+    if order_data['order_status'] != OrderStatus.PENDING.value:
+        raise HTTPException(status_code=400, detail="Order is not in progress")
+    transaction.update(order_ref, {'order_status': OrderStatus.DELIVERED.value, 'rider_id': rider_id})
+    record_status_change(firestore_db, transaction, OrderStatus.PENDING, OrderStatus.DELIVERED)
+    record_order_transition(firestore_db, transaction, order_data, OrderStatus.PENDING, OrderStatus.DELIVERED)
+
+
+def pickup_with_transaction(firestore_db, order_id, rider_id):
+    order_ref = firestore_db.collection("Orders").document(order_id)
+    transactional_pickup(firestore_db.transaction(), firestore_db, order_ref, rider_id)
+
+
+def pickup_with_transition(firestore_db, order_id, rider_id):
+    transition_order(firestore_db, order_id, pickup_plan(rider_id))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(name, pickup, orders, riders, latency_ms, with_view=False):
+    firestore_db = MemoryFirestore()
+    now = datetime.now(timezone.utc)
+    order_ids = [f"order-{index:06d}" for index in range(orders)]
+    firestore_db.seed("Orders", {order_id: {"order_id": order_id, "user_id": "user",
+                                            "order_status": OrderStatus.PENDING.value, "modified_timestamp": now}
+                                 for order_id in order_ids})
+    view = None
+    if with_view:
+        view = OrderStatusView([order_status.value for order_status in OrderStatus])
+        view.start(firestore_db)
+        order_transitions.order_status_view = view
+    firestore_db.latency_ms = latency_ms
+
+    latencies = []
+    outcomes = Counter()
+    winners = Counter()
+    lock = threading.Lock()
+
+    def attempt(job):
+        order_id, rider_id = job
+        started = time.perf_counter()
+        try:
+            pickup(firestore_db, order_id, rider_id)
+            outcome = "ok"
+        except HTTPException as e:
+            outcome = str(e.status_code)
+        except Exception as e:
+            outcome = type(e).__name__
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+            if outcome == "ok":
+                winners[order_id] += 1
+
+    jobs = [(order_id, f"rider-{rider}") for order_id in order_ids for rider in range(riders)]
+    firestore_db.stats.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=riders * 4) as executor:
+        list(executor.map(attempt, jobs))
+    elapsed = time.perf_counter() - started
+    rpcs = firestore_db.stats.snapshot()["rpcs"]
+
+    firestore_db.latency_ms = 0
+    if view is not None:
+        view.stop()
+        order_transitions.order_status_view = OrderStatusView()
+    delivered = sum(1 for doc in firestore_db.collection("Orders").stream()
+                    if doc.to_dict()["order_status"] == OrderStatus.DELIVERED.value)
+    counted = read_status_counts(firestore_db).get(OrderStatus.DELIVERED.value, 0)
+    single_winner = all(winners[order_id] == 1 for order_id in order_ids)
+    print(f"{name:<16} {len(jobs) / elapsed:9.0f} {statistics.median(latencies):8.1f} "
+          f"{percentile(latencies, 99):8.1f} {rpcs / len(jobs):9.2f}   "
+          f"{'yes' if single_winner and delivered == counted == orders else 'NO':<8} "
+          f"{dict(sorted(outcomes.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--riders", type=int, default=8, help="concurrent pickups per order")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="per RPC latency of the in-memory stand-in")
+    args = parser.parse_args()
+
+    print(f"{args.orders} orders, {args.riders} concurrent pickups each, {args.latency_ms} ms per RPC")
+    print(f"{'pickup':<16} {'pickups/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RPCs/call':>9}   {'correct':<8} outcomes")
+    run("transaction", pickup_with_transaction, args.orders, args.riders, args.latency_ms)
+    run("guarded", pickup_with_transition, args.orders, args.riders, args.latency_ms)
+    run("guarded + view", pickup_with_transition, args.orders, args.riders, args.latency_ms, with_view=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Write throughput of the sequential (legacy) and bucketed order ID generators.
+
+Two measurements per generator:
+
+- Key-range model: Firestore serves a collection from key ranges split at existing keys, each
+  with a limited write rate. The collection is pre-filled with ``--existing`` IDs from earlier
+  days and split into ``--ranges`` equal ranges; new IDs are then mapped to their range. The
+  share of new writes landing on the busiest range bounds the sustainable create rate at
+  ``--range-writes-per-second / share``.
+- Live writes: ``--writes`` documents written with ``--concurrency`` parallel single-document
+  commits through ``get_firestore_db()``, into the ``OrderIdBenchmark`` collection (deleted
+  afterwards). Uses the in-memory stand-in unless FIRESTORE_BACKEND=firestore is set; only a
+  real project (or the emulator) shows the hotspot itself.
+
+Run from the repository root:
+
+    python -m benchmarks.order_ids --existing 200000 --writes 2000 --concurrency 32
+"""
+import argparse
+import bisect
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+
+from order_ids import generate_legacy_order_id, generate_order_id  # noqa: E402
+
+BENCHMARK_COLLECTION = "OrderIdBenchmark"
+DELETE_BATCH_SIZE = 500
+
+
+def ids_at(generator, when, count):
+    # Backdate the generator's clock so earlier days of IDs can be produced
+    with mock.patch("order_ids.datetime") as fake_datetime:
+        fake_datetime.now.return_value = when
+        return [generator() for _ in range(count)]
+
+
+def busiest_range_share(generator, existing, new_writes, ranges):
+    now = datetime.now()
+    history = []
+    for day in range(30, 0, -1):
+        history += ids_at(generator, now - timedelta(days=day, seconds=random.randrange(86400)), existing // 30)
+    history.sort()
+    boundaries = [history[len(history) * index // ranges] for index in range(1, ranges)]
+    new_ids = [generator() for _ in range(new_writes)]
+    per_range = Counter(bisect.bisect_right(boundaries, order_id) for order_id in new_ids)
+    return max(per_range.values()) / new_writes
+
+
+def live_writes(firestore_db, generator, writes, concurrency):
+    collection = firestore_db.collection(BENCHMARK_COLLECTION)
+
+    def write(_):
+        order_id = generator()
+        collection.document(order_id).set({"order_id": order_id, "order_status": "pending"})
+        return order_id
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        order_ids = list(executor.map(write, range(writes)))
+    elapsed = time.perf_counter() - started
+    for start in range(0, len(order_ids), DELETE_BATCH_SIZE):
+        batch = firestore_db.batch()
+        for order_id in order_ids[start:start + DELETE_BATCH_SIZE]:
+            batch.delete(collection.document(order_id))
+        batch.commit()
+    return writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, default=200000, help="IDs already in the collection")
+    parser.add_argument("--ranges", type=int, default=64, help="key ranges the collection is split into")
+    parser.add_argument("--range-writes-per-second", type=float, default=500.0,
+                        help="assumed sustained write rate of one key range")
+    parser.add_argument("--writes", type=int, default=2000, help="documents written in the live test")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="per RPC latency of the in-memory stand-in")
+    args = parser.parse_args()
+
+    from firestore_client import get_firestore_db
+
+    firestore_db = get_firestore_db()
+    if hasattr(firestore_db, "latency_ms"):
+        firestore_db.latency_ms = args.latency_ms
+
+    print(f"{args.existing} existing IDs in {args.ranges} key ranges, "
+          f"{args.range_writes_per_second:.0f} writes/s per range assumed")
+    print(f"{'generator':<12} {'IDs/s':>10} {'busiest range':>14} {'max creates/s':>14} {'live writes/s':>14}")
+    for name, generator in (("sequential", generate_legacy_order_id), ("bucketed", generate_order_id)):
+        started = time.perf_counter()
+        for _ in range(100000):
+            generator()
+        ids_per_second = 100000 / (time.perf_counter() - started)
+        share = busiest_range_share(generator, args.existing, args.writes, args.ranges)
+        live = live_writes(firestore_db, generator, args.writes, args.concurrency)
+        print(f"{name:<12} {ids_per_second:10.0f} {share:13.1%} {args.range_writes_per_second / share:14.0f} "
+              f"{live:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
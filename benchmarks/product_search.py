@@ -0,0 +1,120 @@
+"""
+Latency of /products/search lookups on a synthetic catalog.
+
+Generates ``--products`` products with names built from brand, descriptor, item and pack size
+words, seeds them into the in-memory stand-in and builds the index through its snapshot
+listener like the app does at startup. Then times each query kind (short and long prefixes,
+whole words, several words, typos, sub-category filter) ``--repeat`` times and reports p50,
+p99 and max latency, and the time to apply a single product change to the index.
+
+Run from the repository root:
+
+    python -m benchmarks.product_search --products 50000 --repeat 200
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+from memory_firestore import MemoryFirestore  # noqa: E402
+from product_search import ProductSearchIndex  # noqa: E402
+
+BRANDS = ["amul", "britannia", "nestle", "tata", "fortune", "aashirvaad", "haldiram", "parle", "mother dairy",
+          "cadbury", "kissan", "maggi", "patanjali", "dabur", "everest", "catch", "saffola", "lays", "kurkure",
+          "bingo", "sunfeast", "horlicks", "bournvita", "red label", "taj mahal", "brooke bond", "nescafe", "bru"]
+DESCRIPTORS = ["fresh", "organic", "classic", "premium", "lite", "dark", "salted", "spicy", "masala", "sweet",
+               "crunchy", "roasted", "whole", "toned", "double", "extra", "golden", "natural", "instant", "family"]
+ITEMS = ["milk", "butter", "cheese", "paneer", "curd", "bread", "biscuits", "cookies", "chocolate", "noodles",
+         "pasta", "atta", "rice", "dal", "sugar", "salt", "tea", "coffee", "ketchup", "jam", "honey", "oil",
+         "ghee", "chips", "namkeen", "juice", "soap", "shampoo", "toothpaste", "detergent", "cornflakes", "oats"]
+PACKS = ["100g", "200g", "250g", "500g", "1kg", "5kg", "500ml", "1l", "pack of 2", "pack of 6", "family pack"]
+CATEGORIES = {"dairy": ["milk", "butter", "cheese", "paneer", "curd", "ghee"],
+              "bakery": ["bread", "biscuits", "cookies"], "snacks": ["chips", "namkeen", "chocolate"],
+              "staples": ["atta", "rice", "dal", "sugar", "salt", "oil"],
+              "beverages": ["tea", "coffee", "juice"], "breakfast": ["cornflakes", "oats", "jam", "honey"],
+              "instant food": ["noodles", "pasta", "ketchup"],
+              "personal care": ["soap", "shampoo", "toothpaste", "detergent"]}
+SUB_CATEGORY_OF = {item: f"{category} {item}" for category, items in CATEGORIES.items() for item in items}
+CATEGORY_OF = {item: category for category, items in CATEGORIES.items() for item in items}
+
+QUERIES = {
+    "1 char prefix": ["m", "c", "s", "b", "p"],
+    "3 char prefix": ["cho", "mil", "bis", "sha", "nam"],
+    "whole word": ["chocolate", "paneer", "shampoo", "cornflakes", "detergent"],
+    "two words": ["amul butter", "dark chocolate", "masala noodles", "organic atta", "family pack"],
+    "typo": ["choclate", "panner", "shampo", "biscuts", "detergnet"],
+    "typo + prefix": ["choclate 2", "amull but", "organc ri", "cadbry dar", "spicey ch"],
+}
+
+
+def generate_products(count):
+    products = {}
+    for index in range(count):
+        item = random.choice(ITEMS)
+        name = f"{random.choice(BRANDS)} {random.choice(DESCRIPTORS)} {item} {random.choice(PACKS)}"
+        product_id = f"sku{index:06d}"
+        products[product_id] = {"product_id": product_id, "product_name": name.title(),
+                                "category_name": CATEGORY_OF[item].title(),
+                                "sub_category_name": SUB_CATEGORY_OF[item].title(),
+                                "sub_category_id": SUB_CATEGORY_OF[item].replace(" ", "_"),
+                                "current_inventory": random.randrange(500)}
+    return products
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=200, help="times each query is run")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(1)
+    firestore_db = MemoryFirestore()
+    products = generate_products(args.products)
+    firestore_db.seed("Products", products)
+    index = ProductSearchIndex()
+    started = time.perf_counter()
+    index.start(firestore_db)
+    print(f"Indexed {len(index)} products in {time.perf_counter() - started:.2f} s")
+
+    print(f"{'query':<16} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  example")
+    for kind, queries in QUERIES.items():
+        samples = []
+        for _ in range(args.repeat):
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, args.limit)
+                samples.append((time.perf_counter() - started) * 1000)
+        example = ", ".join(product["product_name"] for product in index.search(queries[0], 2))
+        print(f"{kind:<16} {statistics.median(samples):8.3f} {percentile(samples, 99):8.3f} {max(samples):8.3f}  "
+              f"{queries[0]!r}: {example}")
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        index.search("ch", args.limit, sub_category_id="snacks_chocolate")
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{'sub-category':<16} {statistics.median(samples):8.3f} {percentile(samples, 99):8.3f} {max(samples):8.3f}")
+
+    samples = []
+    for product_id in random.sample(sorted(products), min(args.repeat, len(products))):
+        product = dict(products[product_id], product_name=f"Renamed {products[product_id]['product_name']}")
+        started = time.perf_counter()
+        index.load([product])
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{'product write':<16} {statistics.median(samples):8.3f} {percentile(samples, 99):8.3f} {max(samples):8.3f}"
+          f"  (index update of one changed product)")
+    results = index.search("renamed", args.limit)
+    assert results and all(product["product_name"].startswith("Renamed") for product in results)
+    index.stop()
+
+
+if __name__ == "__main__":
+    main()
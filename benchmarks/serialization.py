@@ -0,0 +1,95 @@
+"""
+Before/after benchmark for list responses built from stored documents.
+
+"validated" is what the list endpoints used to do: build a model per document, then let FastAPI
+validate the list against ``response_model`` and encode it with ``jsonable_encoder`` + ``json``.
+"trusted" is the fast path in ``fast_json``: shape each document to the model's fields and encode
+it with orjson. Documents are generated from the model's own fields.
+
+Run from the repository root:
+
+    python -m benchmarks.serialization --items 5000 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic.fields import SHAPE_SINGLETON
+from starlette.responses import JSONResponse
+
+from fast_json import trusted_response
+
+SAMPLE_VALUES = {
+    str: "sample text",
+    int: 42,
+    float: 19.99,
+    bool: True,
+    datetime: datetime(2024, 1, 1, tzinfo=timezone.utc),
+}
+
+
+def sample_value(field, index):
+    if isinstance(field.type_, type) and issubclass(field.type_, str) and field.type_ is not str:
+        value = list(field.type_)[index % len(field.type_)].value
+    elif field.sub_fields and field.shape == SHAPE_SINGLETON:
+        value = sample_value(field.sub_fields[0], index)
+    elif hasattr(field.type_, "__fields__"):
+        value = sample_document(field.type_, index)
+    else:
+        value = SAMPLE_VALUES.get(field.type_, f"value{index}")
+    if field.shape != SHAPE_SINGLETON:
+        return [value] * 3
+    return value
+
+
+def sample_document(model, index):
+    return {field.alias: sample_value(field, index) for field in model.__fields__.values()}
+
+
+def validated(model, field, documents):
+    items = [model(**document) for document in documents]
+    content = asyncio.run(serialize_response(field=field, response_content=items, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def trusted(model, documents):
+    return trusted_response(model, documents).body
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from orders.models.orders_model import OrderOut
+    from product_requests.model.product_request_model import ProductRequestModel
+    from products.model.product_model import Product
+
+    print(f"{args.items} items, median of {args.repeat} runs")
+    print(f"{'model':<22} {'validated ms':>13} {'trusted ms':>11} {'speedup':>8} {'bytes':>10}")
+    for model in (Product, ProductRequestModel, OrderOut):
+        documents = [sample_document(model, index) for index in range(args.items)]
+        field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+        validated_ms, size = measure(lambda: validated(model, field, documents), args.repeat)
+        trusted_ms, _ = measure(lambda: trusted(model, documents), args.repeat)
+        print(f"{model.__name__:<22} {validated_ms:13.1f} {trusted_ms:11.1f} "
+              f"{validated_ms / trusted_ms:7.1f}x {size:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Firestore calls and latency of hot order reads with and without single-flight coalescing.
+
+``--orders`` orders are out for delivery at once. In each of ``--waves`` waves, ``--readers``
+clients per order (customer app, rider app, store dashboard, ...) call ``GET /orders/{order_id}``
+and ``GET /get_refund/{order_id}`` at the same moment, through the ASGI app against the in-memory
+stand-in. Reported per mode: Firestore RPCs, RPCs saved according to ``/metrics``, and p50/p99
+request latency.
+
+Run from the repository root:
+
+    python -m benchmarks.single_flight --orders 20 --readers 6 --waves 20 --latency-ms 5 --ttl-ms 50
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+
+import main as app_main  # noqa: E402
+from benchmarks.endpoints import asgi_request, percentile  # noqa: E402
+from firestore_client import get_firestore_db  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+
+class Unshared(SingleFlight):
+    # Every read does its own fetch, as before coalescing
+    async def do(self, namespace, key, fetch):
+        self._requests += 1
+        self._fetches += 1
+        return await fetch()
+
+
+async def run_mode(name, flight, order_ids, readers, waves, wave_interval_ms):
+    app_main.single_flight = flight
+    firestore_db = get_firestore_db()
+    firestore_db.stats.reset()
+    latencies = []
+
+    async def timed(url):
+        started = time.perf_counter()
+        status = await asgi_request(app_main.app, "GET", url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert status == 200, (url, status)
+
+    for _ in range(waves):
+        await asyncio.gather(*(timed(url) for order_id in order_ids for _ in range(readers)
+                               for url in (f"/orders/{order_id}", f"/get_refund/{order_id}")))
+        await asyncio.sleep(wave_interval_ms / 1000)
+    rpcs = firestore_db.stats.snapshot()["rpcs"]
+    saved = next(line.split()[1] for line in flight.render().splitlines()
+                 if line.startswith("single_flight_rpcs_saved_total "))
+    print(f"{name:<20} {len(latencies):9d} {rpcs:9d} {saved:>9} {percentile(latencies, 50):8.1f} "
+          f"{percentile(latencies, 99):8.1f}")
+
+
+async def run(args):
+    firestore_db = get_firestore_db()
+    order_ids = [f"hot{index:04d}" for index in range(args.orders)]
+    firestore_db.seed("Orders", {order_id: {"order_id": order_id, "user_id": "user", "order_status": "accepted",
+                                            "modified_timestamp": datetime.now(timezone.utc),
+                                            "refunds": []}
+                                 for order_id in order_ids})
+    firestore_db.latency_ms = args.latency_ms
+    print(f"{args.orders} orders x {args.readers} readers x 2 routes, {args.waves} waves "
+          f"{args.wave_interval_ms:.0f} ms apart, {args.latency_ms} ms per RPC")
+    print(f"{'mode':<20} {'requests':>9} {'RPCs':>9} {'saved':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    await run_mode("unshared", Unshared(), order_ids, args.readers, args.waves, args.wave_interval_ms)
+    await run_mode("single-flight", SingleFlight(ttl_ms=0), order_ids, args.readers, args.waves,
+                   args.wave_interval_ms)
+    await run_mode(f"single-flight {args.ttl_ms:.0f} ms", SingleFlight(ttl_ms=args.ttl_ms), order_ids,
+                   args.readers, args.waves, args.wave_interval_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=6, help="concurrent readers per order and route")
+    parser.add_argument("--waves", type=int, default=20)
+    parser.add_argument("--wave-interval-ms", type=float, default=20.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="per RPC latency of the in-memory stand-in")
+    parser.add_argument("--ttl-ms", type=float, default=50.0, help="micro-TTL of the last mode")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
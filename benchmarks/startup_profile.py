@@ -0,0 +1,72 @@
+"""
+Cold-start report: import-time profile of ``main`` and time-to-first-request of uvicorn,
+with FAST_STARTUP off and on.
+
+Run from the repository root (FIRESTORE_BACKEND=memory avoids needing credentials):
+
+    FIRESTORE_BACKEND=memory python -m benchmarks.startup_profile
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+TOP_MODULES = 15
+
+
+def import_profile(env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            env=env, capture_output=True, text=True, check=True)
+    modules = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        # Top-level imports of main are indented by one level
+        if name.startswith("  ") and not name.startswith("    "):
+            modules.append((int(cumulative_us), name.strip()))
+    return total_us, sorted(modules, reverse=True)[:TOP_MODULES]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env, timeout=60):
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("uvicorn did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    for fast_startup in ("false", "true"):
+        env = dict(os.environ, FAST_STARTUP=fast_startup)
+        total_us, modules = import_profile(env)
+        print(f"\nFAST_STARTUP={fast_startup}")
+        print(f"import main: {total_us / 1000:.1f} ms")
+        for cumulative_us, name in modules:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+        print(f"time to first request: {time_to_first_request(env) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import functools
+import logging
+import os
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from google.api_core import exceptions
+from pydantic import BaseModel
+
+from daily_rollups import merge_deltas, order_transition_deltas, record_rollup_deltas
+from order_counters import record_status_deltas
+from orders.models.orders_model import OrderStatus
+
+# Bulk jobs page through their input, commit each page as one WriteBatch and store a checkpoint
+# in BulkJobs/{job_id} after every committed page, so a failed or interrupted job can resume.
+BULK_JOBS_COLLECTION = "BulkJobs"
+BULK_PAGE_SIZE = 400  # orders per backfill page, within the 500 writes per batch limit
+BULK_STATUS_PAGE_SIZE = 100  # order ids per get_all in status change jobs
+BULK_WRITE_CONCURRENCY = int(os.getenv("BULK_WRITE_CONCURRENCY", "4"))
+BULK_MAX_RETRIES = 5
+# Commit errors after which the commit may or may not have been applied
+RETRYABLE_COMMIT_ERRORS = (exceptions.Aborted, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+                           exceptions.ResourceExhausted, exceptions.ServiceUnavailable)
+# An order changed or was deleted after its page was read
+STALE_PAGE_ERRORS = (exceptions.FailedPrecondition, exceptions.NotFound)
+# A running job whose progress has not moved for this long is assumed to have died with its instance
+BULK_JOB_STALE_SECONDS = 300
+
+JOB_STATUS_CHANGE = "order_status_change"
+JOB_BACKFILL_MODIFIED_TIMESTAMP = "backfill_modified_timestamp"
+JOB_BACKFILL_CREATED_TIMESTAMP = "backfill_created_timestamp"
+
+
+class BulkStatusChange(BaseModel):
+    order_ids: List[str]
+    new_status: OrderStatus
+
+
+def create_job(firestore_db, job_type: str, params: dict) -> str:
+    job_id = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    firestore_db.collection(BULK_JOBS_COLLECTION).document(job_id).set({
+        "job_id": job_id,
+        "job_type": job_type,
+        "params": params,
+        "status": "pending",
+        "checkpoint": None,
+        "processed": 0,
+        "skipped": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return job_id
+
+
+def get_job(firestore_db, job_id: str) -> Optional[dict]:
+    job_doc = firestore_db.collection(BULK_JOBS_COLLECTION).document(job_id).get()
+    return job_doc.to_dict() if job_doc.exists else None
+
+
+def is_resumable(job: dict) -> bool:
+    if job["status"] == "completed":
+        return False
+    if job["status"] == "running":
+        return (datetime.now(timezone.utc) - job["updated_at"]).total_seconds() > BULK_JOB_STALE_SECONDS
+    return True
+
+
+def _commit_page(firestore_db, build_page):
+    """
+    Commit the writes ``build_page(batch)`` adds to a fresh batch and return the page's
+    (processed, skipped) counts.
+
+    Order updates carry an update_time precondition from the read they were built on. When an
+    order changed or was deleted after that read, or the commit failed in a way that may still
+    have applied it, the page is rebuilt from a fresh read instead of committing the same writes
+    (and counter increments) again; orders an earlier attempt did update are then skipped.
+    Other errors are raised without retrying.
+    """
+    for attempt in range(BULK_MAX_RETRIES):
+        batch = firestore_db.batch()
+        writes, processed, skipped = build_page(batch)
+        try:
+            if writes:
+                batch.commit()
+            return processed, skipped
+        except STALE_PAGE_ERRORS:
+            if attempt == BULK_MAX_RETRIES - 1:
+                raise
+            logging.info("Bulk page changed since it was read, rebuilding it")
+        except RETRYABLE_COMMIT_ERRORS:
+            if attempt == BULK_MAX_RETRIES - 1:
+                raise
+            logging.warning("Bulk batch commit failed, retrying", exc_info=True)
+            time.sleep(min(2 ** attempt * 0.5, 10))
+
+
+def _status_change_page(firestore_db, order_refs, new_status: str):
+    def build_page(batch):
+        now = datetime.now(timezone.utc)
+        deltas = Counter()
+        rollup_deltas = {}
+        writes = processed = 0
+        for doc in firestore_db.get_all(order_refs):
+            if not doc.exists:
+                continue
+            processed += 1
+            order = doc.to_dict()
+            old_status = order.get("order_status")
+            if old_status == new_status:
+                # Nothing to change, or an earlier attempt of this page was committed after all
+                continue
+            batch.update(doc.reference, {"order_status": new_status, "modified_timestamp": now},
+                         option=firestore_db.write_option(last_update_time=doc.update_time))
+            writes += 1
+            deltas[old_status] -= 1
+            deltas[new_status] += 1
+            merge_deltas(rollup_deltas, order_transition_deltas(order, old_status, new_status, now))
+        # Orders and their counter and rollup changes are committed atomically
+        record_status_deltas(firestore_db, batch, deltas)
+        record_rollup_deltas(firestore_db, batch, rollup_deltas)
+        return writes, processed, len(order_refs) - processed
+
+    return build_page
+
+
+def _status_change_pages(firestore_db, params: dict, checkpoint):
+    order_ids = params["order_ids"]
+    start = checkpoint or 0
+    for i in range(start, len(order_ids), BULK_STATUS_PAGE_SIZE):
+        order_refs = [firestore_db.collection("Orders").document(order_id)
+                      for order_id in order_ids[i:i + BULK_STATUS_PAGE_SIZE]]
+        yield _status_change_page(firestore_db, order_refs, params["new_status"]), i + len(order_refs)
+
+
+def _backfill_page(firestore_db, docs: list, field: str, source_fields: Tuple[str, ...], now: datetime):
+    doc_refs = [doc.reference for doc in docs]
+
+    def build_page(batch):
+        nonlocal docs
+        # The first attempt uses the page as the query read it, retries read it again
+        page = docs if docs is not None else firestore_db.get_all(doc_refs, field_paths=[field, *source_fields])
+        docs = None
+        writes = 0
+        for doc in page:
+            order = doc.to_dict() if doc.exists else None
+            if order is not None and order.get(field) is None:
+                value = next((order[source] for source in source_fields if order.get(source) is not None), now)
+                batch.update(doc.reference, {field: value},
+                             option=firestore_db.write_option(last_update_time=doc.update_time))
+                writes += 1
+        return writes, writes, len(doc_refs) - writes
+
+    return build_page
+
+
+def _backfill_pages(firestore_db, params: dict, checkpoint, field: str, source_fields: Tuple[str, ...] = ()):
+    # Orders missing ``field`` get the first of ``source_fields`` they have, or the job's start time
+    now = datetime.now(timezone.utc)
+    query = firestore_db.collection("Orders").select([field, *source_fields]).order_by("__name__")
+    last_id = checkpoint
+    while True:
+        page = query.start_after({"__name__": last_id}) if last_id else query
+        docs = list(page.limit(BULK_PAGE_SIZE).stream())
+        if not docs:
+            return
+        last_id = docs[-1].id
+        yield _backfill_page(firestore_db, docs, field, source_fields, now), last_id
+
+
+_JOB_PAGES = {
+    JOB_STATUS_CHANGE: _status_change_pages,
+    JOB_BACKFILL_MODIFIED_TIMESTAMP: functools.partial(_backfill_pages, field="modified_timestamp"),
+    # The creation time of older orders is not known, their last modification is the closest bound
+    JOB_BACKFILL_CREATED_TIMESTAMP: functools.partial(_backfill_pages, field="created_timestamp",
+                                                      source_fields=("modified_timestamp",)),
+}
+
+
+def run_job(firestore_db, job_id: str):
+    """
+    Run (or resume from its checkpoint) a bulk job. Pages are committed with up to
+    ``BULK_WRITE_CONCURRENCY`` batches in flight; the checkpoint only advances past a page
+    once it and every page before it are committed.
+    """
+    job_ref = firestore_db.collection(BULK_JOBS_COLLECTION).document(job_id)
+    job = job_ref.get().to_dict()
+    pages = _JOB_PAGES[job["job_type"]](firestore_db, job["params"], job["checkpoint"])
+    processed, skipped = job["processed"], job["skipped"]
+    job_ref.update({"status": "running", "error": None, "updated_at": datetime.now(timezone.utc)})
+
+    in_flight = deque()
+
+    def complete_oldest():
+        nonlocal processed, skipped
+        future, page_checkpoint = in_flight.popleft()
+        page_processed, page_skipped = future.result()
+        processed += page_processed
+        skipped += page_skipped
+        job_ref.update({"checkpoint": page_checkpoint, "processed": processed, "skipped": skipped,
+                        "updated_at": datetime.now(timezone.utc)})
+
+    with ThreadPoolExecutor(max_workers=BULK_WRITE_CONCURRENCY) as executor:
+        try:
+            for build_page, page_checkpoint in pages:
+                future = executor.submit(_commit_page, firestore_db, build_page)
+                in_flight.append((future, page_checkpoint))
+                if len(in_flight) >= BULK_WRITE_CONCURRENCY:
+                    complete_oldest()
+            while in_flight:
+                complete_oldest()
+        except Exception as e:
+            logging.error(f"Bulk job {job_id} failed: {e}")
+            job_ref.update({"status": "failed", "error": str(e), "updated_at": datetime.now(timezone.utc)})
+            return
+
+    job_ref.update({"status": "completed", "updated_at": datetime.now(timezone.utc)})
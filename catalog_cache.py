@@ -0,0 +1,158 @@
+import copy
+import functools
+import inspect
+import os
+import threading
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+from cachetools import TTLCache
+
+# Catalog data (categories, sub-categories, banners, products) changes rarely but is read on
+# every app screen. Entries expire after CATALOG_CACHE_TTL_SECONDS so the other instance's
+# writes become visible within that window; writes on this instance invalidate immediately.
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+CATALOG_CACHE_MAXSIZE = int(os.getenv("CATALOG_CACHE_MAXSIZE", "1024"))
+
+# Controller methods starting with these prefixes are treated as reads, everything else as a write.
+# Reads are only cached when listed in the controller's cached_methods.
+READ_METHOD_PREFIXES = ("get_", "read_")
+
+MISSING = object()
+
+
+class CatalogCache:
+    """
+    Size-bounded TTL + LRU cache shared by the catalog controllers, partitioned by namespace.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "invalidations": 0})
+
+    def get(self, namespace: str, key):
+        with self._lock:
+            value = self._cache.get((namespace, key), MISSING)
+            self._stats[namespace]["hits" if value is not MISSING else "misses"] += 1
+        return value
+
+    def set(self, namespace: str, key, value):
+        with self._lock:
+            self._cache[(namespace, key)] = value
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._cache.keys() if cache_key[0] == namespace]:
+                self._cache.pop(cache_key, None)
+            self._stats[namespace]["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._cache.currsize,
+                "maxsize": self._cache.maxsize,
+                "ttl_seconds": self._cache.ttl,
+                "namespaces": {namespace: dict(counts) for namespace, counts in self._stats.items()},
+            }
+
+
+catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_MAXSIZE, ttl=CATALOG_CACHE_TTL_SECONDS)
+
+
+def _cache_key(method_name: str, args, kwargs):
+    key = (method_name, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class CachedController:
+    """
+    Proxy around a controller that serves the read methods named in ``cached_methods`` from
+    ``catalog_cache`` and invalidates the controller's namespace after any write method is called.
+    Other read methods (``READ_METHOD_PREFIXES``) are passed through. Wrapping a controller with
+    no cached methods makes its writes invalidate the namespace, e.g. for stock updates changing
+    the cached products' ``current_inventory``.
+
+    Cached results are deep-copied when stored and when served, so callers may mutate what they
+    get; results that are iterators are not cached. Both sync and ``async`` controller methods
+    are supported.
+    """
+
+    def __init__(self, controller, namespace: str, cached_methods: Iterable[str] = (),
+                 cache: CatalogCache = catalog_cache):
+        self._controller = controller
+        self._namespace = namespace
+        self._cached_methods = frozenset(cached_methods)
+        self._cache = cache
+
+    def __getattr__(self, name):
+        attr = getattr(self._controller, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if name in self._cached_methods:
+            return self._cached_read(name, attr)
+        if name.startswith(READ_METHOD_PREFIXES):
+            return attr
+        return self._invalidating_write(attr)
+
+    def _cached_read(self, name, method):
+        namespace, cache = self._namespace, self._cache
+
+        def lookup(args, kwargs):
+            key = _cache_key(name, args, kwargs)
+            value = cache.get(namespace, key) if key is not None else MISSING
+            return key, value if value is MISSING else copy.deepcopy(value)
+
+        def store(key, value):
+            if key is not None and not isinstance(value, Iterator):
+                cache.set(namespace, key, copy.deepcopy(value))
+            return value
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_read(*args, **kwargs):
+                key, value = lookup(args, kwargs)
+                if value is MISSING:
+                    value = store(key, await method(*args, **kwargs))
+                return value
+
+            return async_read
+
+        @functools.wraps(method)
+        def read(*args, **kwargs):
+            key, value = lookup(args, kwargs)
+            if value is MISSING:
+                value = store(key, method(*args, **kwargs))
+            return value
+
+        return read
+
+    def _invalidating_write(self, method):
+        namespace, cache = self._namespace, self._cache
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_write(*args, **kwargs):
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    cache.invalidate(namespace)
+
+            return async_write
+
+        @functools.wraps(method)
+        def write(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                cache.invalidate(namespace)
+
+        return write
@@ -0,0 +1,48 @@
+import threading
+from typing import Tuple
+
+from catalog_cache import CachedController
+from firestore_client import get_firestore_db
+
+
+class ControllerContainer:
+    """
+    Process-scoped controller instances for the ``dependencies.py`` providers.
+
+    Controllers only hold the shared Firestore client (plus whatever they set up from it), so
+    one instance per process is enough; each is created on first use and kept until ``close``.
+    Providers for controllers that keep per-request state should keep constructing them per call.
+    """
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, controller_class, cache_namespace: str = None, cached_methods: Tuple[str, ...] = ()):
+        """
+        Return the process-wide instance of ``controller_class``, wrapped in a ``CachedController``
+        when ``cache_namespace`` is given: ``cached_methods`` are served from the cache and writes
+        invalidate the namespace.
+        """
+        key = (controller_class, cache_namespace, cached_methods)
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = controller_class(firestore_db=get_firestore_db())
+                    if cache_namespace:
+                        instance = CachedController(instance, cache_namespace, cached_methods)
+                    self._instances[key] = instance
+        return instance
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        for instance in instances.values():
+            close = getattr(instance, "close", None)
+            if callable(close):
+                close()
+
+
+controller_container = ControllerContainer()
@@ -0,0 +1,175 @@
+import os
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from firebase_admin import firestore
+
+from orders.models.orders_model import OrderStatus
+
+# Reporting rollups in DailyRollups/{YYYY-MM-DD}_{store id}. Order status transitions, refund
+# updates and stock intake add Increments to the rollup of the day (UTC) they happen on, in the
+# same batch or transaction as the write they account for. Reports then read one document per
+# day and store instead of every order.
+#
+# Deltas are collected as {(day, store id): Counter({"field.path": amount})} so the changes of
+# many orders can be folded into one write per rollup document.
+DAILY_ROLLUPS_COLLECTION = "DailyRollups"
+# Store id of the rollups for orders and stock intakes that have no store; not a cross-store total
+NO_STORE = "none"
+ORDER_STORE_FIELD = os.getenv("ORDER_STORE_FIELD", "store_id")
+ORDER_AMOUNT_FIELD = os.getenv("ORDER_AMOUNT_FIELD", "total_amount")
+REFUND_AMOUNT_FIELD = os.getenv("REFUND_AMOUNT_FIELD", "amount")
+STOCK_STORE_FIELD = os.getenv("STOCK_STORE_FIELD", "store_id")
+MAX_REPORT_DAYS = 366
+
+
+def _day(when: Optional[datetime]) -> str:
+    return (when or datetime.now(timezone.utc)).astimezone(timezone.utc).date().isoformat()
+
+
+def _amount(value) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _status_value(order_status):
+    return getattr(order_status, "value", order_status)
+
+
+def order_store(order: dict) -> str:
+    return str(order.get(ORDER_STORE_FIELD) or NO_STORE)
+
+
+def order_transition_deltas(order: dict, old_status=None, new_status=None, when: datetime = None) -> dict:
+    """
+    Rollup changes for an order moving from ``old_status`` (None when created) to ``new_status``.
+    Sales are booked when an order is delivered and reversed if it leaves the delivered status.
+    """
+    old_status, new_status = _status_value(old_status), _status_value(new_status)
+    changes = Counter()
+    if old_status == new_status:
+        return {}
+    if old_status is None:
+        changes["orders_created"] += 1
+    if new_status:
+        changes[f"transitions.{new_status}"] += 1
+    delivered = OrderStatus.DELIVERED.value
+    amount = _amount(order.get(ORDER_AMOUNT_FIELD))
+    if new_status == delivered:
+        changes["delivered_orders"] += 1
+        changes["sales_amount"] += amount
+    if old_status == delivered:
+        changes["delivered_orders"] -= 1
+        changes["sales_amount"] -= amount
+    return {(_day(when), order_store(order)): changes}
+
+
+def refund_change_deltas(order: dict, old_refunds: Iterable[dict], new_refunds: Iterable[dict],
+                         when: datetime = None) -> dict:
+    """
+    Rollup changes for replacing an order's ``refunds`` with ``new_refunds``.
+    """
+    old_refunds, new_refunds = list(old_refunds or []), list(new_refunds or [])
+    changes = Counter({
+        "refunds": len(new_refunds) - len(old_refunds),
+        "refund_amount": sum(_amount(refund.get(REFUND_AMOUNT_FIELD)) for refund in new_refunds)
+        - sum(_amount(refund.get(REFUND_AMOUNT_FIELD)) for refund in old_refunds),
+    })
+    return {(_day(when), order_store(order)): changes}
+
+
+def stock_intake_deltas(store_id: Optional[str], units: int, when: datetime = None) -> dict:
+    return {(_day(when), str(store_id or NO_STORE)): Counter({"stock_intakes": 1, "stock_units": units})}
+
+
+def merge_deltas(target: dict, deltas: dict) -> dict:
+    for key, changes in deltas.items():
+        target.setdefault(key, Counter()).update(changes)
+    return target
+
+
+def _rollup_ref(firestore_db, day: str, store_id: str):
+    return firestore_db.collection(DAILY_ROLLUPS_COLLECTION).document(f"{day}_{store_id}")
+
+
+def rollup_writes(firestore_db, deltas: dict) -> list:
+    """
+    Turn deltas into ``(document reference, fields)`` pairs, to be written with ``set(merge=True)``.
+    """
+    writes = []
+    for (day, store_id), changes in deltas.items():
+        fields = {"date": day, "store_id": store_id}
+        for field_path, amount in changes.items():
+            if not amount:
+                continue
+            *parents, name = field_path.split(".")
+            target = fields
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = firestore.Increment(amount)
+        if len(fields) > 2:
+            writes.append((_rollup_ref(firestore_db, day, store_id), fields))
+    return writes
+
+
+def record_rollup_deltas(firestore_db, writer, deltas: dict):
+    """
+    Add one merge write per touched rollup document to a batch or transaction.
+    """
+    for doc_ref, fields in rollup_writes(firestore_db, deltas):
+        writer.set(doc_ref, fields, merge=True)
+
+
+def record_order_transition(firestore_db, writer, order: dict, old_status=None, new_status=None):
+    record_rollup_deltas(firestore_db, writer, order_transition_deltas(order, old_status, new_status))
+
+
+def _add_rollup(total: dict, rollup: dict):
+    for key, value in rollup.items():
+        if key in ("date", "store_id"):
+            continue
+        if isinstance(value, dict):
+            _add_rollup(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+
+
+def read_daily_rollups(firestore_db, start: date, end: date, store_id: Optional[str] = None) -> dict:
+    """
+    Sum the rollups of the days in ``[start, end]``, per day and overall.
+
+    With ``store_id`` exactly one document per day is read (by ID), ``NO_STORE`` reads the rollups
+    of orders and intakes without a store. Without it, the totals are across all stores, summed
+    from one document per day and store read through a range query on ``date``.
+
+    Returns:
+    - dict: ``{"days": [{"date": ..., <totals>}], "totals": {...}}`` with days in date order.
+    """
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    if store_id:
+        refs = [_rollup_ref(firestore_db, day, store_id) for day in days]
+        rollups = [doc.to_dict() for doc in firestore_db.get_all(refs) if doc.exists]
+    else:
+        query = (firestore_db.collection(DAILY_ROLLUPS_COLLECTION)
+                 .where("date", ">=", days[0]).where("date", "<=", days[-1]))
+        rollups = [doc.to_dict() for doc in query.stream()]
+
+    per_day = defaultdict(dict)
+    totals = {}
+    for rollup in rollups:
+        _add_rollup(per_day[rollup["date"]], rollup)
+        _add_rollup(totals, rollup)
+    return {"days": [{"date": day, **per_day[day]} for day in days if day in per_day], "totals": totals}
+
+
+def validate_report_range(start: date, end: date):
+    """
+    Raises:
+    - HTTPException: If ``end`` is before ``start`` or the range spans more than ``MAX_REPORT_DAYS``
+      (status_code=400).
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end is before start")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REPORT_DAYS} days per report")
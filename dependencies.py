@@ -1,6 +1,3 @@
-import firebase_admin
-from fastapi import Depends
-from firebase_admin import firestore, credentials
 from google.cloud import firestore as cloud_firestore
 
 from add_new_stock.controller.add_new_stock_controller import AddNewStockController
@@ -8,7 +5,9 @@ from banners.controller.banner_controller import BannerController
 from cart.controller.cart_controller import CartController
 from categories.controller.category_controller import CategoryController
 from complaints.controller.complaints_controller import ComplaintsController
+from controller_container import controller_container
 from coupons.controller.coupons_controller import CouponController
+from firestore_client import get_firestore_db
 from inventory.controller.inventory_controller import InventoryController
 from inventory.controller.remove_stock_controller import RemoveStockController
 from messages.controller.messages_controller import MessageController
@@ -25,84 +24,87 @@ from users.controller.user_controller import UserController
 
 
 def get_firestore_client() -> cloud_firestore.Client:
-    return firestore.client()
+    return get_firestore_db()
 
 
-def get_user_controller(firestore_client=Depends(get_firestore_client)) -> UserController:
-    return UserController(firestore_db=firestore_client)
+def get_user_controller() -> UserController:
+    return controller_container.get(UserController)
 
 
-def get_user_address_controller(firestore_client=Depends(get_firestore_client)) -> AddressController:
-    return AddressController(firestore_db=firestore_client)
+def get_user_address_controller() -> AddressController:
+    return controller_container.get(AddressController)
 
 
-def get_store_controller(firestore_client=Depends(get_firestore_client)) -> StoreController:
-    return StoreController(firestore_db=firestore_client)
+def get_store_controller() -> StoreController:
+    return controller_container.get(StoreController)
 
 
-def get_order_controller(firestore_client=Depends(get_firestore_client)) -> OrderController:
-    return OrderController(firestore_db=firestore_client)
+def get_order_controller() -> OrderController:
+    return controller_container.get(OrderController)
 
 
-def get_category_controller(firestore_client=Depends(get_firestore_client)) -> CategoryController:
-    return CategoryController(firestore_db=firestore_client)
+def get_category_controller() -> CategoryController:
+    return controller_container.get(CategoryController, cache_namespace="categories",
+                                    cached_methods=("get_all_categories", "read_category"))
 
 
-def get_address_controller(firestore_client=Depends(get_firestore_client)) -> AddressController:
-    return AddressController(firestore_db=firestore_client)
+def get_address_controller() -> AddressController:
+    return controller_container.get(AddressController)
 
 
-def get_subcategory_controller(firestore_client=Depends(get_firestore_client)) -> SubCategoryController:
-    return SubCategoryController(firestore_db=firestore_client)
+def get_subcategory_controller() -> SubCategoryController:
+    return controller_container.get(SubCategoryController, cache_namespace="sub_categories")
 
 
-def get_products_controller(firestore_client=Depends(get_firestore_client)) -> ProductController:
-    return ProductController(firestore_db=firestore_client)
+def get_products_controller() -> ProductController:
+    return controller_container.get(ProductController, cache_namespace="products")
 
 
-def get_product_bundle_controller(firestore_client=Depends(get_firestore_client)) -> ProductBundleController:
-    return ProductBundleController(firestore_db=firestore_client)
+def get_product_bundle_controller() -> ProductBundleController:
+    return controller_container.get(ProductBundleController)
 
 
-def get_messages_controller(firestore_client=Depends(get_firestore_client)) -> MessageController:
-    return MessageController(firestore_db=firestore_client)
+def get_messages_controller() -> MessageController:
+    return controller_container.get(MessageController)
 
 
-def get_cart_controller(firestore_client=Depends(get_firestore_client)) -> CartController:
-    return CartController(firestore_db=firestore_client)
+def get_cart_controller() -> CartController:
+    return controller_container.get(CartController)
 
 
-def get_store_manager_controller(firestore_client=Depends(get_firestore_client)) -> StoreManagerController:
-    return StoreManagerController(firestore_db=firestore_client)
+def get_store_manager_controller() -> StoreManagerController:
+    return controller_container.get(StoreManagerController)
 
 
-def get_banner_controller(firestore_client=Depends(get_firestore_client)) -> BannerController:
-    return BannerController(firestore_db=firestore_client)
+def get_banner_controller() -> BannerController:
+    return controller_container.get(BannerController, cache_namespace="banners",
+                                    cached_methods=("get_all_banners", "get_banner"))
 
 
-def get_coupon_controller(firestore_client=Depends(get_firestore_client)) -> CouponController:
-    return CouponController(firestore_db=firestore_client)
+def get_coupon_controller() -> CouponController:
+    return controller_container.get(CouponController)
 
 
-def inventory_controller(firestore_client=Depends(get_firestore_client)) -> InventoryController:
-    return InventoryController(firestore_db=firestore_client)
+def inventory_controller() -> InventoryController:
+    # Stock writes change current_inventory of the cached products
+    return controller_container.get(InventoryController, cache_namespace="products")
 
 
-def request_product_controller(firestore_client=Depends(get_firestore_client)) -> RequestProductController:
-    return RequestProductController(firestore_db=firestore_client)
+def request_product_controller() -> RequestProductController:
+    return controller_container.get(RequestProductController)
 
 
-def get_rider_controller(firestore_client=Depends(get_firestore_client)) -> RiderController:
-    return RiderController(firestore_db=firestore_client)
+def get_rider_controller() -> RiderController:
+    return controller_container.get(RiderController)
 
 
-def get_remove_stock_controller(firestore_client=Depends(get_firestore_client)) -> RemoveStockController:
-    return RemoveStockController(firestore_db=firestore_client)
+def get_remove_stock_controller() -> RemoveStockController:
+    return controller_container.get(RemoveStockController, cache_namespace="products")
 
 
-def get_add_new_stock(firestore_client=Depends(get_firestore_client)) -> AddNewStockController:
-    return AddNewStockController(firestore_db=firestore_client)
+def get_add_new_stock() -> AddNewStockController:
+    return controller_container.get(AddNewStockController, cache_namespace="products")
 
 
-def get_complaints_controller(firestore_client=Depends(get_firestore_client)) -> ComplaintsController:
-    return ComplaintsController(firestore_db=firestore_client)
+def get_complaints_controller() -> ComplaintsController:
+    return controller_container.get(ComplaintsController)
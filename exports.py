@@ -0,0 +1,305 @@
+"""
+Memory-bounded exports of Orders and AddNewStock for finance.
+
+Documents are read with chunked range queries on their date field (``EXPORT_CHUNK_SIZE`` per
+query, cursor on date then document ID), flattened into rows and written chunk by chunk, so
+memory does not grow with the date range. ``GET /exports/{dataset}.csv`` streams one range as
+CSV. The CLI splits the range into date partitions, exports them in parallel to one file each
+(CSV, or Parquet in one row group per chunk) and resumes interrupted partitions from their
+checkpoint:
+
+    python -m exports orders --start 2024-01-01 --end 2024-02-01 --out exports/ --workers 4
+    python -m exports order_refunds --start 2024-01-01 --end 2024-02-01 --format parquet --out exports/
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+
+from fast_json import dumps
+from pagination import DOCUMENT_ID, decode_page_token, encode_page_token
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+EXTRA_COLUMN = "_extra"
+
+
+class ExportDataset(NamedTuple):
+    collection: str
+    # Set once when the document is created: a document whose date moved during an export could
+    # be skipped or exported twice
+    date_field: str
+    # List field to emit one row per element of, instead of one row per document
+    explode: Optional[str] = None
+
+
+EXPORT_DATASETS = {
+    "orders": ExportDataset("Orders", "created_timestamp"),
+    "order_items": ExportDataset("Orders", "created_timestamp", explode="items"),
+    "order_refunds": ExportDataset("Orders", "created_timestamp", explode="refunds"),
+    "stock_movements": ExportDataset("AddNewStock", "timestamp"),
+}
+
+
+def get_dataset(name: str) -> ExportDataset:
+    """
+    Raises:
+    - HTTPException: If there is no dataset called ``name`` (status_code=404).
+    """
+    if name not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export, expected one of {', '.join(EXPORT_DATASETS)}")
+    return EXPORT_DATASETS[name]
+
+
+def _cell(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return dumps(value).decode()
+    return value
+
+
+def flatten(data: dict, prefix: str = "") -> dict:
+    """
+    Flatten nested maps into dotted columns; lists are kept as JSON text.
+    """
+    row = {}
+    for key, value in data.items():
+        column = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            row.update(flatten(value, f"{column}."))
+        else:
+            row[column] = _cell(value)
+    return row
+
+
+def document_rows(dataset: ExportDataset, document_id: str, data: dict) -> List[dict]:
+    if dataset.explode is None:
+        return [{"document_id": document_id, **flatten(data)}]
+    parent = {"document_id": document_id, dataset.date_field: _cell(data.get(dataset.date_field))}
+    rows = []
+    for index, element in enumerate(data.get(dataset.explode) or []):
+        element_row = flatten(element, f"{dataset.explode}.") if isinstance(element, dict) else \
+            {dataset.explode: _cell(element)}
+        rows.append({**parent, "index": index, **element_row})
+    return rows
+
+
+def iter_chunks(firestore_db, dataset: ExportDataset, start: datetime, end: datetime,
+                cursor: Optional[str] = None, after_index: Optional[int] = None,
+                chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Tuple[List[dict], str]]:
+    """
+    Yield the rows of ``[start, end)`` one query at a time, each with the cursor to resume after it.
+    Documents without the date field are not exported (orders created before ``created_timestamp``
+    was recorded need the created_timestamp backfill job), chunks without rows are not yielded.
+
+    Args:
+    - cursor (str): Cursor yielded with an earlier chunk, or encoded from the last row received,
+      to continue after it.
+    - after_index (int): For datasets with a row per list element, the ``index`` of the last row
+      received of the cursor's document; the export continues with that document's next element.
+
+    Yields:
+    - Tuple[List[dict], str]: The rows of up to ``chunk_size`` documents and the cursor after them.
+    """
+    query = (firestore_db.collection(dataset.collection)
+             .where(dataset.date_field, ">=", start).where(dataset.date_field, "<", end)
+             .order_by(dataset.date_field).order_by(DOCUMENT_ID))
+    resume_id = None
+    if cursor and dataset.explode and after_index is not None:
+        # Resuming within a document: the query starts at it and its remaining elements come first
+        resume_id = decode_page_token(cursor, [dataset.date_field, DOCUMENT_ID])[DOCUMENT_ID]
+    while True:
+        page_query = query.limit(chunk_size)
+        if cursor:
+            cursor_values = decode_page_token(cursor, [dataset.date_field, DOCUMENT_ID])
+            page_query = page_query.start_at(cursor_values) if resume_id else page_query.start_after(cursor_values)
+        documents = list(page_query.stream())
+        if not documents:
+            return
+        rows = []
+        for document in documents:
+            rows.extend(row for row in document_rows(dataset, document.id, document.to_dict())
+                        if document.id != resume_id or row["index"] > after_index)
+        resume_id = None
+        last = documents[-1]
+        cursor = encode_page_token({dataset.date_field: last.get(dataset.date_field), DOCUMENT_ID: last.id})
+        if rows:
+            yield rows, cursor
+        if len(documents) < chunk_size:
+            return
+
+
+def row_columns(rows: List[dict]) -> List[str]:
+    """
+    Columns of an export, taken from its first chunk; later unknown fields go to ``_extra``.
+    """
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    return columns + [EXTRA_COLUMN]
+
+
+def fit_row(row: dict, columns: List[str]) -> dict:
+    known = set(columns)
+    extra = {column: value for column, value in row.items() if column not in known}
+    fitted = {column: row.get(column) for column in columns}
+    fitted[EXTRA_COLUMN] = dumps(extra).decode() if extra else None
+    return fitted
+
+
+def csv_text(rows: List[dict], columns: List[str], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    if header:
+        writer.writeheader()
+    writer.writerows(fit_row(row, columns) for row in rows)
+    return buffer.getvalue()
+
+
+def parse_date(value: str) -> datetime:
+    """
+    Parse an ISO date or datetime; naive values are taken as UTC.
+
+    Raises:
+    - HTTPException: If ``value`` is not ISO formatted (status_code=400).
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def date_partitions(start: datetime, end: datetime, days: int) -> List[Tuple[datetime, datetime]]:
+    partitions = []
+    while start < end:
+        partition_end = min(start + timedelta(days=days), end)
+        partitions.append((start, partition_end))
+        start = partition_end
+    return partitions
+
+
+# CLI
+
+
+def _load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    # Written to a temporary file and renamed, so a crash never leaves a torn checkpoint
+    with open(path + ".tmp", "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(path + ".tmp", path)
+
+
+def export_partition_csv(firestore_db, dataset: ExportDataset, start: datetime, end: datetime, path: str) -> int:
+    """
+    Export one partition to ``path``, resuming from ``path.checkpoint`` if an earlier run was cut off.
+    The checkpoint records the cursor and file size after each chunk, so the file is truncated
+    back to the last complete chunk before continuing.
+
+    Returns:
+    - int: Rows written by this run.
+    """
+    checkpoint_path = path + ".checkpoint"
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if checkpoint.get("done"):
+        return 0
+    written = 0
+    with open(path, "a+", newline="") as export_file:
+        export_file.truncate(checkpoint.get("offset", 0))
+        export_file.seek(0, os.SEEK_END)
+        columns = checkpoint.get("columns")
+        for rows, cursor in iter_chunks(firestore_db, dataset, start, end, checkpoint.get("cursor")):
+            header = columns is None
+            columns = columns or row_columns(rows)
+            export_file.write(csv_text(rows, columns, header=header))
+            export_file.flush()
+            os.fsync(export_file.fileno())
+            written += len(rows)
+            checkpoint = {"cursor": cursor, "columns": columns, "offset": export_file.tell()}
+            _save_checkpoint(checkpoint_path, checkpoint)
+    _save_checkpoint(checkpoint_path, dict(checkpoint, done=True))
+    return written
+
+
+def export_partition_parquet(firestore_db, dataset: ExportDataset, start: datetime, end: datetime,
+                             path: str) -> int:
+    """
+    Export one partition to ``path`` as Parquet, one row group per chunk, all columns as strings.
+    Row groups cannot be appended to a closed file, so an interrupted partition is redone.
+
+    Returns:
+    - int: Rows written by this run.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.exists(path):
+        return 0
+    partial_path = path + ".partial"
+    writer = None
+    written = 0
+    try:
+        columns = None
+        for rows, _ in iter_chunks(firestore_db, dataset, start, end):
+            if writer is None:
+                columns = row_columns(rows)
+                schema = pa.schema([(column, pa.string()) for column in columns])
+                writer = pq.ParquetWriter(partial_path, schema)
+            table = pa.Table.from_pylist(
+                [{column: None if value is None else str(value) for column, value in fit_row(row, columns).items()}
+                 for row in rows], schema=writer.schema)
+            writer.write_table(table)
+            written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(partial_path, path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=sorted(EXPORT_DATASETS))
+    parser.add_argument("--start", required=True, help="first day (or ISO datetime) to export, inclusive")
+    parser.add_argument("--end", required=True, help="day (or ISO datetime) to stop at, exclusive")
+    parser.add_argument("--partition-days", type=int, default=1, help="days per output file")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--out", default=".", help="output directory")
+    parser.add_argument("--workers", type=int, default=4, help="partitions exported in parallel")
+    args = parser.parse_args()
+
+    from firestore_client import get_firestore_db
+
+    dataset = EXPORT_DATASETS[args.dataset]
+    export_partition = export_partition_parquet if args.format == "parquet" else export_partition_csv
+    firestore_db = get_firestore_db()
+    os.makedirs(args.out, exist_ok=True)
+
+    def run(partition):
+        start, end = partition
+        path = os.path.join(args.out, f"{args.dataset}-{start:%Y%m%dT%H%M%S}.{args.format}")
+        rows = export_partition(firestore_db, dataset, start, end, path)
+        print(f"{path}: {rows} rows")
+        return rows
+
+    partitions = date_partitions(parse_date(args.start), parse_date(args.end), args.partition_days)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        total = sum(executor.map(run, partitions))
+    print(f"{total} rows in {len(partitions)} partitions")
+
+
+if __name__ == "__main__":
+    main()
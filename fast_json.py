@@ -0,0 +1,64 @@
+import base64
+from datetime import date, datetime
+from typing import Iterable, List, Type
+
+import orjson
+from google.cloud.firestore_v1 import DocumentReference, GeoPoint
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# Trusted-read fast path. Documents read back from Firestore were validated by the models when
+# they were written, so list endpoints can shape them to the response model's fields and encode
+# them with orjson instead of building a model per document and letting FastAPI validate and
+# jsonable_encode the result again.
+
+
+def _default(value):
+    # orjson only handles exact datetime instances, not Firestore's DatetimeWithNanoseconds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, DocumentReference):
+        return value.path
+    if isinstance(value, GeoPoint):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded with orjson. Returning it from a route skips ``response_model``.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def shape_documents(model: Type[BaseModel], documents: Iterable[dict]) -> List[dict]:
+    """
+    Restrict stored documents to the fields of ``model``, filling in defaults for missing ones,
+    without validating them. This gives the same shape ``response_model=List[model]`` produces.
+
+    Args:
+    - model: The response model the endpoint documents.
+    - documents: Documents as returned by ``DocumentSnapshot.to_dict``.
+
+    Returns:
+    - List[dict]: One dict per document, keyed by the model's field aliases.
+    """
+    fields = [(field.alias, field) for field in model.__fields__.values()]
+    # get_default copies mutable defaults, so documents missing a list field do not share one list
+    return [{alias: document[alias] if alias in document else field.get_default() for alias, field in fields}
+            for document in documents]
+
+
+def trusted_response(model: Type[BaseModel], documents: Iterable[dict]) -> FastJSONResponse:
+    return FastJSONResponse(shape_documents(model, documents))
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+from firestore_executor import run_firestore
+from memory_firestore import MemoryFirestore
+
+# Selects the Firestore backend shared by main.py and the controllers:
+# - "firestore" (default): the real project, using the service account in FIRESTORE_CREDENTIALS.
+#   Setting FIRESTORE_EMULATOR_HOST points this client at the Firestore emulator instead.
+# - "memory": the in-memory stand-in with FIRESTORE_FAKE_LATENCY_MS / FIRESTORE_FAKE_JITTER_MS
+#   injected per RPC, for load tests and profiling without credentials.
+FIRESTORE_BACKEND = os.getenv("FIRESTORE_BACKEND", "firestore")
+FIRESTORE_CREDENTIALS = os.getenv("FIRESTORE_CREDENTIALS", "source.json")
+
+_client = None
+_client_lock = threading.Lock()
+# Creation of the client in the Firestore executor, shared by the requests waiting for it
+_client_creation = None
+
+
+def create_firestore_client():
+    if FIRESTORE_BACKEND == "memory":
+        return MemoryFirestore(latency_ms=float(os.getenv("FIRESTORE_FAKE_LATENCY_MS", "0")),
+                               jitter_ms=float(os.getenv("FIRESTORE_FAKE_JITTER_MS", "0")))
+    if FIRESTORE_BACKEND != "firestore":
+        raise ValueError(f"Unknown FIRESTORE_BACKEND {FIRESTORE_BACKEND!r}")
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(FIRESTORE_CREDENTIALS))
+    return firestore.client()
+
+
+def get_firestore_db():
+    """
+    Return the process-wide Firestore client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_firestore_client()
+    return _client
+
+
+class LazyFirestoreClient:
+    """
+    Module-level handle to the process-wide client that only creates it on first use,
+    so importing a module holding one does not initialize Firebase.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_firestore_db(), name)
+
+
+def warm_up_firestore():
+    """
+    Initialize Firebase and open the gRPC channel with one cheap read, ahead of the first request.
+    """
+    get_firestore_db().collection("Counters").document("warmup").get()
+
+
+async def ensure_firestore_client():
+    """
+    Create the process-wide client in the Firestore executor if it does not exist yet, so code
+    on the event loop can then use it without blocking on Firebase initialization.
+    """
+    global _client_creation
+    if _client is not None:
+        return
+    if _client_creation is None or _client_creation.done() and _client_creation.exception():
+        _client_creation = asyncio.ensure_future(run_firestore(get_firestore_db))
+    await asyncio.shield(_client_creation)
+
+
+class FirestoreClientMiddleware:
+    """
+    ASGI middleware that waits for ``ensure_firestore_client`` before dispatching while the
+    client does not exist yet, e.g. during a FAST_STARTUP cold start, because handlers call
+    ``firestore_db.collection(...)`` directly on the event loop.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and _client is None:
+            await ensure_firestore_client()
+        await self.app(scope, receive, send)
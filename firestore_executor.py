@@ -0,0 +1,32 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# The Firestore client used across the app is synchronous; every call made from an
+# ``async def`` handler has to be pushed off the event loop or it blocks all other requests.
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+
+async def run_firestore(func, *args, **kwargs):
+    """
+    Run a blocking Firestore call on the bounded Firestore executor.
+
+    Args:
+    - func: Callable doing the Firestore round trip(s).
+    - *args, **kwargs: Arguments passed to ``func``.
+
+    Returns:
+    - The return value of ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,244 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+
+from google.cloud.firestore_v1.batch import WriteBatch
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.query import Query
+from google.cloud.firestore_v1.transaction import Transaction
+
+from memory_firestore import MemoryFirestore
+
+# Per-request Firestore accounting. The Firestore client classes are wrapped once at startup so
+# every RPC made while serving a request (from main.py or from a feature controller) is added to
+# that request's usage, which is tracked through a context variable. run_firestore and
+# Starlette's threadpool copy the context into worker threads, so blocking calls are counted too.
+METRICS_DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "false").lower() == "true"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_request_usage = contextvars.ContextVar("firestore_request_usage", default=None)
+_instrumented = False
+
+
+class RequestUsage:
+    __slots__ = ("rpcs", "documents_read", "documents_written")
+
+    def __init__(self):
+        self.rpcs = 0
+        self.documents_read = 0
+        self.documents_written = 0
+
+
+def record_rpc(documents_read: int = 0, documents_written: int = 0):
+    usage = _request_usage.get()
+    if usage is not None:
+        usage.rpcs += 1
+        usage.documents_read += documents_read
+        usage.documents_written += documents_written
+
+
+def _wrap_get(get):
+    @functools.wraps(get)
+    def wrapper(self, *args, **kwargs):
+        record_rpc(documents_read=1)
+        return get(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _wrap_stream(stream):
+    @functools.wraps(stream)
+    def wrapper(self, *args, **kwargs):
+        count = 0
+        try:
+            for snapshot in stream(self, *args, **kwargs):
+                count += 1
+                yield snapshot
+        finally:
+            # A query is billed at least one read even when it matches nothing
+            record_rpc(documents_read=max(count, 1))
+
+    return wrapper
+
+
+def _wrap_get_all(get_all):
+    @functools.wraps(get_all)
+    def wrapper(self, references, *args, **kwargs):
+        references = list(references)
+        record_rpc(documents_read=len(references))
+        return get_all(self, references, *args, **kwargs)
+
+    return wrapper
+
+
+def _wrap_commit(commit):
+    @functools.wraps(commit)
+    def wrapper(self, *args, **kwargs):
+        record_rpc(documents_written=len(self._write_pbs))
+        return commit(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _wrap_begin(begin):
+    @functools.wraps(begin)
+    def wrapper(self, *args, **kwargs):
+        record_rpc()
+        return begin(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _wrap_memory_rpc(rpc):
+    @functools.wraps(rpc)
+    def wrapper(self, documents_read=0, documents_written=0):
+        record_rpc(documents_read=documents_read, documents_written=documents_written)
+        return rpc(self, documents_read=documents_read, documents_written=documents_written)
+
+    return wrapper
+
+
+def instrument_firestore():
+    """
+    Wrap the Firestore client classes (and the in-memory stand-in) so RPCs are counted per request.
+    Safe to call more than once.
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    DocumentReference.get = _wrap_get(DocumentReference.get)
+    Query.stream = _wrap_stream(Query.stream)
+    Client.get_all = _wrap_get_all(Client.get_all)
+    WriteBatch.commit = _wrap_commit(WriteBatch.commit)
+    Transaction._begin = _wrap_begin(Transaction._begin)
+    Transaction._commit = _wrap_commit(Transaction._commit)
+    MemoryFirestore._rpc = _wrap_memory_rpc(MemoryFirestore._rpc)
+    _instrumented = True
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rpcs = 0
+        self.documents_read = 0
+        self.documents_written = 0
+        self.latency_sum_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteMetrics)
+
+    def observe(self, route: str, status_code: int, latency_ms: float, usage: RequestUsage):
+        with self._lock:
+            metrics = self._routes[route]
+            metrics.requests += 1
+            metrics.errors += status_code >= 500
+            metrics.rpcs += usage.rpcs
+            metrics.documents_read += usage.documents_read
+            metrics.documents_written += usage.documents_written
+            metrics.latency_sum_ms += latency_ms
+            for index, bound in enumerate(LATENCY_BUCKETS_MS):
+                if latency_ms <= bound:
+                    metrics.latency_buckets[index] += 1
+                    break
+            else:
+                metrics.latency_buckets[-1] += 1
+
+    def render(self) -> str:
+        """
+        Render all route metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            "# TYPE http_requests_total counter",
+            "# TYPE http_request_errors_total counter",
+            "# TYPE firestore_rpcs_total counter",
+            "# TYPE firestore_documents_read_total counter",
+            "# TYPE firestore_documents_written_total counter",
+            "# TYPE http_request_duration_ms histogram",
+        ]
+        with self._lock:
+            for route, metrics in sorted(self._routes.items()):
+                label = 'route="{}"'.format(route.replace('"', '\\"'))
+                lines.append(f"http_requests_total{{{label}}} {metrics.requests}")
+                lines.append(f"http_request_errors_total{{{label}}} {metrics.errors}")
+                lines.append(f"firestore_rpcs_total{{{label}}} {metrics.rpcs}")
+                lines.append(f"firestore_documents_read_total{{{label}}} {metrics.documents_read}")
+                lines.append(f"firestore_documents_written_total{{{label}}} {metrics.documents_written}")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_MS, metrics.latency_buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_ms_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_ms_bucket{{{label},le="+Inf"}} {metrics.requests}')
+                lines.append(f"http_request_duration_ms_sum{{{label}}} {metrics.latency_sum_ms:.3f}")
+                lines.append(f"http_request_duration_ms_count{{{label}}} {metrics.requests}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+class FirestoreMetricsMiddleware:
+    """
+    ASGI middleware timing every request and attributing its Firestore usage to the route template.
+    With ``METRICS_DEBUG_HEADERS`` the usage is also returned as ``X-Firestore-*`` response headers.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry,
+                 debug_headers: bool = METRICS_DEBUG_HEADERS):
+        self.app = app
+        self.registry = registry
+        self.debug_headers = debug_headers
+        self._route_paths = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return f"{scope['method']} unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            path = scope["path"]
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            self._route_paths[endpoint] = path
+        return f"{scope['method']} {path}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = RequestUsage()
+        token = _request_usage.set(usage)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_metrics(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.debug_headers:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-firestore-rpcs", str(usage.rpcs).encode()),
+                        (b"x-firestore-documents-read", str(usage.documents_read).encode()),
+                        (b"x-firestore-documents-written", str(usage.documents_written).encode()),
+                        (b"x-response-time-ms", f"{elapsed_ms:.1f}".encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_usage.reset(token)
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.registry.observe(self._route(scope), status_code, latency_ms, usage)
@@ -0,0 +1,141 @@
+import hashlib
+import os
+
+from starlette.datastructures import Headers
+
+# Conditional GET support. Responses of routes with a cache policy get a strong ETag and a
+# Cache-Control header; a request whose If-None-Match matches the ETag gets an empty 304.
+# Handlers that can derive the ETag cheaply (from a Firestore update_time or a cached body)
+# set it themselves and answer 304 before serializing; otherwise the body is hashed here.
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=60")
+ORDER_CACHE_CONTROL = os.getenv("ORDER_CACHE_CONTROL", "private, no-cache")
+
+# Feature routers whose GET routes serve catalog data, keyed by their top-level package
+CATALOG_PACKAGES = ("banners", "categories", "sub_category", "products")
+
+
+def cache_control(value: str):
+    """
+    Attach a Cache-Control policy to a route handler, enabling ETags for it.
+    """
+    def decorator(endpoint):
+        endpoint.cache_control = value
+        return endpoint
+
+    return decorator
+
+
+def strong_etag(body: bytes) -> str:
+    return '"{}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def update_time_etag(update_time) -> str:
+    """
+    Strong ETag for a response that is a pure function of one document version.
+    """
+    # DatetimeWithNanoseconds keeps the nanoseconds Firestore returns; plain datetimes have microseconds
+    nanos = getattr(update_time, "nanosecond", 0) or update_time.microsecond * 1000
+    return f'"{int(update_time.timestamp()):x}.{nanos:x}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Compare an If-None-Match header with ``etag`` using the weak comparison RFC 7232 requires.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque_tag:
+            return True
+    return False
+
+
+def not_modified_headers(etag: str, cache_control_value: str = None) -> list:
+    headers = [(b"etag", etag.encode())]
+    if cache_control_value:
+        headers.append((b"cache-control", cache_control_value.encode()))
+    return headers
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI middleware adding ETag/Cache-Control to GET responses of routes that have a cache policy
+    and turning matching If-None-Match requests into 304 responses.
+
+    A route has a policy when its handler was decorated with ``cache_control`` or lives in one of
+    ``catalog_packages``. Streamed responses only get the Cache-Control header.
+    """
+
+    def __init__(self, app, catalog_packages=CATALOG_PACKAGES, catalog_cache_control: str = CATALOG_CACHE_CONTROL):
+        self.app = app
+        self.catalog_packages = set(catalog_packages)
+        self.catalog_cache_control = catalog_cache_control
+        self._policies = {}
+
+    def _policy(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return None
+        if endpoint not in self._policies:
+            policy = getattr(endpoint, "cache_control", None)
+            if policy is None and getattr(endpoint, "__module__", "").split(".")[0] in self.catalog_packages:
+                policy = self.catalog_cache_control
+            self._policies[endpoint] = policy
+        return self._policies[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message = None
+        policy = None
+        passthrough = False
+
+        async def send_with_etag(message):
+            nonlocal start_message, policy, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                policy = self._policy(scope)
+                if policy is None or message["status"] not in (200, 304):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Hold the start message until the body is known
+                start_message = message
+                return
+
+            raw_headers = [(name, value) for name, value in start_message.get("headers", [])
+                           if name.lower() != b"cache-control"]
+            if message.get("more_body", False) or start_message["status"] == 304:
+                # Streamed or already answered by the handler: keep its ETag (if any) as is
+                passthrough = True
+                start_message["headers"] = raw_headers + [(b"cache-control", policy.encode())]
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            etag = Headers(raw=raw_headers).get("etag")
+            if etag is None:
+                etag = strong_etag(body)
+                raw_headers.append((b"etag", etag.encode()))
+            if etag_matches(if_none_match, etag):
+                await send({"type": "http.response.start", "status": 304,
+                            "headers": not_modified_headers(etag, policy)})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            start_message["headers"] = raw_headers + [(b"cache-control", policy.encode())]
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,74 @@
+import asyncio
+import importlib
+import logging
+import time
+
+from starlette.routing import Match
+
+
+class LazyRouters:
+    """
+    Feature routers included into the app either eagerly (``include_all``) or on demand.
+
+    In on-demand mode the modules (and the controllers and models they import) are imported
+    in a worker thread the first time ``ensure_loaded`` is awaited, so the process can accept
+    connections before they are loaded. Loaded routes are put in front of the app's own
+    routes, matching the precedence they have when included eagerly.
+    """
+
+    def __init__(self, app, module_names):
+        self.app = app
+        self.module_names = list(module_names)
+        self.loaded = False
+        self.load_seconds = None
+        self._lock = None
+
+    def _import_routers(self):
+        started = time.perf_counter()
+        routers = [importlib.import_module(module_name).router for module_name in self.module_names]
+        self.load_seconds = time.perf_counter() - started
+        return routers
+
+    def _include(self, routers, prepend: bool):
+        routes_before = list(self.app.router.routes)
+        for router in routers:
+            self.app.include_router(router)
+        if prepend:
+            new_routes = self.app.router.routes[len(routes_before):]
+            self.app.router.routes[:] = new_routes + routes_before
+        # The OpenAPI schema may have been generated without the feature routes
+        self.app.openapi_schema = None
+        self.loaded = True
+
+    def include_all(self):
+        self._include(self._import_routers(), prepend=False)
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.loaded:
+                return
+            routers = await asyncio.get_running_loop().run_in_executor(None, self._import_routers)
+            self._include(routers, prepend=True)
+            logging.info(f"Loaded {len(routers)} feature routers in {self.load_seconds:.3f}s")
+
+
+class LazyRouterMiddleware:
+    """
+    ASGI middleware that loads the feature routers before dispatching a request that no
+    already registered route can serve.
+    """
+
+    def __init__(self, app, lazy_routers: LazyRouters):
+        self.app = app
+        self.lazy_routers = lazy_routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and not self.lazy_routers.loaded:
+            routes = self.lazy_routers.app.router.routes
+            if not any(route.matches(scope)[0] == Match.FULL for route in routes):
+                await self.lazy_routers.ensure_loaded()
+        await self.app(scope, receive, send)
@@ -1,62 +1,86 @@
+import asyncio
+import bisect
 import logging
+import os
 import traceback
-import uuid
 from typing import List, Optional
-from datetime import datetime, timezone
-import firebase_admin
-from fastapi import FastAPI, HTTPException
-from firebase_admin import credentials, firestore
+from datetime import date, datetime, timezone
+from fastapi import FastAPI, HTTPException, Query, Request
+from firebase_admin import firestore
 from starlette import status
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
 
 from add_new_stock.model.add_new_stock_model import AddNewStockModel
 from coupons.model.coupon_model import CouponsModelIn, CouponsModelOut
 from orders.models.orders_model import OrderStatus, Refund, OrderOut, RiderInfo, BaseOrder, OrderIn
 from product_requests.model.product_request_model import ProductRequestModel, ProductRequestStatus
 from products.model.product_model import Product, ProductModelOut
-from users.view.user_view import router as views_users_router
-from user_address.view.address_view import router as views_address_router
-from stores.view.store_view import router as views_store_router
-# from orders.view.orders_view import router as views_orders_router
-from messages.view.messages_view import router as views_messages_router
-from products.view.product_view import router as views_product_router
-from products.view.product_bundle_view import router as views_product_bundle_router
-from categories.view.category_view import router as views_category_router
-from sub_category.view.sub_category_view import router as views_sub_category_router
-from store_managers.view.store_manager_view import router as views_store_manager_router
-from banners.view.banner_view import router as views_banner_router
-from coupons.view.coupons_view import router as views_coupon_router
-from inventory.view.inventory_view import router as view_inventory_router
-from riders.view.rider_view import router as views_rider_router
-from product_requests.view.product_request_view import router as products_request_view
-from add_new_stock.view.add_new_stock_view import router as add_new_stock_view
-from inventory.view.remove_stock_view import router as remove_stock_view
-from complaints.view.complaints_view import router as complaints_view
+from admission_control import (ADMISSION_CONTROL_ENABLED, EXEMPT, EXPORT, READ, SCAN, AdmissionControlMiddleware,
+                               admission_controller, paged_route_class, route_class)
+from bulk_orders import (JOB_BACKFILL_CREATED_TIMESTAMP, JOB_BACKFILL_MODIFIED_TIMESTAMP, JOB_STATUS_CHANGE,
+                         BulkStatusChange, create_job, get_job, is_resumable, run_job)
+from catalog_cache import MISSING, catalog_cache
+from controller_container import controller_container
+from daily_rollups import (STOCK_STORE_FIELD, merge_deltas, order_transition_deltas, read_daily_rollups,
+                           record_order_transition, record_rollup_deltas, refund_change_deltas, rollup_writes,
+                           stock_intake_deltas, validate_report_range)
+from exports import csv_text, get_dataset, iter_chunks, parse_date, row_columns
+from fast_json import FastJSONResponse, trusted_response
+from firestore_client import FirestoreClientMiddleware, LazyFirestoreClient, ensure_firestore_client, warm_up_firestore
+from firestore_executor import run_firestore, shutdown_executor
+from firestore_metrics import FirestoreMetricsMiddleware, instrument_firestore, metrics_registry
+from http_caching import (CATALOG_CACHE_CONTROL, ORDER_CACHE_CONTROL, ConditionalGetMiddleware, cache_control,
+                          etag_matches, strong_etag, update_time_etag)
+from lazy_routers import LazyRouterMiddleware, LazyRouters
+from order_counters import read_status_counts, rebuild_status_counts, record_status_change
+from order_ids import generate_order_id
+from order_transitions import order_snapshot, transition_order
+from order_views import ORDER_VIEWS_ENABLED, order_status_view
+from order_write_batcher import ORDER_WRITE_BATCHING, order_write_batcher
+from pagination import (DEFAULT_PAGE_SIZE, DOCUMENT_ID, MAX_PAGE_SIZE, encode_page_token, fetch_page, ndjson_response,
+                        parse_fields, project)
+from product_search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, PRODUCT_SEARCH_ENABLED, product_search_index
+from single_flight import single_flight
+
+# With FAST_STARTUP the feature routers are imported after the server starts accepting
+# connections, and Firebase is initialized by the startup hook instead of at import.
+FAST_STARTUP = os.getenv("FAST_STARTUP", "false").lower() == "true"
 
 app = FastAPI()
-cred = credentials.Certificate("source.json")
-firebase_admin.initialize_app(cred)
-firestore_db = firestore.client()
+firestore_db = LazyFirestoreClient()
 
 # Include routers
-app.include_router(views_users_router)
-app.include_router(views_address_router)
-app.include_router(views_store_router)
-app.include_router(views_product_router)
-# app.include_router(views_orders_router)
-app.include_router(views_messages_router)
-app.include_router(views_product_bundle_router)
-app.include_router(views_category_router)
-app.include_router(views_sub_category_router)
-app.include_router(views_store_manager_router)
-app.include_router(views_banner_router)
-app.include_router(views_coupon_router)
-app.include_router(view_inventory_router)
-app.include_router(views_rider_router)
-app.include_router(products_request_view)
-app.include_router(add_new_stock_view)
-app.include_router(remove_stock_view)
-app.include_router(complaints_view)
+feature_routers = LazyRouters(app, [
+    "users.view.user_view",
+    "user_address.view.address_view",
+    "stores.view.store_view",
+    "products.view.product_view",
+    # "orders.view.orders_view",
+    "messages.view.messages_view",
+    "products.view.product_bundle_view",
+    "categories.view.category_view",
+    "sub_category.view.sub_category_view",
+    "store_managers.view.store_manager_view",
+    "banners.view.banner_view",
+    "coupons.view.coupons_view",
+    "inventory.view.inventory_view",
+    "riders.view.rider_view",
+    "product_requests.view.product_request_view",
+    "add_new_stock.view.add_new_stock_view",
+    "inventory.view.remove_stock_view",
+    "complaints.view.complaints_view",
+])
+if FAST_STARTUP:
+    app.add_middleware(LazyRouterMiddleware, lazy_routers=feature_routers)
+    app.add_middleware(FirestoreClientMiddleware)
+else:
+    feature_routers.include_all()
+
+app.add_middleware(ConditionalGetMiddleware)
+if ADMISSION_CONTROL_ENABLED:
+    # Inside CORS so shed responses still carry the CORS headers browsers need to read them
+    app.add_middleware(AdmissionControlMiddleware)
 
 origins = [
     "https://effdelbackendapis.el.r.appspot.com",
@@ -72,6 +96,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument_firestore()
+app.add_middleware(FirestoreMetricsMiddleware)
+
+
+def log_background_failure(task: asyncio.Future):
+    if not task.cancelled() and task.exception():
+        logging.error("Background task failed", exc_info=task.exception())
+
+
+async def warm_up_firestore_in_background():
+    # Requests arriving meanwhile wait for this client creation in FirestoreClientMiddleware
+    await ensure_firestore_client()
+    await run_firestore(warm_up_firestore)
+
+
+@app.on_event("startup")
+async def warm_up():
+    if FAST_STARTUP:
+        # Do not hold up serving; the first request needing either waits for it
+        for warm_up_task in (warm_up_firestore_in_background(), feature_routers.ensure_loaded()):
+            asyncio.ensure_future(warm_up_task).add_done_callback(log_background_failure)
+    else:
+        await run_firestore(warm_up_firestore)
+    if ORDER_VIEWS_ENABLED:
+        # Registering the listener initializes Firestore, so keep it off the event loop
+        asyncio.ensure_future(run_firestore(order_status_view.start, firestore_db)).add_done_callback(
+            log_background_failure)
+    if PRODUCT_SEARCH_ENABLED:
+        asyncio.ensure_future(run_firestore(product_search_index.start, firestore_db)).add_done_callback(
+            log_background_failure)
+
+
+# App Engine warmup request, sent before a new instance receives traffic
+@app.get("/_ah/warmup")
+@route_class(EXEMPT)
+async def warmup_request():
+    await feature_routers.ensure_loaded()
+    await run_firestore(warm_up_firestore)
+    return {"message": "warm"}
+
+
+@app.on_event("shutdown")
+async def shutdown_firestore_executor():
+    await order_write_batcher.close()
+    order_status_view.stop()
+    product_search_index.stop()
+    controller_container.close()
+    shutdown_executor()
+
 
 @app.get("/")
 async def root():
@@ -83,11 +156,20 @@ async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
 
-def generate_order_id():
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]  # Current timestamp with milliseconds
-    random_digits = uuid.uuid4().hex[:6]  # 6 random hexadecimal digits
-    order_id = f"{timestamp}{random_digits}"
-    return order_id
+@app.get("/metrics", response_class=PlainTextResponse)
+@route_class(EXEMPT)
+async def get_metrics():
+    metrics = metrics_registry.render() + single_flight.render()
+    if ADMISSION_CONTROL_ENABLED:
+        metrics += admission_controller.render()
+    if ORDER_WRITE_BATCHING:
+        return metrics + order_write_batcher.render()
+    return metrics
+
+
+def forget_order_reads(order_id: str):
+    # Reads starting after a write must not share a fetch (or recent result) from before it
+    single_flight.forget_document(firestore_db.collection("Orders").document(order_id))
 
 
 # create order
@@ -101,78 +183,227 @@ async def create_order(order: BaseOrder):
     order_dict = order.dict()
     order_dict["order_id"] = order_id
     order_dict["order_status"] = order_status_value  # Use the converted value
+    order_dict["created_timestamp"] = datetime.now(timezone.utc)  # Never changes, exports page on it
 
-    firestore_db.collection('Orders').document(order_id).set(order_dict)
+    order_ref = firestore_db.collection('Orders').document(order_id)
+    if ORDER_WRITE_BATCHING:
+        # Committed together with the orders of concurrent requests
+        rollup_deltas = order_transition_deltas(order_dict, new_status=order_status_value)
+        await order_write_batcher.submit(lambda batch: batch.set(order_ref, order_dict),
+                                         status_deltas={order_status_value: 1}, rollup_deltas=rollup_deltas)
+    else:
+        batch = firestore_db.batch()
+        batch.set(order_ref, order_dict)
+        record_status_change(firestore_db, batch, new_status=order_status_value)
+        record_order_transition(firestore_db, batch, order_dict, new_status=order_status_value)
+        await run_firestore(batch.commit)
+    forget_order_reads(order_id)
 
     return {"message": "Order created successfully", "order": order_dict}
 
 
 # Endpoint to get all orders
 @app.get("/orders/")
-async def get_all_orders():
-    orders = firestore_db.collection('Orders').stream()
-    return [order.to_dict() for order in orders]
+@route_class(paged_route_class)
+async def get_all_orders(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                         page_token: Optional[str] = None,
+                         stream: bool = False,
+                         fields: Optional[str] = None):
+    """
+    Without ``limit``/``page_token`` the full list is returned (legacy behaviour).
+    With them, one page ordered by order ID (not creation time) plus a ``next_page_token`` is returned.
+    ``stream=true`` writes every order as NDJSON while Firestore yields it.
+    ``fields=a,b`` only reads and returns those fields of each order.
+    """
+    field_paths = parse_fields(fields)
+    orders_ref = firestore_db.collection('Orders')
+    if stream:
+        return ndjson_response(orders_ref, field_paths)
+    if limit or page_token:
+        query = orders_ref.order_by(DOCUMENT_ID)
+        orders, next_page_token = await fetch_page(query, [DOCUMENT_ID], limit or DEFAULT_PAGE_SIZE, page_token,
+                                                   field_paths)
+        return FastJSONResponse({"orders": orders, "next_page_token": next_page_token})
+    query = project(orders_ref, field_paths)
+    return FastJSONResponse(await run_firestore(lambda: [order.to_dict() for order in query.stream()]))
+
+
+# Server-Sent Events with order status and rider changes, for the store manager and rider dashboards
+@app.get("/orders/events")
+@route_class(EXEMPT)
+async def order_events(status: Optional[List[OrderStatus]] = Query(None)):
+    if not ORDER_VIEWS_ENABLED:
+        raise HTTPException(status_code=404, detail="Order events are not enabled")
+    statuses = [order_status.value for order_status in status or ()]
+    return StreamingResponse(order_status_view.events(statuses), media_type="text/event-stream",
+                             headers={"cache-control": "no-cache", "x-accel-buffering": "no"})
 
 
 # Endpoint to get orders based on order id
 @app.get("/orders/{order_id}")
-async def get_order(order_id: str):
+@cache_control(ORDER_CACHE_CONTROL)
+async def get_order(order_id: str, request: Request):
     try:
         doc_ref = firestore_db.collection("Orders").document(order_id)
-        doc = doc_ref.get()
+        # Shared with concurrent reads of the same order
+        doc = await single_flight.get_document(doc_ref)
         if doc.exists:
-            return doc.to_dict()
+            # The response is the stored document, so its version is a strong validator
+            etag = update_time_etag(doc.update_time)
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": etag})
+            return FastJSONResponse(doc.to_dict(), headers={"etag": etag})
         else:
-            return HTTPException(status_code=404, detail="Order not found")
+            raise HTTPException(status_code=404, detail="Order not found")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"An error occurred: {e}")
-        return HTTPException(status_code=500, detail="Internal Server Error")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 # Endpoint to get orders by user ID
 @app.get("/orders/user/{user_id}/")
-async def get_orders_by_user_id(user_id: str):
-    orders = firestore_db.collection('Orders').where("user_id", "==", user_id).stream()
-    return [order.to_dict() for order in orders]
+async def get_orders_by_user_id(user_id: str, fields: Optional[str] = None):
+    query = project(firestore_db.collection('Orders').where("user_id", "==", user_id), parse_fields(fields))
+    return FastJSONResponse(await run_firestore(lambda: [order.to_dict() for order in query.stream()]))
 
 
 # Endpoint to update order status by order ID
 @app.put("/orders/{order_id}/status/")
 async def update_order_status(order_id: str, new_status: OrderStatus):
-    order_ref = firestore_db.collection('Orders').document(order_id)
-    order = order_ref.get()
-    if order.exists:
-        order_ref.update({"order_status": new_status.value, "modified_timestamp": datetime.now(timezone.utc)})
-        return {"message": "Order status updated successfully"}
-    else:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-
-@app.get('/123orders/timestamp')
-async def update_order_timestamp():
-    order_ref = firestore_db.collection('Orders').get()
+    def plan(order: dict) -> dict:
+        return {"order_status": new_status.value, "modified_timestamp": datetime.now(timezone.utc)}
+
+    await run_firestore(transition_order, firestore_db, order_id, plan)
+    forget_order_reads(order_id)
+    return {"message": "Order status updated successfully"}
+
+
+# Bulk order jobs run in the background and report progress in BulkJobs/{job_id}
+def start_bulk_job(job_id: str):
+    # Not a BackgroundTask: those run inside the request, which would hold its admission slot
+    # and count towards its latency for the whole job
+    asyncio.get_running_loop().run_in_executor(None, run_job, firestore_db, job_id).add_done_callback(
+        log_background_failure)
+
+
+@app.post("/admin/bulk_jobs/order_status", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_update_order_status(change: BulkStatusChange):
+    params = {"order_ids": list(dict.fromkeys(change.order_ids)), "new_status": change.new_status.value}
+    job_id = await run_firestore(create_job, firestore_db, JOB_STATUS_CHANGE, params)
+    start_bulk_job(job_id)
+    return {"job_id": job_id}
+
+
+@app.post("/admin/bulk_jobs/backfill/modified_timestamp", status_code=status.HTTP_202_ACCEPTED)
+async def backfill_order_timestamp():
+    job_id = await run_firestore(create_job, firestore_db, JOB_BACKFILL_MODIFIED_TIMESTAMP, {})
+    start_bulk_job(job_id)
+    return {"job_id": job_id}
+
+
+@app.post("/admin/bulk_jobs/backfill/created_timestamp", status_code=status.HTTP_202_ACCEPTED)
+async def backfill_order_created_timestamp():
+    job_id = await run_firestore(create_job, firestore_db, JOB_BACKFILL_CREATED_TIMESTAMP, {})
+    start_bulk_job(job_id)
+    return {"job_id": job_id}
+
+
+@app.get("/admin/bulk_jobs/{job_id}")
+async def get_bulk_job(job_id: str):
+    job = await run_firestore(get_job, firestore_db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    return job
+
+
+@app.post("/admin/bulk_jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_bulk_job(job_id: str):
+    job = await run_firestore(get_job, firestore_db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    if not is_resumable(job):
+        raise HTTPException(status_code=409, detail=f"Bulk job is {job['status']}")
+    start_bulk_job(job_id)
+    return {"job_id": job_id}
+
+
+async def _export_csv_lines(dataset, start, end, cursor, after_index):
+    chunks = await run_firestore(iter_chunks, firestore_db, dataset, start, end, cursor, after_index)
+    columns = None
+    while True:
+        chunk = await run_firestore(next, chunks, None)
+        if chunk is None:
+            break
+        rows, _ = chunk
+        header = columns is None
+        columns = columns or row_columns(rows)
+        yield csv_text(rows, columns, header=header)
+
+
+# Finance exports: orders, order_items, order_refunds or stock_movements in [start, end) as CSV
+@app.get("/exports/{dataset}.csv")
+@route_class(EXPORT)
+async def export_csv(dataset: str, start: str, end: str, after_date: Optional[str] = None,
+                     after_id: Optional[str] = None, after_index: Optional[int] = None):
+    """
+    Streams the export without holding it in memory. An interrupted download is resumed with
+    ``after_date``/``after_id`` set to the date and ``document_id`` columns of the last row received,
+    plus ``after_index`` set to its ``index`` column for order_items and order_refunds.
+    """
+    export_dataset = get_dataset(dataset)
+    cursor = None
+    if after_date and after_id:
+        cursor = encode_page_token({export_dataset.date_field: parse_date(after_date), DOCUMENT_ID: after_id})
+    return StreamingResponse(_export_csv_lines(export_dataset, parse_date(start), parse_date(end), cursor,
+                                               after_index),
+                             media_type="text/csv",
+                             headers={"content-disposition": f'attachment; filename="{dataset}.csv"'})
 
-    now = datetime.now(timezone.utc)
 
-    # order_ref.fo
-    print(order_ref)
-    for order in order_ref:
-        order.update({"modified_timestamp": now})
+# Endpoint to get orders based on orders status
+def orders_by_status_route_class(query_params) -> str:
+    # Served from the order status view unless streamed, so no scan
+    name = paged_route_class(query_params)
+    if name != EXPORT and order_status_view.covers(query_params.get("status", "")):
+        return READ
+    return name
 
 
-# Endpoint to get orders based on orders status
 @app.get("/get_orders_by_status")
-async def get_orders_by_status(status: OrderStatus):
+@route_class(orders_by_status_route_class)
+async def get_orders_by_status(status: OrderStatus,
+                               limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                               page_token: Optional[str] = None,
+                               stream: bool = False,
+                               fields: Optional[str] = None):
+    field_paths = parse_fields(fields)
+    if not stream and order_status_view.covers(status.value):
+        # Served from the snapshot-fed view, no Firestore reads
+        if limit or page_token:
+            orders, next_page_token = order_status_view.page(status.value, limit or DEFAULT_PAGE_SIZE, page_token,
+                                                             field_paths)
+            return FastJSONResponse({"orders": orders, "next_page_token": next_page_token})
+        return FastJSONResponse(order_status_view.page(status.value, fields=field_paths)[0])
     orders_ref = firestore_db.collection('Orders').where("order_status", "==", status.value).order_by(
         'modified_timestamp', direction=firestore.Query.DESCENDING)
-    orders = orders_ref.stream()
-    return [order.to_dict() for order in orders]
+    if stream:
+        return ndjson_response(orders_ref, field_paths)
+    if limit or page_token:
+        # Document ID as tie-breaker keeps the cursor unique for equal timestamps.
+        query = orders_ref.order_by(DOCUMENT_ID, direction=firestore.Query.DESCENDING)
+        orders, next_page_token = await fetch_page(query, ['modified_timestamp', DOCUMENT_ID],
+                                                   limit or DEFAULT_PAGE_SIZE, page_token, field_paths)
+        return FastJSONResponse({"orders": orders, "next_page_token": next_page_token})
+    query = project(orders_ref, field_paths)
+    return FastJSONResponse(await run_firestore(lambda: [order.to_dict() for order in query.stream()]))
 
 
 @app.get("/orders/{order_id}")
 async def get_order(order_id: str):
     order_ref = firestore_db.collection("Orders").document(order_id)
-    order_doc = order_ref.get()
+    order_doc = await run_firestore(order_ref.get)
     if not order_doc.exists:
         raise HTTPException(status_code=404, detail="Order not found")
     order_data = order_doc.to_dict()
@@ -181,11 +412,25 @@ async def get_order(order_id: str):
     return order_data
 
 
+@firestore.transactional
+def update_order_in_transaction(transaction, order_ref, order_data_dict: dict):
+    new_status = order_data_dict.get("order_status")
+    if new_status is not None:
+        order_data_dict["order_status"] = getattr(new_status, "value", new_status)
+        order = order_ref.get(transaction=transaction)
+        old_order = order.to_dict() if order.exists else {}
+        old_status = old_order.get("order_status")
+        record_status_change(firestore_db, transaction, old_status, order_data_dict["order_status"])
+        record_order_transition(firestore_db, transaction, {**old_order, **order_data_dict}, old_status,
+                                order_data_dict["order_status"])
+    transaction.update(order_ref, order_data_dict)
+
+
 def update_order(order_id: str, order_data: OrderIn):
     # Assuming `order_id` is the Firestore document ID
     order_ref = firestore_db.collection('Orders').document(order_id)
     order_data_dict = order_data.dict(exclude_unset=True)  # Convert Pydantic model to dict excluding unset fields
-    order_ref.update(order_data_dict)
+    update_order_in_transaction(firestore_db.transaction(), order_ref, order_data_dict)
 
 
 # FastAPI endpoint to update an order by order_id
@@ -195,7 +440,8 @@ async def update_order_by_id(
         order_data: OrderIn  # Use OrderIn model for input data
 ):
     try:
-        update_order(order_id, order_data)
+        await run_firestore(update_order, order_id, order_data)
+        forget_order_reads(order_id)
         return {"message": f"Order {order_id} updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update order: {str(e)}")
@@ -223,69 +469,142 @@ def get_orders() -> List[BaseOrder]:
 
 @app.get('/order_status_count', response_model=dict)
 async def order_status_count() -> dict:
-    orders = get_orders()
-    status_count = {status.value: sum(1 for order in orders if order.order_status == status) for status in OrderStatus}
+    counts = await run_firestore(read_status_counts, firestore_db)
+    status_count = {status.value: counts.get(status.value, 0) for status in OrderStatus}
     return status_count
 
 
+# Recounts all orders in one pass, e.g. after enabling the counters or a manual data fix
+@app.post('/admin/order_status_count/rebuild', response_model=dict)
+@route_class(SCAN)
+async def rebuild_order_status_count() -> dict:
+    counts = await run_firestore(rebuild_status_counts, firestore_db)
+    return {status.value: counts.get(status.value, 0) for status in OrderStatus}
+
+
+# When enabled, assign_rider stores a copy of the rider document on the order so order reads
+# do not need a second lookup on riders
+RIDER_SNAPSHOT_ENABLED = os.getenv("RIDER_SNAPSHOT_ENABLED", "false").lower() == "true"
+MAX_BATCH_ORDER_IDS = 100
+
+
 @app.put("/orders/{order_id}/assign_rider")
 async def assign_rider(order_id: str, rider_info: RiderInfo):
     # Check if order exists
     order_ref = firestore_db.collection("Orders").document(order_id)
-    order_doc = order_ref.get()
-    if not order_doc.exists:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    # Update rider information in the order document
-    order_ref.update({
+    order_update = {
         "rider_name": rider_info.rider_name,
         "rider_id": rider_info.rider_id
-    })
+    }
+    snapshot = None
+    if RIDER_SNAPSHOT_ENABLED:
+        rider_ref = firestore_db.collection("riders").document(rider_info.rider_id)
+        # Order and rider are read in one batched call
+        snapshots = await run_firestore(lambda: list(firestore_db.get_all([order_ref, rider_ref])))
+        docs = {doc.reference.path: doc for doc in snapshots}
+        snapshot = order_snapshot(docs[order_ref.path])
+        rider_doc = docs[rider_ref.path]
+        if rider_doc.exists:
+            order_update["rider_snapshot"] = {"name": rider_doc.to_dict().get("name"),
+                                              "captured_at": datetime.now(timezone.utc)}
+
+    def plan(order: dict) -> dict:
+        if order.get("order_status") == OrderStatus.DELIVERED.value:
+            raise HTTPException(status_code=409, detail="Order is already delivered")
+        return order_update
+
+    # Update rider information in the order document, unless it was delivered in the meantime
+    await run_firestore(transition_order, firestore_db, order_id, plan, snapshot)
+    forget_order_reads(order_id)
 
     return {"message": f"Rider assigned to order {order_id}"}
 
 
+def attach_rider_names(orders: List[dict]):
+    """
+    Fill ``rider_name`` on each order from its rider snapshot, or from the riders collection
+    with a single batched read for all distinct riders that have no snapshot.
+    """
+    rider_ids = {order["rider_id"] for order in orders if order.get("rider_id") and not order.get("rider_snapshot")}
+    rider_names = {}
+    if rider_ids:
+        rider_refs = [firestore_db.collection("riders").document(rider_id) for rider_id in rider_ids]
+        rider_names = {doc.id: doc.to_dict().get("name") for doc in firestore_db.get_all(rider_refs) if doc.exists}
+    for order in orders:
+        if order.get("rider_snapshot"):
+            order["rider_name"] = order["rider_snapshot"].get("name")
+        elif order.get("rider_id") in rider_names:
+            order["rider_name"] = rider_names[order["rider_id"]]
+
+
+def get_orders_with_riders(order_ids: List[str]) -> List[dict]:
+    order_refs = [firestore_db.collection("Orders").document(order_id) for order_id in order_ids]
+    orders_by_id = {doc.id: doc.to_dict() for doc in firestore_db.get_all(order_refs) if doc.exists}
+    orders = [orders_by_id[order_id] for order_id in order_ids if order_id in orders_by_id]
+    attach_rider_names(orders)
+    return orders
+
+
+# Endpoint to fetch many orders at once, e.g. for the store manager order cards
+@app.post("/orders/batch", response_model=List[OrderOut])
+async def get_orders_batch(order_ids: List[str]):
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > MAX_BATCH_ORDER_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ORDER_IDS} order ids per request")
+    return trusted_response(OrderOut, await run_firestore(get_orders_with_riders, order_ids))
+
+
 @app.get("/orders/{order_id}", response_model=OrderOut)
 async def get_order(order_id: str):
     # Retrieve order data from Firestore
     order_ref = firestore_db.collection("Orders").document(order_id)
-    order_doc = order_ref.get()
+    order_doc = await run_firestore(order_ref.get)
     if not order_doc.exists:
         raise HTTPException(status_code=404, detail="Order not found")
 
     order_data = order_doc.to_dict()
 
     # Fetch additional rider data based on rider_id
-    rider_id = order_data.get("rider_id")
-    if rider_id:
-        rider_ref = firestore_db.collection("riders").document(rider_id)
-        rider_doc = rider_ref.get()
-        if rider_doc.exists:
-            rider_data = rider_doc.to_dict()
-            order_data["rider_name"] = rider_data.get("name")
+    await run_firestore(attach_rider_names, [order_data])
 
     return order_data
 
 
-@app.put("/refund/{order_id}")
-async def update_refunds(order_id: str, refunds: List[Refund]):
-    # Retrieve order data from Firestore
-    order_ref = firestore_db.collection("Orders").document(order_id)
-    order_doc = order_ref.get()
+@firestore.transactional
+def replace_refunds_in_transaction(transaction, order_ref, refunds: List[dict]):
+    order_doc = order_ref.get(transaction=transaction)
     if not order_doc.exists:
         raise HTTPException(status_code=404, detail="Order not found")
+    order_data = order_doc.to_dict()
+
+    # Update order document with new refund data, and the day's refund rollup with the difference
+    transaction.update(order_ref, {"refunds": refunds})
+    rollup_deltas = refund_change_deltas(order_data, order_data.get("refunds"), refunds)
+    record_rollup_deltas(firestore_db, transaction, rollup_deltas)
 
-    # Update order document with new refund data
-    order_ref.update({"refunds": [refund.dict() for refund in refunds]})
+
+@app.put("/refund/{order_id}")
+async def update_refunds(order_id: str, refunds: List[Refund]):
+    order_ref = firestore_db.collection("Orders").document(order_id)
+    await run_firestore(replace_refunds_in_transaction, firestore_db.transaction(), order_ref,
+                        [refund.dict() for refund in refunds])
+    forget_order_reads(order_id)
 
     return {"message": "Refund data updated successfully"}
 
 
+# Sales, refund and stock totals per day from the daily rollups, for one store or summed over all of them
+@app.get("/reports/daily")
+async def get_daily_report(start: date, end: date, store_id: Optional[str] = None):
+    validate_report_range(start, end)
+    return FastJSONResponse(await run_firestore(read_daily_rollups, firestore_db, start, end, store_id))
+
+
 @app.get("/get_refund/{order_id}", response_model=List[Refund])
 async def get_refunds(order_id: str):
     # Retrieve order data from Firestore
     order_ref = firestore_db.collection("Orders").document(order_id)
-    order_doc = order_ref.get()
+    order_doc = await single_flight.get_document(order_ref)
 
     if not order_doc.exists:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -294,55 +613,93 @@ async def get_refunds(order_id: str):
     order_data = order_doc.to_dict()
     refunds = order_data.get("refunds", [])
 
-    return refunds
+    return trusted_response(Refund, refunds)
+
+
+def pickup_plan(rider_id: str):
+    def plan(order: dict) -> dict:
+        # Only a pending order can be picked up, so of concurrent pickups exactly one succeeds
+        if order.get('order_status') != OrderStatus.PENDING.value:
+            raise HTTPException(status_code=409, detail="Order is not in progress")
+        return {'order_status': OrderStatus.DELIVERED.value, 'rider_id': rider_id}
+    return plan
 
 
 @app.put("/rider/pickup/{order_id}")
 async def pickup_order(order_id: str, rider_id: str):
     try:
-        # Check if order exists and is in progress
-        order_ref = firestore_db.collection('Orders').document(order_id)
-        order_doc = order_ref.get()
-        if not order_doc.exists:
-            raise HTTPException(status_code=404, detail="Order not found")
-        order_data = order_doc.to_dict()
-        if order_data['order_status'] != OrderStatus.PENDING.value:
-            raise HTTPException(status_code=400, detail="Order is not in progress")
-
-        # Update order status to indicate pickup by rider
-        order_ref.update({'order_status': OrderStatus.DELIVERED.value, 'rider_id': rider_id})
+        await run_firestore(transition_order, firestore_db, order_id, pickup_plan(rider_id))
+        forget_order_reads(order_id)
 
         return {"message": "Order picked up successfully by rider"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Served from the in-process index without reading Firestore
+@app.get("/products/search", response_model=List[Product])
+@cache_control(CATALOG_CACHE_CONTROL)
+async def search_products(q: str = Query(..., min_length=1, max_length=200),
+                          limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+                          sub_category_id: Optional[str] = None):
+    if not product_search_index.ready:
+        raise HTTPException(status_code=503, detail="Product search is not available")
+    return trusted_response(Product, product_search_index.search(q, limit, sub_category_id))
+
+
 @app.get("/get_products_based/{sub_category_id}", response_model=List[Product])
-async def get_products_by_subcategory(sub_category_id: str):
+@cache_control(CATALOG_CACHE_CONTROL)
+async def get_products_by_subcategory(sub_category_id: str, fields: Optional[str] = None):
+    field_paths = parse_fields(fields)
+    cache_key = ("get_products_by_subcategory", sub_category_id, tuple(field_paths or ()))
+    cached_products = catalog_cache.get("products", cache_key)
+    if cached_products is not MISSING:
+        # A fresh response per hit, so middleware adding headers never touches the cached entry
+        body, etag = cached_products
+        return Response(body, media_type="application/json", headers={"etag": etag})
     products_ref = firestore_db.collection('Products')
-    query = products_ref.where('sub_category_id', '==', sub_category_id).stream()
-    matched_products = []
-    for doc in query:
-        product_data = doc.to_dict()
-        product = Product(**product_data)
-        matched_products.append(product)
-    if not matched_products:
+    query = project(products_ref.where('sub_category_id', '==', sub_category_id), field_paths)
+    # Concurrent cache misses for the same sub-category share one query
+    docs = await single_flight.do("Products", cache_key, lambda: run_firestore(lambda: list(query.stream())))
+    if field_paths:
+        # Sparse documents do not satisfy the Product model, so they are returned as projected
+        matched_products = FastJSONResponse([doc.to_dict() for doc in docs])
+    else:
+        matched_products = trusted_response(Product, (doc.to_dict() for doc in docs))
+    if not docs:
         raise HTTPException(status_code=404, detail="Products not found")
+    # Hashed once per cache fill instead of on every conditional request
+    etag = strong_etag(matched_products.body)
+    matched_products.headers["etag"] = etag
+    catalog_cache.set("products", cache_key, (matched_products.body, etag))
     return matched_products
 
 
-ranges = {
-    "0-100": (0, 100),
-    "100-200": (100, 200),
-    "200+": (200, float('inf'))
-}
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return catalog_cache.stats()
+
+
+def parse_inventory_ranges(boundaries: str) -> dict:
+    # "0,100,200" -> {"0-100": (0, 100), "100-200": (100, 200), "200+": (200, inf)}
+    bounds = sorted(int(bound) for bound in boundaries.split(",") if bound.strip())
+    inventory_ranges = {f"{start}-{end}": (start, end) for start, end in zip(bounds, bounds[1:])}
+    inventory_ranges[f"{bounds[-1]}+"] = (bounds[-1], float('inf'))
+    return inventory_ranges
+
+
+ranges = parse_inventory_ranges(os.getenv("INVENTORY_RANGE_BOUNDARIES", "0,100,200"))
+range_starts = [start for start, _ in ranges.values()]
+range_keys = list(ranges)
 
 
 def categorize_inventory(inventory: int) -> str:
-    for key, (start, end) in ranges.items():
-        if start <= inventory < end:
-            return key
-    return "Unknown"
+    index = bisect.bisect_right(range_starts, inventory) - 1
+    if index < 0:
+        return "Unknown"
+    return range_keys[index]
 
 
 # async def get_products_range(inventory_range: str) -> List[ProductModelOut]:
@@ -379,24 +736,39 @@ def categorize_inventory(inventory: int) -> str:
 #     return products
 #
 @app.get("/products_inventory_range/", )
-async def get_products_range(inventory_range: str = None) -> List[dict]:
-    products = []
-    # Fetch products from Firestore
-    products_ref = firestore_db.collection('Products')
-    query = products_ref.stream()
+@route_class(paged_route_class)
+async def get_products_range(inventory_range: str = None,
+                             limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                             page_token: Optional[str] = None):
+    query = firestore_db.collection('Products')
+    order_fields = [DOCUMENT_ID]
+    if inventory_range:
+        if inventory_range not in ranges:
+            raise HTTPException(status_code=400, detail=f"Unknown inventory range, expected one of {range_keys}")
+        # Filter in Firestore so only the products in the range are read
+        start, end = ranges[inventory_range]
+        query = query.where('current_inventory', '>=', start)
+        if end != float('inf'):
+            query = query.where('current_inventory', '<', end)
+        order_fields = ['current_inventory', DOCUMENT_ID]
+
+    next_page_token = None
+    if limit or page_token:
+        for field in order_fields:
+            query = query.order_by(field)
+        products, next_page_token = await fetch_page(query, order_fields, limit or DEFAULT_PAGE_SIZE, page_token)
+    else:
+        products = await run_firestore(lambda: [doc.to_dict() for doc in query.stream()])
 
-    for doc in query:
-        product = doc.to_dict()
+    for product in products:
         # Categorize current inventory
         product['inventory_range'] = categorize_inventory(product['current_inventory'])
-        products.append(product)
 
-    if inventory_range:
-        # Filter products based on inventory range
-        products = [product for product in products if product['inventory_range'] == inventory_range]
-        if not products:
-            raise HTTPException(status_code=404, detail="No products found for the specified inventory range")
+    if inventory_range and not products:
+        raise HTTPException(status_code=404, detail="No products found for the specified inventory range")
 
+    if limit or page_token:
+        return {"products": products, "next_page_token": next_page_token}
     return products
 
 
@@ -433,66 +805,124 @@ async def get_products_range(inventory_range: str = None) -> List[dict]:
 #     return paginated_products
 
 
-inventory_ref = firestore_db.collection('Products')
-product_request_ref = firestore_db.collection('ProductRequest')
+# Firestore accepts at most 500 writes per commit and 30 values per "in" filter
+WRITE_BATCH_LIMIT = 500
+IN_FILTER_LIMIT = 30
+
+
+def get_product_requests(request_ids: List[str]) -> dict:
+    product_requests = {}
+    for i in range(0, len(request_ids), IN_FILTER_LIMIT):
+        chunk = request_ids[i:i + IN_FILTER_LIMIT]
+        for doc in firestore_db.collection('ProductRequest').where("request_id", "in", chunk).stream():
+            product_requests.setdefault(doc.to_dict()["request_id"], doc)
+    return product_requests
+
+
+def commit_stock_intake(stock_lines: List[AddNewStockModel]):
+    """
+    Apply stock intake lines with one query per 30 request IDs and a single atomic commit.
+
+    Inventory is bumped with a server-side Increment, so concurrent intakes cannot overwrite
+    each other. Lines for the same product or request are folded into a single write.
+
+    Raises:
+    - HTTPException: If a request ID does not exist (status_code=404), or if the note needs more
+      writes than one batch can hold (status_code=400); split commits could leave stock
+      incremented without its AddNewStock records.
+    """
+    request_ids = list(dict.fromkeys(line.request_id for line in stock_lines))
+    product_requests = get_product_requests(request_ids)
+    missing = [request_id for request_id in request_ids if request_id not in product_requests]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Not Found request id: {', '.join(missing)}")
+
+    units_by_product = {}
+    units_by_request = {}
+    for line in stock_lines:
+        units_by_product[line.product_id] = units_by_product.get(line.product_id, 0) + line.add_new_stock_units
+        units_by_request[line.request_id] = units_by_request.get(line.request_id, 0) + line.add_new_stock_units
+
+    writes = []
+    inventory_ref = firestore_db.collection('Products')
+    for product_id, units in units_by_product.items():
+        writes.append(("update", inventory_ref.document(product_id), {'current_inventory': firestore.Increment(units)},
+                       {}))
+    for request_id, units in units_by_request.items():
+        request_doc = product_requests[request_id]
+        final_status = "matched" if units == int(request_doc.to_dict()['product_unit_request']) else "unmatched"
+        writes.append(("update", request_doc.reference, {'update_qty': units, 'status': final_status}, {}))
+
+    now = datetime.now()
+    add_new_stock_ref = firestore_db.collection("AddNewStock")
+    rollup_deltas = {}
+    for line in stock_lines:
+        writes.append(("set", add_new_stock_ref.document(), {"product_id": line.product_id,
+                                                              "request_id": line.request_id,
+                                                              "add_new_stock_units": line.add_new_stock_units,
+                                                              "timestamp": now}, {}))
+        store_id = product_requests[line.request_id].to_dict().get(STOCK_STORE_FIELD)
+        merge_deltas(rollup_deltas, stock_intake_deltas(store_id, line.add_new_stock_units))
+    for doc_ref, fields in rollup_writes(firestore_db, rollup_deltas):
+        writes.append(("set", doc_ref, fields, {"merge": True}))
+
+    if len(writes) > WRITE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Stock intake needs {len(writes)} writes, more than the "
+                                                    f"{WRITE_BATCH_LIMIT} of one batch; split the note")
+    batch = firestore_db.batch()
+    for method, doc_ref, data, options in writes:
+        getattr(batch, method)(doc_ref, data, **options)
+    batch.commit()
+    # Product documents carry current_inventory
+    catalog_cache.invalidate("products")
 
 
 # Endpoints
 @app.post("/add-new-stock-updation", response_model=AddNewStockModel)
 async def add_new_stock(new_stock: AddNewStockModel):
     try:
-        # Update current inventory
-        inventory_doc = inventory_ref.document(new_stock.product_id)
-        inventory_snapshot = inventory_doc.get()
-
-        if inventory_snapshot.exists:
-            current_inventory = inventory_snapshot.to_dict()['current_inventory']
-            updated_inventory = current_inventory + new_stock.add_new_stock_units
-        else:
-            updated_inventory = new_stock.add_new_stock_units
-
-        inventory_doc.update({'current_inventory': updated_inventory})
-
-        # Update product unit request
-        product_request_doc = product_request_ref.where("request_id", "==", new_stock.request_id).get()
-        if not product_request_doc:
-            raise HTTPException(status_code=404, detail="Not Found request id")
-        current_request = product_request_doc[0].to_dict()
-
-        final_status = "matched" if new_stock.add_new_stock_units == int(current_request[
-                                                                             'product_unit_request']) else "unmatched"
+        await run_firestore(commit_stock_intake, [new_stock])
+        single_flight.forget("Products")
+        return new_stock
 
-        # updated_quantity = int(current_request['product_unit_request']) + new_stock.new_stock_units
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(traceback.format_exc())
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-        product_request_ref.document(product_request_doc[0].id).update(
-            {'update_qty': new_stock.add_new_stock_units, 'status': final_status})
-        data = {"product_id": new_stock.product_id,
-                "request_id": new_stock.request_id,
-                "add_new_stock_units": new_stock.add_new_stock_units,
-                "timestamp": datetime.now()}
-        firestore_db.collection("AddNewStock").add(data)
 
-        return new_stock
+# Bulk variant for a whole goods-received note
+@app.post("/add-new-stock-updation/bulk", response_model=List[AddNewStockModel])
+async def add_new_stock_bulk(stock_lines: List[AddNewStockModel]):
+    if not stock_lines:
+        raise HTTPException(status_code=400, detail="No stock lines provided")
+    try:
+        await run_firestore(commit_stock_intake, stock_lines)
+        single_flight.forget("Products")
+        return stock_lines
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(traceback.format_exc())
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @app.get("/product-requests/", response_model=list[ProductRequestModel])
-async def get_product_requests_by_status(status: ProductRequestStatus):
+@route_class(SCAN)
+async def get_product_requests_by_status(status: ProductRequestStatus, fields: Optional[str] = None):
+    field_paths = parse_fields(fields)
     try:
         requests_ref = firestore_db.collection("ProductRequest")
-        query = requests_ref.where("status", "==", status.value)
-        query_result = query.stream()
+        query = project(requests_ref.where("status", "==", status.value), field_paths)
+        query_result = await run_firestore(lambda: list(query.stream()))
 
-        product_requests = []
-        for doc in query_result:
-            request_data = doc.to_dict()
-            product_request = ProductRequestModel(**request_data)
-            product_requests.append(product_request)
+        if field_paths:
+            # Sparse documents do not satisfy ProductRequestModel, so they are returned as projected
+            return FastJSONResponse([doc.to_dict() for doc in query_result])
 
-        return product_requests
+        return trusted_response(ProductRequestModel, (doc.to_dict() for doc in query_result))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving product requests: {str(e)}")
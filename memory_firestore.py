@@ -0,0 +1,616 @@
+import copy
+import itertools
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.base_client import BaseClient
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+# In-memory stand-in for the subset of the synchronous Firestore client API used by this app.
+# Every RPC sleeps for the configured latency and is counted, so handlers can be load-tested
+# and profiled without GCP credentials.
+
+DOCUMENT_ID = "__name__"
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+class MemoryFirestoreStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rpcs = 0
+            self.documents_read = 0
+            self.documents_written = 0
+
+    def record(self, rpcs=0, documents_read=0, documents_written=0):
+        with self._lock:
+            self.rpcs += rpcs
+            self.documents_read += documents_read
+            self.documents_written += documents_written
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"rpcs": self.rpcs, "documents_read": self.documents_read,
+                    "documents_written": self.documents_written}
+
+
+class MemoryFirestore:
+    """
+    In-memory Firestore client.
+
+    Args:
+    - latency_ms (float): Latency added to every RPC.
+    - jitter_ms (float): Uniform random latency added on top of ``latency_ms``.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = MemoryFirestoreStats()
+        self._collections = {}  # collection path -> {document id: (data, create_time, update_time)}
+        self._lock = threading.RLock()
+        self._watches = []
+
+    # Client API
+
+    def collection(self, collection_id: str) -> "MemoryCollectionReference":
+        return MemoryCollectionReference(self, collection_id)
+
+    def document(self, document_path: str) -> "MemoryDocumentReference":
+        return MemoryDocumentReference(self, document_path)
+
+    def batch(self) -> "MemoryWriteBatch":
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> "MemoryTransaction":
+        return MemoryTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    write_option = staticmethod(BaseClient.write_option)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._rpc(documents_read=len(references))
+        snapshots = [ref._snapshot(field_paths) for ref in references]
+        if transaction is not None:
+            for snapshot in snapshots:
+                transaction._record_read(snapshot)
+        return iter(snapshots)
+
+    def seed(self, collection_id: str, documents: dict):
+        """
+        Load documents directly, without latency or accounting, e.g. for benchmarks.
+        """
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            collection = self._collections.setdefault(collection_id, {})
+            for document_id, data in documents.items():
+                collection[document_id] = (copy.deepcopy(data), now, now)
+        self._notify_watches({collection_id})
+
+    # Internals
+
+    def _rpc(self, documents_read=0, documents_written=0):
+        self.stats.record(rpcs=1, documents_read=documents_read, documents_written=documents_written)
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def _read(self, path):
+        collection_path, document_id = path.rsplit("/", 1)
+        with self._lock:
+            return self._collections.get(collection_path, {}).get(document_id)
+
+    def _list(self, collection_path):
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def _write(self, path, entry):
+        collection_path, document_id = path.rsplit("/", 1)
+        if entry is None:
+            self._collections.get(collection_path, {}).pop(document_id, None)
+        else:
+            self._collections.setdefault(collection_path, {})[document_id] = entry
+
+    def _notify_watches(self, collection_paths):
+        for watch in list(self._watches):
+            if watch.collection_path in collection_paths:
+                watch._refresh()
+
+    def _apply_writes(self, writes, read_versions=None):
+        results = self._apply_writes_locked(writes, read_versions)
+        self._notify_watches({path.rsplit("/", 1)[0] for _, path, _, _ in writes})
+        return results
+
+    def _apply_writes_locked(self, writes, read_versions):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if read_versions:
+                for path, update_time in read_versions.items():
+                    entry = self._read(path)
+                    if (entry[2] if entry else None) != update_time:
+                        raise exceptions.Aborted(f"Document {path} changed during the transaction")
+            # Validate every write before applying any, so a commit is all or nothing
+            for kind, path, _, options in writes:
+                entry = self._read(path)
+                exists = entry is not None
+                if kind == "update" and not exists or options.get("exists") is True and not exists:
+                    raise exceptions.NotFound(f"No document to update: {path}")
+                if kind == "create" and exists or options.get("exists") is False and exists:
+                    raise exceptions.AlreadyExists(f"Document already exists: {path}")
+                precondition = options.get("update_time")
+                if precondition is not None and (not exists or entry[2] != precondition):
+                    raise exceptions.FailedPrecondition(f"Document {path} was modified")
+            results = []
+            for kind, path, data, options in writes:
+                entry = self._read(path)
+                if kind == "delete":
+                    self._write(path, None)
+                    results.append(now)
+                    continue
+                current = copy.deepcopy(entry[0]) if entry and (kind == "update" or options.get("merge")) else {}
+                if kind == "update":
+                    _apply_field_updates(current, data, now)
+                else:
+                    _merge(current, data, now)
+                create_time = entry[1] if entry else now
+                self._write(path, (current, create_time, now))
+                results.append(now)
+            return results
+
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return copy.deepcopy(_get_field(self._data, field_path))
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return MemoryCollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id):
+        return MemoryCollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def _snapshot(self, field_paths=None):
+        entry = self._client._read(self.path)
+        if entry is None:
+            return MemoryDocumentSnapshot(self, None)
+        data, create_time, update_time = entry
+        return MemoryDocumentSnapshot(self, _project(data, field_paths), create_time, update_time)
+
+    def get(self, field_paths=None, transaction=None):
+        self._client._rpc(documents_read=1)
+        snapshot = self._snapshot(field_paths)
+        if transaction is not None:
+            transaction._record_read(snapshot)
+        return snapshot
+
+    def create(self, document_data):
+        self._client._rpc(documents_written=1)
+        return self._client._apply_writes([("create", self.path, document_data, {})])[0]
+
+    def set(self, document_data, merge=False):
+        self._client._rpc(documents_written=1)
+        return self._client._apply_writes([("set", self.path, document_data, {"merge": merge})])[0]
+
+    def update(self, field_updates, option=None):
+        self._client._rpc(documents_written=1)
+        return self._client._apply_writes([("update", self.path, field_updates, _option_dict(option))])[0]
+
+    def delete(self, option=None):
+        self._client._rpc(documents_written=1)
+        return self._client._apply_writes([("delete", self.path, None, _option_dict(option))])[0]
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class MemoryQuery:
+    def __init__(self, client, collection_path, filters=(), orders=(), limit=None, cursor=None, projection=None,
+                 cursor_inclusive=False):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._cursor_inclusive = cursor_inclusive
+        self._projection = projection
+
+    def _copy(self, **changes):
+        values = {"filters": self._filters, "orders": self._orders, "limit": self._limit,
+                  "cursor": self._cursor, "projection": self._projection, "cursor_inclusive": self._cursor_inclusive}
+        values.update(changes)
+        return MemoryQuery(self._client, self._collection_path, **values)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(projection=list(field_paths))
+
+    def start_after(self, document_fields):
+        return self._copy(cursor=document_fields, cursor_inclusive=False)
+
+    def start_at(self, document_fields):
+        return self._copy(cursor=document_fields, cursor_inclusive=True)
+
+    def _matching(self):
+        orders = list(self._orders)
+        if not any(field == DOCUMENT_ID for field, _ in orders):
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        rows = []
+        for doc_id, (data, create_time, update_time) in self._client._list(self._collection_path):
+            path = f"{self._collection_path}/{doc_id}"
+            if not all(_matches(_field_value(data, doc_id, field), op, value) for field, op, value in self._filters):
+                continue
+            if any(_field_value(data, doc_id, field) is None for field, _ in orders):
+                continue
+            rows.append((doc_id, path, data, create_time, update_time))
+        rows.sort(key=lambda row: _sort_key(row[2], row[0], orders))
+        if self._cursor is not None:
+            cursor_key = _cursor_key(self._cursor, orders)
+            cursor_orders = orders[:len(cursor_key)]
+            # start_at keeps the cursor document itself, start_after skips it
+            rows = [row for row in rows if _sort_key(row[2], row[0], cursor_orders) > cursor_key
+                    or self._cursor_inclusive and _sort_key(row[2], row[0], cursor_orders) == cursor_key]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def stream(self, transaction=None):
+        rows = self._matching()
+        self._client._rpc(documents_read=max(len(rows), 1))
+        for doc_id, path, data, create_time, update_time in rows:
+            snapshot = MemoryDocumentSnapshot(MemoryDocumentReference(self._client, path),
+                                              _project(data, self._projection), create_time, update_time)
+            if transaction is not None:
+                transaction._record_read(snapshot)
+            yield snapshot
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback) -> "MemoryWatch":
+        return MemoryWatch(self, callback)
+
+
+class MemoryWatch:
+    """
+    Snapshot listener on a query. Like the real ``Watch`` the callback receives
+    ``(snapshots, changes, read_time)``, first with every matching document as ADDED and then
+    after each commit touching the collection, with the documents that changed. Callbacks run on
+    the writing thread instead of a background thread.
+    """
+
+    def __init__(self, query, callback):
+        self._query = query
+        self._callback = callback
+        self._versions = {}  # document id -> (index, update_time)
+        self._closed = False
+        self._refresh_lock = threading.Lock()
+        self.collection_path = query._collection_path
+        query._client._watches.append(self)
+        self._refresh(initial=True)
+
+    def _refresh(self, initial=False):
+        with self._refresh_lock:
+            if self._closed:
+                return
+            client = self._query._client
+            rows = self._query._matching()
+            # Stored data is replaced, never mutated, on writes and to_dict() copies, so it can be shared
+            snapshots = [MemoryDocumentSnapshot(MemoryDocumentReference(client, path), data, create_time, update_time)
+                         for _, path, data, create_time, update_time in rows]
+            versions = {snapshot.id: (index, snapshot.update_time) for index, snapshot in enumerate(snapshots)}
+            changes = []
+            for document_id, (old_index, _) in self._versions.items():
+                if document_id not in versions:
+                    snapshot = MemoryDocumentSnapshot(
+                        MemoryDocumentReference(client, f"{self.collection_path}/{document_id}"), None)
+                    changes.append(DocumentChange(ChangeType.REMOVED, snapshot, old_index, -1))
+            for index, snapshot in enumerate(snapshots):
+                previous = self._versions.get(snapshot.id)
+                if previous is None:
+                    changes.append(DocumentChange(ChangeType.ADDED, snapshot, -1, index))
+                elif previous[1] != snapshot.update_time:
+                    changes.append(DocumentChange(ChangeType.MODIFIED, snapshot, previous[0], index))
+            self._versions = versions
+            if changes or initial:
+                self._callback(snapshots, changes, datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self._closed = True
+        watches = self._query._client._watches
+        if self in watches:
+            watches.remove(self)
+
+    close = unsubscribe
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._client, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, document_data, document_id=None):
+        doc_ref = self.document(document_id)
+        return doc_ref.set(document_data), doc_ref
+
+    def list_documents(self):
+        return [self.document(doc_id) for doc_id, _ in self._client._list(self.path)]
+
+
+class MemoryWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference.path, document_data, {}))
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference.path, document_data, {"merge": merge}))
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference.path, field_updates, _option_dict(option)))
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference.path, None, _option_dict(option)))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._rpc(documents_written=len(writes))
+        return self._client._apply_writes(writes)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Optimistic transaction: commit fails with ``Aborted`` if a document read in the
+    transaction changed meanwhile, which ``firestore.transactional`` retries.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._read_versions = {}
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _record_read(self, snapshot):
+        self._read_versions.setdefault(snapshot.reference.path, snapshot.update_time)
+
+    def _begin(self, retry_id=None):
+        self._id = next(self._ids)
+        self._client._rpc()
+
+    def _clean_up(self):
+        self._writes = []
+        self._read_versions = {}
+        self._id = None
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _commit(self):
+        writes, read_versions = self._writes, self._read_versions
+        self._client._rpc(documents_written=len(writes))
+        try:
+            return self._client._apply_writes(writes, read_versions)
+        finally:
+            self._clean_up()
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+
+# Helpers
+
+
+def _option_dict(option):
+    if option is None:
+        return {}
+    if hasattr(option, "_exists"):
+        return {"exists": option._exists}
+    return {"update_time": option._last_update_time}
+
+
+def _get_field(data, field_path):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _field_value(data, doc_id, field_path):
+    return doc_id if field_path == DOCUMENT_ID else _get_field(data, field_path)
+
+
+def _project(data, field_paths):
+    if field_paths is None:
+        return data
+    projected = {}
+    for field_path in field_paths:
+        value = _get_field(data, field_path)
+        if value is not None:
+            _set_field(projected, field_path, value)
+    return projected
+
+
+def _set_field(data, field_path, value):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _transform(current, value, now):
+    if value is transforms.SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, transforms.Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        current = list(current) if isinstance(current, list) else []
+        return current + [item for item in value.values if item not in current]
+    if isinstance(value, transforms.ArrayRemove):
+        return [item for item in (current if isinstance(current, list) else []) if item not in value.values]
+    return copy.deepcopy(value)
+
+
+def _merge(target, data, now):
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            existing = target.get(key)
+            target[key] = existing if isinstance(existing, dict) else {}
+            _merge(target[key], value, now)
+        else:
+            target[key] = _transform(target.get(key), value, now)
+
+
+def _apply_field_updates(target, field_updates, now):
+    for field_path, value in field_updates.items():
+        parts = field_path.split(".")
+        parent = target
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        if value is transforms.DELETE_FIELD:
+            parent.pop(parts[-1], None)
+        else:
+            parent[parts[-1]] = _transform(parent.get(parts[-1]), value, now)
+
+
+def _matches(actual, op, expected):
+    if op == "==":
+        return actual == expected
+    if op == "!=":
+        return actual is not None and actual != expected
+    if op == "in":
+        return actual in expected
+    if op == "not-in":
+        return actual is not None and actual not in expected
+    if op == "array_contains":
+        return isinstance(actual, list) and expected in actual
+    if op == "array_contains_any":
+        return isinstance(actual, list) and any(item in actual for item in expected)
+    if actual is None:
+        return False
+    try:
+        if op == "<":
+            return actual < expected
+        if op == "<=":
+            return actual <= expected
+        if op == ">":
+            return actual > expected
+        if op == ">=":
+            return actual >= expected
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op}")
+
+
+class _Descending:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _sort_key(data, doc_id, orders):
+    key = []
+    for field, direction in orders:
+        value = _field_value(data, doc_id, field)
+        key.append(_Descending(value) if direction == DESCENDING else value)
+    return tuple(key)
+
+
+def _cursor_key(cursor, orders):
+    if isinstance(cursor, MemoryDocumentSnapshot):
+        return _sort_key(cursor._data or {}, cursor.id, orders)
+    values = cursor if isinstance(cursor, dict) else dict(zip((field for field, _ in orders), cursor))
+    key = []
+    for field, direction in orders:
+        if field not in values:
+            break
+        value = values[field]
+        if isinstance(value, MemoryDocumentReference):
+            value = value.id
+        key.append(_Descending(value) if direction == DESCENDING else value)
+    return tuple(key)
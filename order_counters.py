@@ -0,0 +1,87 @@
+import os
+import random
+from collections import Counter
+
+from firebase_admin import firestore
+
+# Order status counts are kept in Counters/order_status/shards/{n}. Each write picks a random
+# shard so concurrent status changes do not contend on a single document.
+COUNTERS_COLLECTION = "Counters"
+ORDER_STATUS_COUNTER = "order_status"
+ORDER_STATUS_COUNTER_SHARDS = int(os.getenv("ORDER_STATUS_COUNTER_SHARDS", "1"))
+
+
+def _shards_ref(firestore_db):
+    return firestore_db.collection(COUNTERS_COLLECTION).document(ORDER_STATUS_COUNTER).collection("shards")
+
+
+def _status_value(order_status):
+    return getattr(order_status, "value", order_status)
+
+
+def record_status_change(firestore_db, writer, old_status=None, new_status=None):
+    """
+    Add the counter update for an order status change to a batch or transaction.
+
+    Args:
+    - firestore_db: Firestore client.
+    - writer: ``WriteBatch`` or ``Transaction`` the order write is part of.
+    - old_status: Previous status, None for a newly created order.
+    - new_status: New status, None for a deleted order.
+    """
+    old_status, new_status = _status_value(old_status), _status_value(new_status)
+    if old_status == new_status:
+        return
+    deltas = Counter()
+    if old_status:
+        deltas[old_status] -= 1
+    if new_status:
+        deltas[new_status] += 1
+    record_status_deltas(firestore_db, writer, deltas)
+
+
+def record_status_deltas(firestore_db, writer, deltas: dict):
+    """
+    Add a single counter write applying the net change per status value, e.g. for a batch of orders.
+    """
+    changes = {status: firestore.Increment(delta) for status, delta in deltas.items() if delta}
+    if not changes:
+        return
+    shard = str(random.randrange(ORDER_STATUS_COUNTER_SHARDS))
+    writer.set(_shards_ref(firestore_db).document(shard), changes, merge=True)
+
+
+def read_status_counts(firestore_db) -> Counter:
+    """
+    Sum the order status counters over all shards.
+
+    Returns:
+    - Counter: Order count per status value.
+    """
+    counts = Counter()
+    for shard in _shards_ref(firestore_db).stream():
+        counts.update(shard.to_dict())
+    return counts
+
+
+def rebuild_status_counts(firestore_db) -> Counter:
+    """
+    Recount order statuses in a single pass over ``Orders`` and overwrite the counter shards.
+
+    Returns:
+    - Counter: The recomputed order count per status value.
+    """
+    counts = Counter()
+    for order in firestore_db.collection("Orders").select(["order_status"]).stream():
+        order_status = order.to_dict().get("order_status")
+        if order_status:
+            counts[order_status] += 1
+
+    batch = firestore_db.batch()
+    shards_ref = _shards_ref(firestore_db)
+    for shard in shards_ref.stream():
+        if shard.id != "0":
+            batch.delete(shard.reference)
+    batch.set(shards_ref.document("0"), dict(counts))
+    batch.commit()
+    return counts
@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+
+# Order IDs are Orders document IDs. The original scheme (timestamp then 6 random hex digits)
+# makes every new order sort after the previous one, so all creates land on the last key range
+# of the collection, the write hotspot Firestore warns about for sequential IDs. New IDs start
+# with a random 2 hex digit bucket, spreading creates over 256 key ranges. Ordering by order ID
+# (e.g. GET /orders/ pages) is therefore no longer chronological; order by a timestamp field instead.
+TIMESTAMP_FORMAT = "%Y%m%d%H%M%S%f"
+TIMESTAMP_LENGTH = 17  # %Y%m%d%H%M%S plus milliseconds
+BUCKET_LENGTH = 2
+RANDOM_LENGTH = 6
+LEGACY_ORDER_ID_LENGTH = TIMESTAMP_LENGTH + RANDOM_LENGTH
+ORDER_ID_LENGTH = BUCKET_LENGTH + TIMESTAMP_LENGTH + RANDOM_LENGTH
+
+
+def generate_legacy_order_id() -> str:
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)[:-3]  # Current timestamp with milliseconds
+    random_digits = uuid.uuid4().hex[:RANDOM_LENGTH]  # 6 random hexadecimal digits
+    return f"{timestamp}{random_digits}"
+
+
+def generate_order_id() -> str:
+    """
+    Generate an order ID of the form ``<bucket><timestamp><random>``, e.g.
+    ``"3f20240101120000123a1b2c3"``.
+    """
+    random_hex = uuid.uuid4().hex
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)[:-3]
+    return f"{random_hex[:BUCKET_LENGTH]}{timestamp}{random_hex[BUCKET_LENGTH:BUCKET_LENGTH + RANDOM_LENGTH]}"
+
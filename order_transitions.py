@@ -0,0 +1,81 @@
+import os
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException
+from google.api_core import exceptions
+
+from daily_rollups import record_order_transition
+from order_counters import record_status_change
+from order_views import order_status_view
+
+# Guarded order state transitions. Instead of a transaction (begin, read, commit, and a rollback
+# plus retry under contention), the order is read once, the transition is checked against that
+# snapshot, and the order update is committed with a precondition on the snapshot's update_time,
+# together with its counter and rollup writes in one batch. If the order changed in between the
+# commit fails without writing anything and the transition is re-checked against a fresh read.
+# When the order status view is running the first snapshot comes from it, so an uncontended
+# transition is a single commit RPC.
+ORDER_TRANSITION_ATTEMPTS = int(os.getenv("ORDER_TRANSITION_ATTEMPTS", "3"))
+
+
+def _read_order(order_ref) -> Tuple[dict, object]:
+    snapshot = order_ref.get()
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return snapshot.to_dict(), snapshot.update_time
+
+
+def order_snapshot(order_doc) -> Tuple[dict, object]:
+    """
+    Turn an order ``DocumentSnapshot`` read by the caller into the ``snapshot`` of ``transition_order``.
+
+    Raises:
+    - HTTPException: If the order does not exist (status_code=404).
+    """
+    if not order_doc.exists:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order_doc.to_dict(), order_doc.update_time
+
+
+def transition_order(firestore_db, order_id: str, plan: Callable[[dict], dict],
+                     snapshot: Optional[Tuple[dict, object]] = None) -> dict:
+    """
+    Apply the update ``plan`` returns for the current order, unless the order changed concurrently.
+
+    Args:
+    - firestore_db: Firestore client.
+    - order_id (str): The order to update.
+    - plan: Called with the current order, returns the fields to update. Raises an
+      HTTPException (409 for a transition the current state does not allow) to refuse.
+      It may be called again with a newer order if the first attempt loses a race.
+    - snapshot (Tuple[dict, object]): Order and update_time the caller already read, if any.
+
+    Returns:
+    - dict: The order as written.
+
+    Raises:
+    - HTTPException: If the order does not exist (status_code=404), if ``plan`` refuses the
+      transition, or if the order kept changing for ``ORDER_TRANSITION_ATTEMPTS`` attempts (status_code=409).
+    """
+    order_ref = firestore_db.collection("Orders").document(order_id)
+    if snapshot is None:
+        snapshot = order_status_view.get(order_id)
+    for _ in range(ORDER_TRANSITION_ATTEMPTS):
+        order, update_time = snapshot or _read_order(order_ref)
+        order_update = plan(order)
+        old_status = order.get("order_status")
+        new_status = order_update.get("order_status", old_status)
+        updated_order = {**order, **order_update}
+
+        batch = firestore_db.batch()
+        batch.update(order_ref, order_update, option=firestore_db.write_option(last_update_time=update_time))
+        record_status_change(firestore_db, batch, old_status, new_status)
+        record_order_transition(firestore_db, batch, updated_order, old_status, new_status)
+        try:
+            batch.commit()
+            return updated_order
+        except exceptions.FailedPrecondition:
+            snapshot = None
+        except exceptions.NotFound:
+            raise HTTPException(status_code=404, detail="Order not found")
+    raise HTTPException(status_code=409, detail="Order was modified concurrently, please retry")
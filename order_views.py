@@ -0,0 +1,242 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from fast_json import dumps
+from pagination import DOCUMENT_ID, decode_page_token, encode_page_token
+
+# In-process materialized view of Orders grouped by order status, kept current by a Firestore
+# snapshot listener. get_orders_by_status serves reads from it instead of querying Firestore, and
+# /orders/events pushes every status or rider change the listener sees (from any instance) to
+# connected dashboards as Server-Sent Events.
+ORDER_VIEWS_ENABLED = os.getenv("ORDER_VIEWS_ENABLED", "false").lower() == "true"
+# Comma separated statuses to keep in memory, e.g. the active ones; required, since delivered and
+# cancelled orders only ever grow in number
+ORDER_VIEW_STATUSES = [value.strip() for value in os.getenv("ORDER_VIEW_STATUSES", "").split(",") if value.strip()]
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MS = 3000
+SSE_QUEUE_SIZE = 1000
+
+SORT_FIELD = "modified_timestamp"
+# Firestore orders values of different types by type first: booleans, numbers, timestamps, strings
+SORT_TYPE_RANKS = ((bool, 0), ((int, float), 1), (datetime, 2), (str, 3))
+
+if ORDER_VIEWS_ENABLED and not ORDER_VIEW_STATUSES:
+    raise ValueError("ORDER_VIEWS_ENABLED needs ORDER_VIEW_STATUSES, the order statuses to keep in memory")
+
+
+def _sort_value(value) -> Optional[Tuple]:
+    # Comparable stand-in for a SORT_FIELD value, so a stray string or naive datetime cannot make
+    # bisect compare unorderable types inside the listener; None for types the view does not order
+    for types, rank in SORT_TYPE_RANKS:
+        if isinstance(value, types):
+            if isinstance(value, datetime) and value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return rank, value
+    return None
+
+
+def _project(order: dict, fields: Optional[List[str]]) -> dict:
+    if not fields:
+        return order
+    projected = {}
+    for field_path in fields:
+        source, target = order, projected
+        parts = field_path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            target = target.setdefault(part, {})
+        if isinstance(source, dict) and parts[-1] in source:
+            target[parts[-1]] = source[parts[-1]]
+    return projected
+
+
+class OrderStatusView:
+    """
+    Orders indexed by status and sorted like the ``get_orders_by_status`` query
+    (``modified_timestamp`` then document ID, newest first).
+
+    ``start`` registers an ``on_snapshot`` listener for ``statuses``; reads are only served once the
+    first snapshot has been applied (``ready``). Listener callbacks run on a Firestore thread and hand
+    events to subscribers on their event loops.
+    """
+
+    def __init__(self, statuses: List[str] = ORDER_VIEW_STATUSES):
+        self.statuses = list(statuses)
+        self._lock = threading.Lock()
+        self._orders = {}  # order id -> order
+        self._update_times = {}  # order id -> update_time of the order's snapshot
+        self._keys = defaultdict(list)  # status -> sorted [(sort value of modified_timestamp, order id)]
+        self._subscribers = set()
+        self._watch = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def covers(self, status: str) -> bool:
+        return self.ready and status in self.statuses
+
+    def start(self, firestore_db):
+        """
+        Raises:
+        - ValueError: If the view has no statuses to keep.
+        """
+        if not self.statuses:
+            raise ValueError("The order status view needs the order statuses to keep in memory")
+        query = firestore_db.collection("Orders").where("order_status", "in", self.statuses)
+        self._watch = query.on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._ready.clear()
+
+    @staticmethod
+    def _key(order_id: str, order: dict) -> Optional[Tuple]:
+        # Firestore leaves documents without the order-by field out of the query, so does the view
+        sort_value = _sort_value(order.get(SORT_FIELD))
+        if sort_value is None:
+            return None
+        return sort_value, order_id
+
+    def _index(self, order_id: str, order: dict):
+        key = self._key(order_id, order)
+        if key is not None:
+            bisect.insort(self._keys[order.get("order_status")], key)
+
+    def _unindex(self, order_id: str, order: dict):
+        key = self._key(order_id, order)
+        if key is not None:
+            keys = self._keys[order.get("order_status")]
+            index = bisect.bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                del keys[index]
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        initial = not self._ready.is_set()
+        events = []
+        with self._lock:
+            for change in changes:
+                order_id = change.document.id
+                previous = self._orders.pop(order_id, None)
+                self._update_times.pop(order_id, None)
+                if previous is not None:
+                    self._unindex(order_id, previous)
+                order = None
+                if change.type.name != "REMOVED":
+                    order = change.document.to_dict()
+                    self._orders[order_id] = order
+                    self._update_times[order_id] = change.document.update_time
+                    self._index(order_id, order)
+                if not initial and self._is_visible_change(previous, order):
+                    events.append(self._event(order_id, previous, order))
+        self._ready.set()
+        for event in events:
+            self._publish(event)
+
+    @staticmethod
+    def _is_visible_change(previous: Optional[dict], order: Optional[dict]) -> bool:
+        if previous is None or order is None:
+            return True
+        return any(previous.get(field) != order.get(field) for field in ("order_status", "rider_id"))
+
+    @staticmethod
+    def _event(order_id: str, previous: Optional[dict], order: Optional[dict]) -> dict:
+        current = order or {}
+        return {
+            "order_id": order_id,
+            "order_status": current.get("order_status"),
+            "previous_status": previous.get("order_status") if previous else None,
+            "rider_id": current.get("rider_id"),
+            "modified_timestamp": current.get(SORT_FIELD),
+        }
+
+    def get(self, order_id: str) -> Optional[Tuple[dict, object]]:
+        """
+        Return a copy of the order and the ``update_time`` of its last snapshot, if the view has it.
+        """
+        if not self.ready:
+            return None
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return None
+            return dict(order), self._update_times[order_id]
+
+    def page(self, status: str, limit: Optional[int] = None, page_token: Optional[str] = None,
+             fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Read orders with ``status`` from memory, newest first. Page tokens are interchangeable with
+        the ones ``fetch_page`` issues for the same query.
+
+        Returns:
+        - Tuple[List[dict], Optional[str]]: The orders and the next page token, if there is a next page.
+        """
+        with self._lock:
+            keys = self._keys.get(status, [])
+            end = len(keys)
+            if page_token:
+                cursor = decode_page_token(page_token, [SORT_FIELD, DOCUMENT_ID])
+                sort_value = _sort_value(cursor[SORT_FIELD])
+                if sort_value is None or not isinstance(cursor[DOCUMENT_ID], str):
+                    raise HTTPException(status_code=400, detail="Invalid page token")
+                end = bisect.bisect_left(keys, (sort_value, cursor[DOCUMENT_ID]))
+            start = max(0, end - limit) if limit else 0
+            page_keys = keys[start:end][::-1]
+            orders = [_project(self._orders[order_id], fields) for _, order_id in page_keys]
+            next_page_token = None
+            if limit and start > 0:
+                _, last_id = page_keys[-1]
+                next_page_token = encode_page_token({SORT_FIELD: self._orders[last_id][SORT_FIELD],
+                                                     DOCUMENT_ID: last_id})
+        return orders, next_page_token
+
+    def _publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue, statuses in subscribers:
+            if statuses and event["order_status"] not in statuses and event["previous_status"] not in statuses:
+                continue
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logging.warning("Dropping order event for a slow SSE subscriber")
+
+    async def events(self, statuses: Optional[List[str]] = None):
+        """
+        Yield Server-Sent Events for order changes, with a comment line as heartbeat so proxies
+        keep the connection open. Stops when the client disconnects.
+        """
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue, frozenset(statuses or ()))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: order\ndata: " + dumps(event) + b"\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+order_status_view = OrderStatusView()
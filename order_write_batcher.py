@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+from google.api_core import exceptions
+
+from daily_rollups import merge_deltas, record_rollup_deltas
+from firestore_client import get_firestore_db
+from firestore_executor import run_firestore
+from order_counters import record_status_deltas
+
+# Opt-in write-behind batching for order creation. Concurrent create_order calls hand their
+# writes to the batcher, which commits them together once ORDER_WRITE_BATCH_DELAY_MS has passed
+# since the first pending write or ORDER_WRITE_BATCH_MAX_WRITES writes are pending, whichever
+# comes first. Status counter and daily rollup increments of a batch are folded into one write
+# per counter or rollup document.
+ORDER_WRITE_BATCHING = os.getenv("ORDER_WRITE_BATCHING", "false").lower() == "true"
+ORDER_WRITE_BATCH_DELAY_MS = float(os.getenv("ORDER_WRITE_BATCH_DELAY_MS", "10"))
+ORDER_WRITE_BATCH_MAX_WRITES = int(os.getenv("ORDER_WRITE_BATCH_MAX_WRITES", "500"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+QUEUE_DELAY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+# Errors Firestore reports before applying any write of the commit, so the writes of the
+# other callers can safely be committed again without the failing one
+REJECTED_COMMIT_ERRORS = (exceptions.InvalidArgument, exceptions.FailedPrecondition, exceptions.NotFound,
+                          exceptions.AlreadyExists)
+
+
+class _PendingWrite:
+    __slots__ = ("apply_writes", "write_count", "status_deltas", "rollup_deltas", "future", "enqueued_at")
+
+    def __init__(self, apply_writes, write_count, status_deltas, rollup_deltas, future):
+        self.apply_writes = apply_writes
+        self.write_count = write_count
+        self.status_deltas = status_deltas
+        self.rollup_deltas = rollup_deltas
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.total += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def render(self, name: str) -> list:
+        lines = [f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.total}')
+        lines.append(f"{name}_sum {self.sum:.3f}")
+        lines.append(f"{name}_count {self.total}")
+        return lines
+
+
+class OrderWriteBatcher:
+    """
+    Coalesces order writes from concurrent requests into batched commits.
+
+    Each caller awaits its own outcome: when a commit is rejected, the writes are committed again
+    one caller at a time so only the caller whose write is invalid gets the error. Commits failing
+    for other reasons (e.g. a deadline, where the outcome is unknown) fail every caller of the batch.
+
+    Args:
+    - max_delay_ms (float): Longest time a write waits for other writes to join its batch.
+    - max_writes (int): Document writes per commit, counter and rollup writes included.
+    """
+
+    def __init__(self, max_delay_ms: float = ORDER_WRITE_BATCH_DELAY_MS,
+                 max_writes: int = ORDER_WRITE_BATCH_MAX_WRITES):
+        self.max_delay = max_delay_ms / 1000
+        self.max_writes = max_writes
+        self._pending = []
+        self._pending_writes = 0
+        self._timer = None
+        self._flushes = set()
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._fallbacks = 0
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue_delays = Histogram(QUEUE_DELAY_BUCKETS_MS)
+
+    async def submit(self, apply_writes: Callable, write_count: int = 1, status_deltas: Optional[dict] = None,
+                     rollup_deltas: Optional[dict] = None):
+        """
+        Queue ``apply_writes(batch)`` for the next commit and wait until it is committed.
+
+        Args:
+        - apply_writes: Adds the caller's writes to a ``WriteBatch``.
+        - write_count (int): Number of writes ``apply_writes`` adds.
+        - status_deltas (dict): Order status counter changes, merged into the batch's counter write.
+        - rollup_deltas (dict): Daily rollup changes, merged into the batch's rollup writes.
+
+        Raises:
+        - Exception: Whatever the commit of the caller's writes raised.
+        """
+        # Leave room for the counter write and, conservatively, one rollup write per caller
+        write_count += len(rollup_deltas or {})
+        if self._pending and self._pending_writes + write_count + 1 > self.max_writes:
+            self._flush_now()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingWrite(apply_writes, write_count, Counter(status_deltas or {}),
+                                           rollup_deltas or {}, future))
+        self._pending_writes += write_count
+        if self._pending_writes + 1 >= self.max_writes:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_now)
+        await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        entries, self._pending, self._pending_writes = self._pending, [], 0
+        if entries:
+            flush = asyncio.ensure_future(self._flush(entries))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    def _commit(self, entries):
+        batch = get_firestore_db().batch()
+        status_deltas = Counter()
+        rollup_deltas = {}
+        for entry in entries:
+            entry.apply_writes(batch)
+            status_deltas.update(entry.status_deltas)
+            merge_deltas(rollup_deltas, entry.rollup_deltas)
+        record_status_deltas(get_firestore_db(), batch, status_deltas)
+        record_rollup_deltas(get_firestore_db(), batch, rollup_deltas)
+        batch.commit()
+
+    async def _flush(self, entries):
+        flushed_at = time.perf_counter()
+        try:
+            await run_firestore(self._commit, entries)
+            results = [None] * len(entries)
+        except REJECTED_COMMIT_ERRORS:
+            with self._metrics_lock:
+                self._fallbacks += 1
+            results = await asyncio.gather(*(run_firestore(self._commit, [entry]) for entry in entries),
+                                           return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(entries)
+        with self._metrics_lock:
+            self._batches += 1
+            self._batch_sizes.observe(len(entries))
+            for entry in entries:
+                self._queue_delays.observe((flushed_at - entry.enqueued_at) * 1000)
+        for entry, result in zip(entries, results):
+            if entry.future.done():
+                continue
+            if isinstance(result, BaseException):
+                entry.future.set_exception(result)
+            else:
+                entry.future.set_result(None)
+
+    async def close(self):
+        """
+        Commit pending writes and wait for in-flight commits, e.g. on shutdown.
+        """
+        self._flush_now()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def render(self) -> str:
+        """
+        Render the batching metrics in the Prometheus text exposition format.
+        """
+        with self._metrics_lock:
+            lines = [
+                "# TYPE order_write_batches_total counter",
+                f"order_write_batches_total {self._batches}",
+                "# TYPE order_write_batch_fallbacks_total counter",
+                f"order_write_batch_fallbacks_total {self._fallbacks}",
+            ]
+            lines += self._batch_sizes.render("order_write_batch_size")
+            lines += self._queue_delays.render("order_write_queue_delay_ms")
+        return "\n".join(lines) + "\n"
+
+
+order_write_batcher = OrderWriteBatcher()
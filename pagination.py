@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.responses import StreamingResponse
+
+from fast_json import dumps
+from firestore_executor import run_firestore
+
+DOCUMENT_ID = "__name__"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 200
+
+FIELD_PATH_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a ``fields=a,b,c.d`` query parameter into Firestore field paths for ``select()``.
+
+    Raises:
+    - HTTPException: If a field path is malformed (status_code=400).
+    """
+    if fields is None:
+        return None
+    field_paths = [field.strip() for field in fields.split(",") if field.strip()]
+    if not field_paths or not all(FIELD_PATH_PATTERN.match(field) for field in field_paths):
+        raise HTTPException(status_code=400, detail="Invalid fields parameter")
+    return list(dict.fromkeys(field_paths))
+
+
+def project(query, fields: Optional[List[str]]):
+    return query.select(fields) if fields else query
+
+
+def encode_page_token(values: dict) -> str:
+    """
+    Encode the order-by values of the last document of a page into an opaque token.
+
+    Args:
+    - values (dict): Mapping of order-by field to value, e.g. ``{"__name__": "<doc id>"}``.
+
+    Returns:
+    - str: URL-safe page token.
+    """
+    payload = {}
+    for field, value in values.items():
+        if isinstance(value, datetime):
+            payload[field] = {"ts": value.isoformat()}
+        else:
+            payload[field] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_page_token(token: str, order_fields: Optional[List[str]] = None) -> dict:
+    """
+    Decode a page token produced by :func:`encode_page_token`.
+
+    Args:
+    - order_fields (List[str]): The order-by fields of the query the token is for; a token with
+      other fields is rejected.
+
+    Raises:
+    - HTTPException: If the token is malformed or not for ``order_fields`` (status_code=400).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or order_fields is not None and set(payload) != set(order_fields):
+            raise ValueError("Unexpected page token fields")
+        values = {}
+        for field, value in payload.items():
+            if isinstance(value, dict) and "ts" in value:
+                values[field] = datetime.fromisoformat(value["ts"])
+            else:
+                values[field] = value
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid page token")
+    return values
+
+
+def _cursor_values(doc, order_fields: List[str]) -> dict:
+    data = doc.to_dict()
+    return {field: doc.id if field == DOCUMENT_ID else data.get(field) for field in order_fields}
+
+
+async def fetch_page(query, order_fields: List[str], limit: int, page_token: Optional[str] = None,
+                     fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Read one page of ``query`` using a cursor on ``order_fields``.
+
+    ``query`` must already be ordered by ``order_fields`` (last one being the document ID
+    so the cursor is unique). With ``fields`` only those fields are read and returned; order
+    fields needed for the cursor are read as well but left out of the items.
+
+    Returns:
+    - tuple: Documents of the page and the token for the next page (None on the last page).
+    """
+    cursor_only_fields = []
+    if fields:
+        cursor_only_fields = [field for field in order_fields if field != DOCUMENT_ID and field not in fields]
+        query = query.select(fields + cursor_only_fields)
+    if page_token:
+        query = query.start_after(decode_page_token(page_token, order_fields))
+    # Ask for one extra document to know whether another page exists.
+    docs = await run_firestore(lambda: list(query.limit(limit + 1).stream()))
+    next_page_token = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_page_token = encode_page_token(_cursor_values(docs[-1], order_fields))
+    items = [doc.to_dict() for doc in docs]
+    for item in items:
+        for field in cursor_only_fields:
+            item.pop(field, None)
+    return items, next_page_token
+
+
+def _next_chunk(iterator, size: int) -> list:
+    chunk = []
+    for doc in iterator:
+        chunk.append(doc.to_dict())
+        if len(chunk) >= size:
+            break
+    return chunk
+
+
+async def _ndjson_lines(query):
+    iterator = await run_firestore(query.stream)
+    while True:
+        chunk = await run_firestore(_next_chunk, iterator, STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield b"".join(dumps(item) + b"\n" for item in chunk)
+
+
+def ndjson_response(query, fields: Optional[List[str]] = None) -> StreamingResponse:
+    """
+    Stream the documents of ``query`` as newline-delimited JSON while Firestore yields them.
+
+    Documents are pulled in chunks of ``STREAM_CHUNK_SIZE`` on the Firestore executor, so
+    memory stays bounded regardless of the collection size.
+    """
+    return StreamingResponse(_ndjson_lines(project(query, fields)), media_type="application/x-ndjson")
@@ -0,0 +1,321 @@
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+# In-process search index over Products for /products/search. A snapshot listener on Products
+# loads the catalog in one streamed read at startup and then applies every product write (from
+# any instance), so no request reads Firestore.
+#
+# Terms of the indexed fields go into an inverted index (term -> {product slot: field weight})
+# and a sorted vocabulary, which serves prefix lookups by bisection like a trie would. Typos are
+# matched through a deletion index: every term is also stored under each variant with one
+# character deleted, so a query term finds the terms within one edit by looking up its own
+# deletion variants.
+PRODUCT_SEARCH_ENABLED = os.getenv("PRODUCT_SEARCH_ENABLED", "false").lower() == "true"
+# Comma separated field:weight pairs; a product matching in a heavier field ranks higher
+PRODUCT_SEARCH_FIELDS = {
+    field.strip(): float(weight or 1)
+    for field, _, weight in (item.partition(":") for item in os.getenv(
+        "PRODUCT_SEARCH_FIELDS", "product_name:3,sub_category_name:2,category_name:1").split(","))
+    if field.strip()
+}
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Terms a prefix expands to, the ones in the most products first
+MAX_PREFIX_EXPANSIONS = 64
+# Shortest query term matched with a typo; shorter terms only match exactly or as a prefix
+MIN_TYPO_TERM_LENGTH = 4
+MAX_QUERY_TERMS = 8
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.6
+TYPO_MATCH = 0.4
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    return TOKEN_PATTERN.findall("".join(char for char in text if not unicodedata.combining(char)))
+
+
+def _deletions(term: str) -> Set[str]:
+    return {term[:index] + term[index + 1:] for index in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    # One insertion, deletion, substitution or transposition of adjacent characters
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    if len(a) < len(b):
+        return a[start:] == b[start + 1:]
+    if a[start + 1:] == b[start + 1:]:  # substitution
+        return True
+    return a[start + 2:] == b[start + 2:] and a[start:start + 2] == b[start:start + 2][::-1]
+
+
+class ProductSearchIndex:
+    """
+    Ranked prefix and typo-tolerant product search.
+
+    Every query term has to match (the last one also as a prefix while the user is typing); a
+    product's score sums, per query term, the match quality (exact, prefix or typo) times the
+    weight of the best field it matched in. Ties go to the shorter product name.
+
+    Args:
+    - fields (Dict[str, float]): Indexed fields and their weights; the first one is the product name.
+    """
+
+    def __init__(self, fields: Dict[str, float] = PRODUCT_SEARCH_FIELDS):
+        self.fields = dict(fields)
+        self.name_field = next(iter(self.fields), None)
+        self._lock = threading.Lock()
+        self._products = []  # slot -> product, None for free slots
+        self._name_lengths = []  # slot -> length of the product name, the tie-breaker
+        self._terms_of = []  # slot -> ((term, weight), ...) the product is indexed under
+        self._slots = {}  # product id -> slot
+        self._free_slots = []
+        self._postings = {}  # term -> {slot: weight}
+        # term -> [(-weight, name length, slot)] sorted, i.e. the term's products in rank order
+        self._ranked_postings = {}
+        self._vocabulary = []  # sorted terms
+        self._deletion_index = defaultdict(set)  # term with one character deleted -> terms
+        self._watch = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def start(self, firestore_db):
+        self._watch = firestore_db.collection("Products").on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._ready.clear()
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        with self._lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    self._remove(change.document.id)
+                else:
+                    self._add(change.document.id, change.document.to_dict())
+        if not self._ready.is_set():
+            logging.info("Product search index loaded with %d products", len(self._slots))
+        self._ready.set()
+
+    def load(self, products: Iterable[dict]):
+        """
+        Index products directly, e.g. for benchmarks; each needs a ``product_id``.
+        """
+        with self._lock:
+            for product in products:
+                self._add(product["product_id"], product)
+        self._ready.set()
+
+    # Index maintenance, with the lock held
+
+    def _add(self, product_id: str, product: dict):
+        self._remove(product_id)
+        weights = {}
+        for field, weight in self.fields.items():
+            for term in tokenize(product.get(field)):
+                weights[term] = max(weights.get(term, 0), weight)
+        slot = self._free_slots.pop() if self._free_slots else len(self._products)
+        if slot == len(self._products):
+            self._products.append(None)
+            self._name_lengths.append(0)
+            self._terms_of.append(())
+        name_length = len(str(product.get(self.name_field) or ""))
+        self._products[slot] = product
+        self._name_lengths[slot] = name_length
+        self._terms_of[slot] = tuple(weights.items())
+        self._slots[product_id] = slot
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._ranked_postings[term] = []
+                bisect.insort(self._vocabulary, term)
+                for variant in _deletions(term):
+                    self._deletion_index[variant].add(term)
+            postings[slot] = weight
+            bisect.insort(self._ranked_postings[term], (-weight, name_length, slot))
+
+    def _remove(self, product_id: str):
+        slot = self._slots.pop(product_id, None)
+        if slot is None:
+            return
+        for term, weight in self._terms_of[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if postings:
+                ranked = self._ranked_postings[term]
+                del ranked[bisect.bisect_left(ranked, (-weight, self._name_lengths[slot], slot))]
+                continue
+            del self._postings[term]
+            del self._ranked_postings[term]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+            for variant in _deletions(term):
+                terms = self._deletion_index[variant]
+                terms.discard(term)
+                if not terms:
+                    del self._deletion_index[variant]
+        self._products[slot] = None
+        self._terms_of[slot] = ()
+        self._free_slots.append(slot)
+
+    # Queries, with the lock held
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        terms = self._vocabulary[start:end]
+        if len(terms) > MAX_PREFIX_EXPANSIONS:
+            terms = heapq.nlargest(MAX_PREFIX_EXPANSIONS, terms, key=lambda term: len(self._postings[term]))
+        return terms
+
+    def _typo_terms(self, term: str) -> Set[str]:
+        candidates = set(self._deletion_index.get(term, ()))
+        for variant in _deletions(term):
+            if variant in self._postings:
+                candidates.add(variant)
+            candidates.update(self._deletion_index.get(variant, ()))
+        return {candidate for candidate in candidates if candidate != term and _within_one_edit(term, candidate)}
+
+    def _matches(self, term: str, as_prefix: bool) -> Dict[str, float]:
+        """
+        Indexed terms a query term matches, with the quality of each match.
+        """
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH
+        if as_prefix:
+            for prefix_term in self._prefix_terms(term):
+                matches.setdefault(prefix_term, PREFIX_MATCH)
+        if not matches and len(term) >= MIN_TYPO_TERM_LENGTH:
+            for typo_term in self._typo_terms(term):
+                matches[typo_term] = TYPO_MATCH
+        return matches
+
+    def _scores(self, matches: Dict[str, float]) -> Dict[int, float]:
+        scores = {}
+        for term, quality in matches.items():
+            for slot, weight in self._postings[term].items():
+                score = quality * weight
+                if score > scores.get(slot, 0):
+                    scores[slot] = score
+        return scores
+
+    def _size(self, matches: Dict[str, float]) -> int:
+        return sum(len(self._postings[term]) for term in matches)
+
+    def _scorer(self, matches: Dict[str, float], candidates: int):
+        # Score all of the term's products up front if that is cheaper than looking up each candidate
+        if self._size(matches) <= candidates * len(matches):
+            return self._scores(matches).get
+        postings = [(self._postings[term], quality) for term, quality in matches.items()]
+
+        def score(slot):
+            best = 0
+            for term_postings, quality in postings:
+                weight = term_postings.get(slot)
+                if weight is not None and quality * weight > best:
+                    best = quality * weight
+            return best
+        return score
+
+    def _max_score(self, matches: Dict[str, float]) -> float:
+        return max(-self._ranked_postings[term][0][0] * quality for term, quality in matches.items())
+
+    def _ranked(self, term: str, quality: float):
+        # The term's products in rank order as (-score, name length, slot)
+        return ((negative_weight * quality, name_length, slot)
+                for negative_weight, name_length, slot in self._ranked_postings[term])
+
+    def _top(self, per_term: List[Dict[str, float]], limit: int, accept) -> List[int]:
+        """
+        Best ``limit`` products matching every query term. The products of the term matching the
+        fewest are visited in rank order (merging the rank-ordered postings of its terms) and
+        scored against the other terms, until no product left can beat the ones found.
+        """
+        per_term = sorted(per_term, key=self._size)
+        driver, others = per_term[0], per_term[1:]
+        if not driver or not all(others):
+            return []
+        candidates = self._size(driver)
+        scorers = [self._scorer(matches, candidates) for matches in others]
+        others_max = sum(self._max_score(matches) for matches in others)
+        ranked = [self._ranked(term, quality) for term, quality in driver.items()]
+        best = []  # min-heap of (score, -name length, -slot), the worst of the best first
+        seen = set()
+        for negative_score, name_length, slot in heapq.merge(*ranked):
+            if len(best) == limit and (negative_score - others_max, name_length, slot) >= \
+                    (-best[0][0], -best[0][1], -best[0][2]):
+                break
+            # A product is first visited with the best of its driver term matches
+            if slot in seen:
+                continue
+            seen.add(slot)
+            if not accept(slot):
+                continue
+            score = -negative_score
+            for scorer in scorers:
+                term_score = scorer(slot)
+                if not term_score:
+                    break
+                score += term_score
+            else:
+                entry = (score, -name_length, -slot)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        return [-negative_slot for _, _, negative_slot in sorted(best, reverse=True)]
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT,
+               sub_category_id: Optional[str] = None) -> List[dict]:
+        """
+        Return up to ``limit`` products matching ``query``, best first.
+
+        Args:
+        - query (str): Search text; its last term also matches as a prefix unless followed by a space.
+        - sub_category_id (str): Only return products of this sub-category.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        last_is_prefix = query[-1].isalnum()
+        products = self._products
+
+        def accept(slot):
+            return sub_category_id is None or products[slot].get("sub_category_id") == sub_category_id
+
+        with self._lock:
+            per_term = [self._matches(term, as_prefix=last_is_prefix and index == len(terms) - 1)
+                        for index, term in enumerate(terms)]
+            return [products[slot] for slot in self._top(per_term, limit, accept)]
+
+
+product_search_index = ProductSearchIndex()
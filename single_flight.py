@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import os
+import time
+from typing import Awaitable, Callable, Hashable
+
+from firestore_executor import run_firestore
+
+# Hot documents (an order being delivered, its refunds, a sub-category's products) are read by
+# the customer app, the rider app and the store dashboard at the same moment. Concurrent reads of
+# the same key share one in-flight Firestore call; with SINGLE_FLIGHT_TTL_MS > 0 its result is also
+# reused by reads arriving within that many milliseconds after it completed. Writes made through
+# this instance forget the key, so reads that start after a write never get an older result.
+SINGLE_FLIGHT_TTL_MS = float(os.getenv("SINGLE_FLIGHT_TTL_MS", "0"))
+# Completed results kept for the TTL before expired ones are swept
+SINGLE_FLIGHT_MAX_RECENT = 10000
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent reads of the same key into one fetch, on a single event loop.
+
+    Args:
+    - ttl_ms (float): How long a completed result keeps serving new reads, 0 to share only in-flight fetches.
+    """
+
+    def __init__(self, ttl_ms: float = SINGLE_FLIGHT_TTL_MS):
+        self.ttl = ttl_ms / 1000
+        self._in_flight = {}  # (namespace, key) -> Future
+        self._recent = {}  # (namespace, key) -> (expires at, result)
+        self._requests = 0
+        self._fetches = 0
+        self._coalesced = 0
+        self._ttl_hits = 0
+
+    async def do(self, namespace: str, key: Hashable, fetch: Callable[[], Awaitable]):
+        """
+        Return the result of ``fetch()``, or of the fetch already running for the same key.
+
+        The fetch runs as its own task, so a caller being cancelled does not cancel it for the
+        others. Results are shared, so callers must not mutate them.
+
+        Raises:
+        - Exception: Whatever the shared fetch raised, to every caller sharing it.
+        """
+        self._requests += 1
+        flight_key = (namespace, key)
+        recent = self._recent.get(flight_key)
+        if recent is not None:
+            if recent[0] > time.monotonic():
+                self._ttl_hits += 1
+                return recent[1]
+            del self._recent[flight_key]
+        future = self._in_flight.get(flight_key)
+        if future is None:
+            self._fetches += 1
+            future = asyncio.ensure_future(fetch())
+            self._in_flight[flight_key] = future
+            future.add_done_callback(functools.partial(self._done, flight_key))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(future)
+
+    async def get_document(self, doc_ref):
+        """
+        Coalesced ``doc_ref.get()``; the ``DocumentSnapshot`` is shared, ``to_dict()`` returns a copy.
+        """
+        return await self.do(doc_ref.parent.id, doc_ref.path, lambda: run_firestore(doc_ref.get))
+
+    def _done(self, flight_key, future: asyncio.Future):
+        if self._in_flight.get(flight_key) is not future:
+            # Forgotten while in flight, e.g. by a write, so the result is not reused
+            return
+        del self._in_flight[flight_key]
+        if future.cancelled() or future.exception() is not None or not self.ttl:
+            return
+        now = time.monotonic()
+        if len(self._recent) >= SINGLE_FLIGHT_MAX_RECENT:
+            self._recent = {recent_key: recent for recent_key, recent in self._recent.items() if recent[0] > now}
+        self._recent[flight_key] = (now + self.ttl, future.result())
+
+    def forget(self, namespace: str, key: Hashable = None):
+        """
+        Stop sharing the in-flight or recent result for ``key``, or for every key of ``namespace``,
+        after a write. Callers already waiting still get the fetch they joined.
+        """
+        if key is not None:
+            self._in_flight.pop((namespace, key), None)
+            self._recent.pop((namespace, key), None)
+            return
+        for flights in (self._in_flight, self._recent):
+            for flight_key in [flight_key for flight_key in flights if flight_key[0] == namespace]:
+                del flights[flight_key]
+
+    def forget_document(self, doc_ref):
+        self.forget(doc_ref.parent.id, doc_ref.path)
+
+    def render(self) -> str:
+        """
+        Render the coalescing metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, value in (("single_flight_requests_total", self._requests),
+                            ("single_flight_fetches_total", self._fetches),
+                            ("single_flight_coalesced_total", self._coalesced),
+                            ("single_flight_ttl_hits_total", self._ttl_hits),
+                            # Firestore calls the shared results stood in for
+                            ("single_flight_rpcs_saved_total", self._coalesced + self._ttl_hits)):
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The tests run against the in-memory Firestore stand-in, without credentials
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_firestore import MemoryFirestore  # noqa: E402
+
+
+@pytest.fixture
+def memory_db():
+    return MemoryFirestore()
+
+
+@pytest.fixture
+def app_db():
+    """
+    The app's process-wide stand-in client, emptied (with the catalog cache) for each test.
+    """
+    from catalog_cache import catalog_cache
+    from firestore_client import get_firestore_db
+
+    firestore_db = get_firestore_db()
+    with firestore_db._lock:
+        firestore_db._collections.clear()
+    catalog_cache.clear()
+    return firestore_db
+
+
+@pytest.fixture
+def client(app_db):
+    from starlette.testclient import TestClient
+
+    import main
+
+    return TestClient(main.app)
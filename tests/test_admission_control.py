@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from admission_control import (EXEMPT, EXPORT, READ, SCAN, WRITE, AdmissionControlMiddleware, AdmissionController,
+                               RouteClassLimits, paged_route_class, route_class)
+
+
+def test_requests_over_the_limit_are_shed_without_waiting():
+    controller = AdmissionController({SCAN: RouteClassLimits(1, 1, 2, 1000, 0, 5)})
+
+    async def scenario():
+        assert await controller.acquire(SCAN)
+        assert not await controller.acquire(SCAN)
+        controller.release(SCAN, 0.0, 10)
+        assert await controller.acquire(SCAN)
+
+    asyncio.run(scenario())
+    assert controller.classes[SCAN].shed == 1
+
+
+def test_waiting_request_gets_the_released_slot():
+    controller = AdmissionController({READ: RouteClassLimits(1, 1, 2, 1000, 1000, 1)})
+
+    async def scenario():
+        assert await controller.acquire(READ)
+        waiter = asyncio.ensure_future(controller.acquire(READ))
+        await asyncio.sleep(0)
+        controller.release(READ, 0.0, 10)
+        return await waiter
+
+    assert asyncio.run(scenario())
+
+
+def test_slow_response_cuts_the_lowest_priority_busy_class_first():
+    controller = AdmissionController({WRITE: RouteClassLimits(8, 2, 32, 100, 0, 1),
+                                      SCAN: RouteClassLimits(4, 1, 4, 1000, 0, 5)})
+
+    async def scenario():
+        await controller.acquire(WRITE)
+        await controller.acquire(SCAN)
+        controller.release(WRITE, 1.0, 500)
+
+    asyncio.run(scenario())
+    assert controller.classes[WRITE].limit == 8
+    assert controller.classes[SCAN].limit < 4
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", SCAN),
+    ("limit=10", READ),
+    ("page_token=abc", READ),
+    ("stream=true", EXPORT),
+    ("stream=1&limit=10", EXPORT),
+])
+def test_paged_route_class(query, expected):
+    app = FastAPI()
+    classes = []
+
+    @app.get("/orders/")
+    @route_class(paged_route_class)
+    async def list_orders():
+        return []
+
+    @app.get("/health")
+    @route_class(EXEMPT)
+    async def health():
+        return {}
+
+    controller = AdmissionController()
+    guarded = AdmissionControlMiddleware(app, controller)
+
+    async def recording_app(scope, receive, send):
+        scope["app"] = app
+        if scope["type"] == "http":
+            classes.append(guarded._route_class(scope))
+        await guarded(scope, receive, send)
+
+    client = TestClient(recording_app)
+    assert client.get(f"/orders/?{query}").status_code == 200
+    assert classes[-1] == expected
+    client.get("/health")
+    assert classes[-1] == EXEMPT
+
+
+def test_bulk_job_does_not_hold_a_write_slot(monkeypatch):
+    import main
+
+    job_started, finish_job, job_finished = threading.Event(), threading.Event(), threading.Event()
+
+    def slow_job(firestore_db, job_id):
+        job_started.set()
+        finish_job.wait(5)
+        job_finished.set()
+
+    monkeypatch.setattr(main, "run_job", slow_job)
+    controller = AdmissionController()
+    guarded = AdmissionControlMiddleware(main.app, controller)
+
+    async def guarded_app(scope, receive, send):
+        scope["app"] = main.app
+        await guarded(scope, receive, send)
+
+    try:
+        response = TestClient(guarded_app).post("/admin/bulk_jobs/backfill/modified_timestamp")
+        assert response.status_code == 202
+        # Answered while the job is still running, and without keeping its slot
+        assert not job_finished.is_set()
+        assert job_started.wait(5)
+        assert controller.classes[WRITE].in_flight == 0
+    finally:
+        finish_job.set()
@@ -0,0 +1,124 @@
+from collections import Counter
+
+import pytest
+from google.api_core import exceptions
+
+from bulk_orders import JOB_BACKFILL_MODIFIED_TIMESTAMP, JOB_STATUS_CHANGE, create_job, get_job, run_job
+from memory_firestore import MemoryWriteBatch
+from order_counters import read_status_counts, rebuild_status_counts
+
+
+def seed_orders(firestore_db, count):
+    firestore_db.seed("Orders", {f"o{number:03d}": {"order_id": f"o{number:03d}", "order_status": "pending"}
+                                 for number in range(count)})
+    rebuild_status_counts(firestore_db)
+    return [f"o{number:03d}" for number in range(count)]
+
+
+def run_status_change(firestore_db, order_ids, new_status="delivered") -> str:
+    job_id = create_job(firestore_db, JOB_STATUS_CHANGE, {"order_ids": order_ids, "new_status": new_status})
+    run_job(firestore_db, job_id)
+    return job_id
+
+
+def statuses(firestore_db) -> Counter:
+    return Counter(doc.to_dict()["order_status"] for doc in firestore_db.collection("Orders").stream())
+
+
+def test_status_change_job_updates_orders_and_counters(memory_db):
+    order_ids = seed_orders(memory_db, 250)
+
+    job = get_job(memory_db, run_status_change(memory_db, order_ids[:240] + ["missing"]))
+
+    assert (job["status"], job["processed"], job["skipped"], job["checkpoint"]) == ("completed", 240, 1, 241)
+    assert statuses(memory_db) == Counter({"delivered": 240, "pending": 10})
+    assert read_status_counts(memory_db) == Counter({"delivered": 240, "pending": 10})
+
+
+def test_commit_that_applied_before_failing_is_not_counted_twice(memory_db, monkeypatch):
+    order_ids = seed_orders(memory_db, 150)
+    commit = MemoryWriteBatch.commit
+    failures = []
+
+    def applied_then_failed(batch):
+        writes_orders = any(path.startswith("Orders/") for _, path, _, _ in batch._writes)
+        result = commit(batch)
+        if writes_orders and not failures:
+            failures.append(True)
+            raise exceptions.DeadlineExceeded("lost reply")
+        return result
+
+    monkeypatch.setattr(MemoryWriteBatch, "commit", applied_then_failed)
+    monkeypatch.setattr("bulk_orders.time.sleep", lambda seconds: None)
+
+    assert get_job(memory_db, run_status_change(memory_db, order_ids))["status"] == "completed"
+    assert failures
+    assert read_status_counts(memory_db) == Counter({"delivered": 150, "pending": 0})
+
+
+def test_order_changed_after_the_page_was_read_is_rechecked(memory_db, monkeypatch):
+    order_ids = seed_orders(memory_db, 10)
+    get_all = type(memory_db).get_all
+
+    def read_then_concurrent_change(firestore_db, references, *args, **kwargs):
+        documents = list(get_all(firestore_db, references, *args, **kwargs))
+        if firestore_db.collection("Orders").document("o000").get().to_dict()["order_status"] == "pending":
+            firestore_db.collection("Orders").document("o000").update({"order_status": "delivered"})
+        return documents
+
+    monkeypatch.setattr(type(memory_db), "get_all", read_then_concurrent_change)
+
+    run_status_change(memory_db, order_ids)
+
+    # o000 was delivered outside the job (without counting it), the job must not count it again
+    assert read_status_counts(memory_db) == Counter({"delivered": 9, "pending": 1})
+    assert statuses(memory_db) == Counter({"delivered": 10})
+
+
+def test_failed_job_resumes_from_its_checkpoint(memory_db, monkeypatch):
+    order_ids = seed_orders(memory_db, 250)
+    commit = MemoryWriteBatch.commit
+    commits = []
+
+    def fail_second_page(batch):
+        commits.append(batch)
+        if len(commits) == 2:
+            raise exceptions.PermissionDenied("denied")
+        return commit(batch)
+
+    monkeypatch.setattr("bulk_orders.BULK_WRITE_CONCURRENCY", 1)
+    monkeypatch.setattr(MemoryWriteBatch, "commit", fail_second_page)
+    job_id = run_status_change(memory_db, order_ids)
+    job = get_job(memory_db, job_id)
+    assert (job["status"], job["checkpoint"]) == ("failed", 100)
+
+    monkeypatch.setattr(MemoryWriteBatch, "commit", commit)
+    run_job(memory_db, job_id)
+
+    assert get_job(memory_db, job_id)["status"] == "completed"
+    assert read_status_counts(memory_db) == Counter({"delivered": 250, "pending": 0})
+
+
+def test_modified_timestamp_backfill(memory_db):
+    memory_db.seed("Orders", {f"o{number:03d}": {} for number in range(450)})
+    memory_db.collection("Orders").document("o001").set({"modified_timestamp": "kept"})
+
+    job_id = create_job(memory_db, JOB_BACKFILL_MODIFIED_TIMESTAMP, {})
+    run_job(memory_db, job_id)
+
+    orders = {doc.id: doc.to_dict() for doc in memory_db.collection("Orders").stream()}
+    assert orders["o001"]["modified_timestamp"] == "kept"
+    assert all(order["modified_timestamp"] is not None for order in orders.values())
+    assert get_job(memory_db, job_id)["processed"] == 449
+
+
+@pytest.mark.parametrize("method, path, status_code", [("get", "/admin/bulk_jobs/missing", 404),
+                                                       ("post", "/admin/bulk_jobs/missing/resume", 404)])
+def test_unknown_jobs(app_db, client, method, path, status_code):
+    assert getattr(client, method)(path).status_code == status_code
+
+
+def test_completed_job_is_not_resumed(app_db, client):
+    job_id = run_status_change(app_db, seed_orders(app_db, 1))
+
+    assert client.post(f"/admin/bulk_jobs/{job_id}/resume").status_code == 409
@@ -0,0 +1,89 @@
+import asyncio
+
+from catalog_cache import MISSING, CachedController, CatalogCache
+
+
+class FakeController:
+    def __init__(self):
+        self.reads = 0
+        self.items = {"1": {"name": "Dairy", "tags": ["milk"]}}
+
+    def get_all_items(self):
+        self.reads += 1
+        return [dict(item) for item in self.items.values()]
+
+    async def read_item(self, item_id):
+        self.reads += 1
+        return self.items.get(item_id)
+
+    def get_item_stream(self):
+        return iter(list(self.items.values()))
+
+    def get_uncached(self):
+        self.reads += 1
+        return list(self.items)
+
+    def update_item(self, item_id, data):
+        self.items[item_id] = data
+
+
+def cached(controller, cache):
+    return CachedController(controller, "items", ("get_all_items", "read_item", "get_item_stream"), cache)
+
+
+def test_listed_reads_are_served_from_the_cache():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    proxy = cached(controller, cache)
+
+    assert proxy.get_all_items() == proxy.get_all_items()
+    assert asyncio.run(proxy.read_item("1")) == asyncio.run(proxy.read_item("1"))
+    assert controller.reads == 2
+
+
+def test_unlisted_reads_pass_through_without_invalidating():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    proxy = cached(controller, cache)
+    proxy.get_all_items()
+
+    proxy.get_uncached()
+    proxy.get_uncached()
+    proxy.get_all_items()
+    assert controller.reads == 3
+
+
+def test_callers_get_copies():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    proxy = cached(controller, cache)
+
+    proxy.get_all_items()[0]["tags"].append("mutated")
+    proxy.get_all_items()[0]["name"] = "mutated"
+    assert proxy.get_all_items() == [{"name": "Dairy", "tags": ["milk"]}]
+
+
+def test_iterators_are_not_cached():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    proxy = cached(controller, cache)
+
+    assert list(proxy.get_item_stream()) == list(proxy.get_item_stream())
+
+
+def test_writes_invalidate_the_namespace():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    proxy = cached(controller, cache)
+    cache.set("other", "key", "kept")
+    proxy.get_all_items()
+
+    proxy.update_item("1", {"name": "Bakery", "tags": []})
+    assert proxy.get_all_items() == [{"name": "Bakery", "tags": []}]
+    assert cache.get("other", "key") == "kept"
+
+
+def test_controller_without_cached_methods_only_invalidates():
+    controller, cache = FakeController(), CatalogCache(maxsize=16, ttl=60)
+    stock = CachedController(FakeController(), "items", cache=cache)
+    cached(controller, cache).get_all_items()
+
+    stock.get_all_items()
+    assert cache.get("items", ("get_all_items", (), ())) is not MISSING
+    stock.update_item("1", {})
+    assert cache.get("items", ("get_all_items", (), ())) is MISSING
@@ -0,0 +1,17 @@
+from catalog_cache import catalog_cache
+
+
+def test_products_by_sub_category_are_cached_as_body_and_etag(app_db, client):
+    app_db.seed("Products", {"p1": {"product_id": "p1", "sub_category_id": "dairy", "current_inventory": 5}})
+
+    first = client.get("/get_products_based/dairy", params={"fields": "product_id"})
+    second = client.get("/get_products_based/dairy", params={"fields": "product_id"})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == [{"product_id": "p1"}]
+    assert first.headers["etag"] == second.headers["etag"]
+    cached = catalog_cache.get("products", ("get_products_by_subcategory", "dairy", ("product_id",)))
+    assert cached == (second.content, second.headers["etag"])
+    assert client.get("/get_products_based/dairy", params={"fields": "product_id"},
+                      headers={"if-none-match": first.headers["etag"]}).status_code == 304
+
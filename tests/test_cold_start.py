@@ -0,0 +1,71 @@
+import asyncio
+import sys
+import types
+
+from fastapi import APIRouter, FastAPI
+from starlette.testclient import TestClient
+
+import firestore_client
+from lazy_routers import LazyRouterMiddleware, LazyRouters
+from memory_firestore import MemoryFirestore
+
+
+def test_client_is_created_on_first_use_only(monkeypatch):
+    monkeypatch.setattr(firestore_client, "_client", None)
+    lazy_client = firestore_client.LazyFirestoreClient()
+    assert firestore_client._client is None
+
+    lazy_client.collection("Orders")
+
+    assert isinstance(firestore_client._client, MemoryFirestore)
+
+
+def test_concurrent_requests_share_one_client_creation(monkeypatch):
+    created = []
+
+    def create():
+        created.append(MemoryFirestore())
+        return created[-1]
+
+    monkeypatch.setattr(firestore_client, "_client", None)
+    monkeypatch.setattr(firestore_client, "_client_creation", None)
+    monkeypatch.setattr(firestore_client, "create_firestore_client", create)
+
+    async def requests():
+        await asyncio.gather(*(firestore_client.ensure_firestore_client() for _ in range(10)))
+
+    asyncio.run(requests())
+
+    assert len(created) == 1
+    assert firestore_client._client is created[0]
+
+
+def test_feature_routers_load_on_the_first_request_they_serve(monkeypatch):
+    feature = types.ModuleType("feature_router_for_test")
+    feature.router = APIRouter()
+
+    @feature.router.get("/feature")
+    def get_feature():
+        return {"feature": True}
+
+    @feature.router.get("/hello")
+    def shadowing_hello():
+        return {"from": "feature"}
+
+    monkeypatch.setitem(sys.modules, feature.__name__, feature)
+    app = FastAPI()
+
+    @app.get("/hello")
+    def hello():
+        return {"from": "app"}
+
+    lazy_routers = LazyRouters(app, [feature.__name__])
+    app.add_middleware(LazyRouterMiddleware, lazy_routers=lazy_routers)
+    client = TestClient(app)
+
+    assert client.get("/hello").json() == {"from": "app"}
+    assert not lazy_routers.loaded
+    assert client.get("/feature").json() == {"feature": True}
+    assert lazy_routers.loaded
+    # Routes of feature routers take precedence, as when they are included eagerly
+    assert client.get("/hello").json() == {"from": "feature"}
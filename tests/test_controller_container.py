@@ -0,0 +1,60 @@
+import threading
+
+from catalog_cache import CachedController
+from controller_container import ControllerContainer
+
+
+class FakeController:
+    created = 0
+
+    def __init__(self, firestore_db):
+        FakeController.created += 1
+        self.firestore_db = firestore_db
+        self.closed = False
+
+    def get_thing(self):
+        return {"thing": 1}
+
+    def close(self):
+        self.closed = True
+
+
+def test_controllers_are_created_once_per_process(app_db):
+    container = ControllerContainer()
+    FakeController.created = 0
+    instances = []
+
+    def get():
+        instances.append(container.get(FakeController))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeController.created == 1
+    assert all(instance is instances[0] for instance in instances)
+    assert instances[0].firestore_db is app_db
+
+
+def test_cached_controllers_are_kept_apart_by_namespace_and_methods(app_db):
+    container = ControllerContainer()
+
+    plain = container.get(FakeController)
+    cached = container.get(FakeController, cache_namespace="things", cached_methods=("get_thing",))
+
+    assert isinstance(cached, CachedController)
+    assert cached is container.get(FakeController, cache_namespace="things", cached_methods=("get_thing",))
+    assert cached is not plain
+    assert cached.get_thing() == {"thing": 1}
+
+
+def test_close_releases_the_controllers(app_db):
+    container = ControllerContainer()
+    controller = container.get(FakeController)
+
+    container.close()
+
+    assert controller.closed
+    assert container.get(FakeController) is not controller
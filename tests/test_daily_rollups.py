@@ -0,0 +1,50 @@
+from datetime import date, datetime, timezone
+
+from daily_rollups import NO_STORE, read_daily_rollups, refund_change_deltas, stock_intake_deltas
+
+TODAY = datetime.now(timezone.utc).date()
+
+
+def create_order(client, **fields) -> str:
+    return client.post("/orders", json={"user_id": "u1", **fields}).json()["order"]["order_id"]
+
+
+def report(client, **params) -> dict:
+    return client.get("/reports/daily", params={"start": TODAY.isoformat(), "end": TODAY.isoformat(), **params}).json()
+
+
+def test_orders_without_a_store_are_not_a_cross_store_total(app_db, client):
+    delivered = create_order(client, store_id="s1", total_amount=30)
+    create_order(client, store_id="s2", total_amount=5)
+    create_order(client, total_amount=7)
+    client.put(f"/orders/{delivered}/status/", params={"new_status": "delivered"})
+
+    assert report(client, store_id="s1")["totals"] == {
+        "orders_created": 1, "delivered_orders": 1, "sales_amount": 30, "transitions": {"pending": 1, "delivered": 1}}
+    assert report(client, store_id=NO_STORE)["totals"]["orders_created"] == 1
+    totals = report(client)["totals"]
+    assert totals["orders_created"] == 3
+    assert totals["sales_amount"] == 30
+
+
+def test_leaving_delivered_reverses_the_sale(app_db, client):
+    order_id = create_order(client, store_id="s1", total_amount=30)
+    for new_status in ("delivered", "cancelled"):
+        client.put(f"/orders/{order_id}/status/", params={"new_status": new_status})
+
+    totals = report(client, store_id="s1")["totals"]
+    assert (totals["delivered_orders"], totals["sales_amount"]) == (0, 0)
+
+
+def test_refund_and_stock_deltas():
+    when = datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc)
+
+    assert refund_change_deltas({}, [{"amount": 5}], [{"amount": 5}, {"amount": 2.5}], when) == {
+        ("2024-03-01", NO_STORE): {"refunds": 1, "refund_amount": 2.5}}
+    assert stock_intake_deltas(None, 4, when) == {("2024-03-01", NO_STORE): {"stock_intakes": 1, "stock_units": 4}}
+
+
+def test_report_range_is_validated(app_db, client):
+    assert client.get("/reports/daily", params={"start": "2024-02-01", "end": "2024-01-01"}).status_code == 400
+    assert client.get("/reports/daily", params={"start": "2023-01-01", "end": "2024-12-31"}).status_code == 400
+    assert read_daily_rollups(app_db, date(2024, 1, 1), date(2024, 1, 2)) == {"days": [], "totals": {}}
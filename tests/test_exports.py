@@ -0,0 +1,116 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bulk_orders import JOB_BACKFILL_CREATED_TIMESTAMP, create_job, run_job
+from exports import EXPORT_DATASETS, export_partition_csv, export_partition_parquet, iter_chunks
+from pagination import DOCUMENT_ID, encode_page_token
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=1)
+
+
+def seed_orders(firestore_db, count=10):
+    firestore_db.seed("Orders", {
+        f"o{number:02d}": {
+            "order_id": f"o{number:02d}",
+            "created_timestamp": START + timedelta(minutes=number),
+            "modified_timestamp": START + timedelta(minutes=number),
+            "refunds": [{"amount": refund} for refund in range(number % 3)],
+        } for number in range(count)})
+
+
+def exported_ids(chunks):
+    return [row["document_id"] for rows, _ in chunks for row in rows]
+
+
+def test_orders_modified_during_an_export_are_exported_once(memory_db):
+    seed_orders(memory_db)
+    chunks = iter_chunks(memory_db, EXPORT_DATASETS["orders"], START, END, chunk_size=3)
+
+    seen = exported_ids([next(chunks)])
+    # An already exported order moves past the cursor, a pending one moves before it
+    memory_db.collection("Orders").document("o00").update({"modified_timestamp": END - timedelta(seconds=1)})
+    memory_db.collection("Orders").document("o08").update({"modified_timestamp": START})
+    seen += exported_ids(chunks)
+
+    assert seen == [f"o{number:02d}" for number in range(10)]
+
+
+def test_exploded_export_resumes_within_a_document(memory_db):
+    seed_orders(memory_db, count=6)
+    dataset = EXPORT_DATASETS["order_refunds"]
+    rows = [row for chunk, _ in iter_chunks(memory_db, dataset, START, END, chunk_size=2) for row in chunk]
+    # The download was cut off after the first refund of o02
+    cursor = encode_page_token({"created_timestamp": START + timedelta(minutes=2), DOCUMENT_ID: "o02"})
+
+    resumed = [row for chunk, _ in iter_chunks(memory_db, dataset, START, END, cursor, after_index=0, chunk_size=2)
+               for row in chunk]
+
+    assert [(row["document_id"], row["index"]) for row in rows] == [
+        ("o01", 0), ("o02", 0), ("o02", 1), ("o04", 0), ("o05", 0), ("o05", 1)]
+    assert [(row["document_id"], row["index"]) for row in resumed] == [("o02", 1), ("o04", 0), ("o05", 0), ("o05", 1)]
+
+
+def test_csv_route_resumes_after_the_last_row(app_db, client):
+    seed_orders(app_db)
+    params = {"start": START.isoformat(), "end": END.isoformat()}
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/exports/orders.csv", params=params).text)))
+    resumed = list(csv.DictReader(io.StringIO(client.get("/exports/orders.csv", params=dict(
+        params, after_date=rows[3]["created_timestamp"], after_id=rows[3]["document_id"])).text)))
+
+    assert [row["document_id"] for row in rows] == [f"o{number:02d}" for number in range(10)]
+    assert [row["document_id"] for row in resumed] == [f"o{number:02d}" for number in range(4, 10)]
+    assert client.get("/exports/unknown.csv", params=params).status_code == 404
+
+
+def test_csv_partition_resumes_from_its_checkpoint(memory_db, tmp_path, monkeypatch):
+    seed_orders(memory_db)
+    path = str(tmp_path / "orders.csv")
+    dataset = EXPORT_DATASETS["orders"]
+    monkeypatch.setattr("exports.EXPORT_CHUNK_SIZE", 4)
+    chunks = iter_chunks(memory_db, dataset, START, END, chunk_size=4)
+
+    def interrupted(*args, **kwargs):
+        yield next(chunks)
+        raise ConnectionError
+
+    monkeypatch.setattr("exports.iter_chunks", interrupted)
+    with pytest.raises(ConnectionError):
+        export_partition_csv(memory_db, dataset, START, END, path)
+    monkeypatch.undo()
+
+    assert export_partition_csv(memory_db, dataset, START, END, path) == 6
+    with open(path, newline="") as export_file:
+        assert [row["document_id"] for row in csv.DictReader(export_file)] == [f"o{n:02d}" for n in range(10)]
+
+
+def test_parquet_partition(memory_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    seed_orders(memory_db)
+    path = str(tmp_path / "orders.parquet")
+
+    assert export_partition_parquet(memory_db, EXPORT_DATASETS["orders"], START, END, path) == 10
+    assert pq.read_table(path).column("document_id").to_pylist() == [f"o{n:02d}" for n in range(10)]
+
+
+def test_new_orders_record_their_creation_time(app_db, client):
+    order_id = client.post("/orders", json={"user_id": "u1"}).json()["order"]["order_id"]
+
+    assert app_db.collection("Orders").document(order_id).get().to_dict()["created_timestamp"] is not None
+
+
+def test_created_timestamp_backfill(memory_db):
+    modified = START + timedelta(hours=1)
+    memory_db.seed("Orders", {"old": {"modified_timestamp": modified}, "oldest": {},
+                              "new": {"created_timestamp": START, "modified_timestamp": modified}})
+
+    run_job(memory_db, create_job(memory_db, JOB_BACKFILL_CREATED_TIMESTAMP, {}))
+
+    orders = {doc.id: doc.to_dict() for doc in memory_db.collection("Orders").stream()}
+    assert orders["old"]["created_timestamp"] == modified
+    assert orders["oldest"]["created_timestamp"] is not None
+    assert orders["new"]["created_timestamp"] == START
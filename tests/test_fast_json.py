@@ -0,0 +1,66 @@
+import json
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud.firestore_v1 import DocumentReference, GeoPoint
+from pydantic import BaseModel, Field
+
+from fast_json import dumps, shape_documents
+
+
+class Item(BaseModel):
+    name: str
+
+
+class OrderCard(BaseModel):
+    order_id: str
+    status: Optional[str] = Field(None, alias="order_status")
+    items: List[Item] = []
+    placed: Optional[datetime] = None
+
+
+def test_shape_matches_the_validated_response_model():
+    documents = [
+        {"order_id": "o1", "order_status": "pending", "items": [{"name": "tea"}], "secret": "x",
+         "placed": datetime(2024, 1, 1, 12, tzinfo=timezone.utc)},
+        {"order_id": "o2"},
+    ]
+
+    validated = jsonable_encoder([OrderCard(**document).dict(by_alias=True) for document in documents])
+
+    assert json.loads(dumps(shape_documents(OrderCard, documents))) == validated
+
+
+def test_missing_list_fields_do_not_share_their_default():
+    first, second = shape_documents(OrderCard, [{"order_id": "o1"}, {"order_id": "o2"}])
+    first["items"].append("x")
+
+    assert second["items"] == []
+
+
+def test_firestore_values_are_encoded():
+    reference = DocumentReference("Orders", "o1", client=None)
+    value = {
+        "timestamp": DatetimeWithNanoseconds(2024, 1, 1, 12, 0, 0, 5, tzinfo=timezone.utc),
+        "day": date(2024, 1, 1),
+        "reference": reference,
+        "location": GeoPoint(1.5, 2.5),
+        "bytes": b"\x00\x01",
+        "model": Item(name="tea"),
+        1: "non-string key",
+    }
+
+    assert json.loads(dumps(value)) == {
+        "timestamp": "2024-01-01T12:00:00.000005+00:00",
+        "day": "2024-01-01",
+        "reference": "Orders/o1",
+        "location": {"latitude": 1.5, "longitude": 2.5},
+        "bytes": "AAE=",
+        "model": {"name": "tea"},
+        "1": "non-string key",
+    }
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from firestore_metrics import FirestoreMetricsMiddleware, MetricsRegistry, RequestUsage, instrument_firestore
+
+
+def metrics_app(memory_db, registry):
+    instrument_firestore()
+    app = FastAPI()
+
+    @app.get("/orders/{order_id}")
+    def get_order(order_id: str):
+        orders = memory_db.collection("Orders")
+        batch = memory_db.batch()
+        batch.set(orders.document(f"{order_id}-copy"), {})
+        batch.commit()
+        return [doc.id for doc in orders.limit(3).stream()]
+
+    @app.get("/fail")
+    def fail():
+        raise RuntimeError
+
+    app.add_middleware(FirestoreMetricsMiddleware, registry=registry, debug_headers=True)
+    return app
+
+
+def test_usage_is_attributed_to_the_route_template(memory_db):
+    memory_db.seed("Orders", {f"o{number}": {} for number in range(5)})
+    registry = MetricsRegistry()
+    client = TestClient(metrics_app(memory_db, registry), raise_server_exceptions=False)
+
+    response = client.get("/orders/o1")
+    client.get("/orders/o2")
+    client.get("/fail")
+    client.get("/nowhere")
+
+    assert (response.headers["x-firestore-rpcs"], response.headers["x-firestore-documents-read"],
+            response.headers["x-firestore-documents-written"]) == ("2", "3", "1")
+    rendered = registry.render()
+    assert 'http_requests_total{route="GET /orders/{order_id}"} 2' in rendered
+    assert 'firestore_documents_read_total{route="GET /orders/{order_id}"} 6' in rendered
+    assert 'http_request_errors_total{route="GET /fail"} 1' in rendered
+    assert 'http_requests_total{route="GET unmatched"} 1' in rendered
+    # Calls outside a request are not attributed to any route
+    list(memory_db.collection("Orders").stream())
+    assert registry.render() == rendered
+
+
+def test_latency_histogram_is_cumulative():
+    registry = MetricsRegistry()
+    for latency_ms in (3, 7, 20000):
+        registry.observe("GET /x", 200, latency_ms, RequestUsage())
+
+    rendered = registry.render()
+    assert 'http_request_duration_ms_bucket{route="GET /x",le="5"} 1' in rendered
+    assert 'http_request_duration_ms_bucket{route="GET /x",le="10"} 2' in rendered
+    assert 'http_request_duration_ms_bucket{route="GET /x",le="10000"} 2' in rendered
+    assert 'http_request_duration_ms_bucket{route="GET /x",le="+Inf"} 3' in rendered
+
+
+def test_metrics_endpoint(app_db, client):
+    client.get("/orders/", params={"limit": 1})
+
+    body = client.get("/metrics").text
+    assert 'http_requests_total{route="GET /orders/"}' in body
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from starlette.testclient import TestClient
+
+from http_caching import ConditionalGetMiddleware, cache_control, etag_matches, update_time_etag
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False), ('"a"', True), ('W/"a"', True), ('"b", W/"a"', True), ("*", True), ('"b"', False)])
+def test_etag_matching_is_weak(if_none_match, matches):
+    assert etag_matches(if_none_match, '"a"') is matches
+
+
+def test_update_time_etags_keep_nanoseconds():
+    first = DatetimeWithNanoseconds(2024, 1, 1, tzinfo=timezone.utc, nanosecond=1)
+    second = DatetimeWithNanoseconds(2024, 1, 1, tzinfo=timezone.utc, nanosecond=2)
+
+    assert update_time_etag(first) != update_time_etag(second)
+    assert update_time_etag(datetime(2024, 1, 1, 0, 0, 0, 3, tzinfo=timezone.utc)) == '"65920080.bb8"'
+
+
+def test_middleware_hashes_bodies_of_routes_with_a_policy():
+    app = FastAPI()
+    answer = {"value": 1}
+
+    @app.get("/cached")
+    @cache_control("public, max-age=5")
+    def cached():
+        return answer
+
+    @app.get("/uncached")
+    def uncached():
+        return answer
+
+    @app.get("/missing")
+    @cache_control("public, max-age=5")
+    def missing():
+        raise HTTPException(status_code=404)
+
+    app.add_middleware(ConditionalGetMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/cached")
+    assert response.headers["cache-control"] == "public, max-age=5"
+    not_modified = client.get("/cached", headers={"if-none-match": response.headers["etag"]})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["etag"] == response.headers["etag"]
+    answer["value"] = 2
+    assert client.get("/cached", headers={"if-none-match": response.headers["etag"]}).status_code == 200
+    assert "etag" not in client.get("/uncached").headers
+    assert "etag" not in client.get("/missing").headers
+
+
+def test_orders_are_validated_by_their_update_time(app_db, client):
+    app_db.seed("Orders", {"o1": {"order_id": "o1", "order_status": "pending"}})
+
+    response = client.get("/orders/o1")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert client.get("/orders/o1", headers={"if-none-match": etag}).status_code == 304
+
+    client.put("/orders/o1/status/", params={"new_status": "accepted"})
+    changed = client.get("/orders/o1", headers={"if-none-match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["order_status"] == "accepted"
+    assert changed.headers["etag"] != etag
+
+
+def test_missing_order_is_a_404(app_db, client):
+    response = client.get("/orders/missing")
+
+    assert response.status_code == 404
+    assert "etag" not in response.headers
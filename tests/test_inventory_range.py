@@ -0,0 +1,47 @@
+import pytest
+
+
+def seed_products(app_db):
+    app_db.seed("Products", {f"p{inventory:03d}": {"product_id": f"p{inventory:03d}", "current_inventory": inventory}
+                             for inventory in range(0, 300, 10)})
+
+
+@pytest.mark.parametrize("inventory, inventory_range", [(-1, "Unknown"), (0, "0-100"), (99, "0-100"),
+                                                        (100, "100-200"), (200, "200+"), (10 ** 6, "200+")])
+def test_categorize_inventory(inventory, inventory_range):
+    from main import categorize_inventory
+
+    assert categorize_inventory(inventory) == inventory_range
+
+
+def test_range_is_filtered_in_firestore(app_db, client):
+    seed_products(app_db)
+    app_db.stats.reset()
+
+    products = client.get("/products_inventory_range/", params={"inventory_range": "100-200"}).json()
+
+    assert [product["current_inventory"] for product in products] == list(range(100, 200, 10))
+    assert {product["inventory_range"] for product in products} == {"100-200"}
+    assert app_db.stats.snapshot()["documents_read"] == 10
+
+
+def test_range_pages(app_db, client):
+    seed_products(app_db)
+
+    inventories, page_token = [], None
+    while True:
+        params = {"inventory_range": "200+", "limit": 4, **({"page_token": page_token} if page_token else {})}
+        body = client.get("/products_inventory_range/", params=params).json()
+        inventories += [product["current_inventory"] for product in body["products"]]
+        page_token = body["next_page_token"]
+        if not page_token:
+            break
+
+    assert inventories == list(range(200, 300, 10))
+
+
+def test_unknown_and_empty_ranges(app_db, client):
+    app_db.seed("Products", {"p1": {"product_id": "p1", "current_inventory": 5}})
+
+    assert client.get("/products_inventory_range/", params={"inventory_range": "5-10"}).status_code == 400
+    assert client.get("/products_inventory_range/", params={"inventory_range": "200+"}).status_code == 404
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from firebase_admin import firestore
+from google.api_core import exceptions
+
+from memory_firestore import MemoryFirestore
+
+
+def seed_orders(memory_db):
+    memory_db.seed("Orders", {f"o{number}": {"order_status": "pending" if number % 2 else "delivered",
+                                             "total_amount": number, "customer": {"name": f"c{number}"}}
+                              for number in range(6)})
+
+
+def test_queries_filter_order_limit_and_resume(memory_db):
+    seed_orders(memory_db)
+    query = (memory_db.collection("Orders").where("order_status", "==", "pending")
+             .order_by("total_amount", direction=firestore.Query.DESCENDING))
+
+    assert [doc.id for doc in query.stream()] == ["o5", "o3", "o1"]
+    assert [doc.id for doc in query.limit(1).stream()] == ["o5"]
+    assert [doc.id for doc in query.start_after({"total_amount": 5}).stream()] == ["o3", "o1"]
+    assert [doc.id for doc in query.start_at({"total_amount": 3}).stream()] == ["o3", "o1"]
+    assert [doc.id for doc in memory_db.collection("Orders").where("total_amount", "in", [0, 4]).stream()] == [
+        "o0", "o4"]
+
+
+def test_select_and_get_all_project_fields(memory_db):
+    seed_orders(memory_db)
+    orders = memory_db.collection("Orders")
+
+    assert next(orders.select(["customer.name"]).stream()).to_dict() == {"customer": {"name": "c0"}}
+    documents = list(memory_db.get_all([orders.document("o1"), orders.document("missing")],
+                                       field_paths=["total_amount"]))
+    assert {doc.id: doc.exists for doc in documents} == {"o1": True, "missing": False}
+    assert next(doc for doc in documents if doc.exists).to_dict() == {"total_amount": 1}
+
+
+def test_writes_merge_increment_and_check_preconditions(memory_db):
+    order_ref = memory_db.collection("Orders").document("o1")
+    order_ref.set({"count": 1, "customer": {"name": "a"}})
+    order_ref.set({"count": firestore.Increment(2), "customer": {"phone": "1"}}, merge=True)
+    snapshot = order_ref.get()
+
+    assert snapshot.to_dict() == {"count": 3, "customer": {"name": "a", "phone": "1"}}
+    order_ref.update({"count": 4}, option=memory_db.write_option(last_update_time=snapshot.update_time))
+    with pytest.raises(exceptions.FailedPrecondition):
+        order_ref.update({"count": 5}, option=memory_db.write_option(last_update_time=snapshot.update_time))
+    with pytest.raises(exceptions.NotFound):
+        memory_db.collection("Orders").document("missing").update({"count": 1})
+    with pytest.raises(exceptions.AlreadyExists):
+        order_ref.create({"count": 0})
+    assert order_ref.get().to_dict()["count"] == 4
+
+
+def test_transactions_retry_on_conflicting_writes(memory_db):
+    counter_ref = memory_db.collection("Counters").document("c")
+    counter_ref.set({"value": 0})
+
+    @firestore.transactional
+    def increment(transaction):
+        value = counter_ref.get(transaction=transaction).to_dict()["value"]
+        transaction.update(counter_ref, {"value": value + 1})
+
+    threads = [threading.Thread(target=lambda: [increment(memory_db.transaction(max_attempts=50))
+                                                for _ in range(20)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter_ref.get().to_dict()["value"] == 80
+
+
+def test_stats_count_rpcs_and_documents():
+    memory_db = MemoryFirestore()
+    seed_orders(memory_db)
+    memory_db.stats.reset()
+
+    list(memory_db.collection("Orders").limit(4).stream())
+    batch = memory_db.batch()
+    batch.set(memory_db.collection("Orders").document("o9"), {})
+    batch.delete(memory_db.collection("Orders").document("o0"))
+    batch.commit()
+
+    assert memory_db.stats.snapshot() == {"rpcs": 2, "documents_read": 4, "documents_written": 2}
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    import firestore_client
+
+    monkeypatch.setattr(firestore_client, "FIRESTORE_BACKEND", "sqlite")
+    with pytest.raises(ValueError):
+        firestore_client.create_firestore_client()
+    monkeypatch.setattr(firestore_client, "FIRESTORE_BACKEND", "memory")
+    assert isinstance(firestore_client.create_firestore_client(), MemoryFirestore)
@@ -0,0 +1,43 @@
+def seed_orders(app_db, count=30, riders=3):
+    app_db.seed("riders", {f"r{number}": {"rider_id": f"r{number}", "name": f"Rider {number}"}
+                           for number in range(riders)})
+    app_db.seed("Orders", {f"o{number:02d}": {"order_id": f"o{number:02d}", "user_id": "u",
+                                              "order_status": "accepted", "rider_id": f"r{number % riders}"}
+                           for number in range(count)})
+
+
+def test_batch_reads_orders_and_riders_in_two_calls(app_db, client):
+    seed_orders(app_db)
+    order_ids = ["o05", "missing", "o01", "o05"] + [f"o{number:02d}" for number in range(10, 30)]
+    app_db.stats.reset()
+
+    orders = client.post("/orders/batch", json=order_ids).json()
+
+    assert [order["order_id"] for order in orders][:2] == ["o05", "o01"]
+    assert len(orders) == 22
+    assert orders[0]["rider_name"] == "Rider 2"
+    assert app_db.stats.snapshot()["rpcs"] == 2
+
+
+def test_rider_snapshot_replaces_the_rider_lookup(app_db, client):
+    seed_orders(app_db, count=1, riders=1)
+    app_db.collection("Orders").document("o00").update({"rider_snapshot": {"name": "Snapshot name"}})
+    app_db.stats.reset()
+
+    assert client.post("/orders/batch", json=["o00"]).json()[0]["rider_name"] == "Snapshot name"
+    assert app_db.stats.snapshot()["rpcs"] == 1
+
+
+def test_batch_size_is_limited(app_db, client):
+    assert client.post("/orders/batch", json=[f"o{number}" for number in range(101)]).status_code == 400
+
+
+def test_assign_rider_stores_a_rider_snapshot(app_db, client, monkeypatch):
+    seed_orders(app_db, count=1, riders=2)
+    monkeypatch.setattr("main.RIDER_SNAPSHOT_ENABLED", True)
+
+    response = client.put("/orders/o00/assign_rider", json={"rider_id": "r1", "rider_name": "Rider 1"})
+
+    assert response.status_code == 200
+    order = app_db.collection("Orders").document("o00").get().to_dict()
+    assert (order["rider_id"], order["rider_snapshot"]["name"]) == ("r1", "Rider 1")
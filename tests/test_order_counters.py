@@ -0,0 +1,35 @@
+from collections import Counter
+
+from order_counters import read_status_counts, rebuild_status_counts, record_status_deltas
+
+
+def test_status_counts_follow_creates_and_transitions(app_db, client):
+    order_ids = [client.post("/orders", json={"user_id": "u1"}).json()["order"]["order_id"] for _ in range(3)]
+    client.put(f"/orders/{order_ids[0]}/status/", params={"new_status": "delivered"})
+    # Setting the current status again changes nothing
+    client.put(f"/orders/{order_ids[1]}/status/", params={"new_status": "pending"})
+
+    counts = client.get("/order_status_count").json()
+    assert (counts["pending"], counts["delivered"], counts["cancelled"]) == (2, 1, 0)
+
+
+def test_counts_are_summed_over_shards(memory_db, monkeypatch):
+    monkeypatch.setattr("order_counters.ORDER_STATUS_COUNTER_SHARDS", 4)
+    for _ in range(20):
+        batch = memory_db.batch()
+        record_status_deltas(memory_db, batch, Counter({"pending": 2, "delivered": -1, "cancelled": 0}))
+        batch.commit()
+
+    assert read_status_counts(memory_db) == Counter({"pending": 40, "delivered": -20})
+
+
+def test_rebuild_recounts_orders_into_one_shard(memory_db, monkeypatch):
+    monkeypatch.setattr("order_counters.ORDER_STATUS_COUNTER_SHARDS", 4)
+    for _ in range(10):
+        batch = memory_db.batch()
+        record_status_deltas(memory_db, batch, {"pending": 5})
+        batch.commit()
+    memory_db.seed("Orders", {"o1": {"order_status": "pending"}, "o2": {"order_status": "delivered"}, "o3": {}})
+
+    assert rebuild_status_counts(memory_db) == Counter({"pending": 1, "delivered": 1})
+    assert read_status_counts(memory_db) == Counter({"pending": 1, "delivered": 1})
@@ -0,0 +1,15 @@
+from order_ids import BUCKET_LENGTH, ORDER_ID_LENGTH, generate_legacy_order_id, generate_order_id
+
+
+def test_order_ids_are_spread_over_buckets():
+    order_ids = [generate_order_id() for _ in range(2000)]
+
+    assert all(len(order_id) == ORDER_ID_LENGTH for order_id in order_ids)
+    assert len(set(order_ids)) == len(order_ids)
+    assert len({order_id[:BUCKET_LENGTH] for order_id in order_ids}) > 128
+    # consecutive IDs no longer sort after each other, so creates do not all hit the last key range
+    assert order_ids != sorted(order_ids)
+
+
+def test_legacy_order_ids_are_sequential():
+    assert len(generate_legacy_order_id()) == ORDER_ID_LENGTH - BUCKET_LENGTH
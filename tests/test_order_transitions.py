@@ -0,0 +1,112 @@
+import threading
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException
+
+import order_transitions
+from order_counters import read_status_counts, rebuild_status_counts
+from order_transitions import transition_order
+from order_views import OrderStatusView
+
+
+def seed_order(firestore_db, status="pending"):
+    firestore_db.seed("Orders", {"o1": {"order_id": "o1", "order_status": status, "total_amount": 10}})
+    rebuild_status_counts(firestore_db)
+
+
+def deliver(order):
+    if order["order_status"] != "pending":
+        raise HTTPException(status_code=409, detail="Order is not in progress")
+    return {"order_status": "delivered"}
+
+
+def test_uncontended_transition_is_one_read_and_one_commit(memory_db):
+    seed_order(memory_db)
+    memory_db.stats.reset()
+
+    assert transition_order(memory_db, "o1", deliver)["order_status"] == "delivered"
+    assert memory_db.stats.snapshot()["rpcs"] == 2
+    assert read_status_counts(memory_db) == Counter({"pending": 0, "delivered": 1})
+
+
+def test_concurrent_pickups_have_exactly_one_winner(app_db, client):
+    seed_order(app_db)
+    results = []
+
+    def pickup(rider):
+        results.append(client.put("/rider/pickup/o1", params={"rider_id": f"r{rider}"}).status_code)
+
+    threads = [threading.Thread(target=pickup, args=(rider,)) for rider in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [200] + [409] * 7
+    assert read_status_counts(app_db) == Counter({"pending": 0, "delivered": 1})
+
+
+def test_transition_is_rechecked_after_a_concurrent_change(memory_db):
+    seed_order(memory_db)
+    plans = []
+
+    def cancelled_meanwhile(order):
+        plans.append(order["order_status"])
+        if len(plans) == 1:
+            memory_db.collection("Orders").document("o1").update({"order_status": "cancelled"})
+        return deliver(order)
+
+    with pytest.raises(HTTPException) as error:
+        transition_order(memory_db, "o1", cancelled_meanwhile)
+
+    assert error.value.status_code == 409
+    assert plans == ["pending", "cancelled"]
+
+
+def test_order_that_keeps_changing_gives_up_with_409(memory_db, monkeypatch):
+    seed_order(memory_db)
+    monkeypatch.setattr(order_transitions, "ORDER_TRANSITION_ATTEMPTS", 2)
+
+    def always_raced(order):
+        memory_db.collection("Orders").document("o1").update({"touched": True})
+        return {"rider_id": "r1"}
+
+    with pytest.raises(HTTPException) as error:
+        transition_order(memory_db, "o1", always_raced)
+    assert error.value.status_code == 409
+
+
+def test_missing_and_deleted_orders_are_404(memory_db):
+    seed_order(memory_db)
+    with pytest.raises(HTTPException) as error:
+        transition_order(memory_db, "missing", deliver)
+    assert error.value.status_code == 404
+
+    snapshot = memory_db.collection("Orders").document("o1").get()
+    memory_db.collection("Orders").document("o1").delete()
+    with pytest.raises(HTTPException) as error:
+        transition_order(memory_db, "o1", deliver, (snapshot.to_dict(), snapshot.update_time))
+    assert error.value.status_code == 404
+
+
+def test_first_read_comes_from_the_status_view(memory_db, monkeypatch):
+    seed_order(memory_db)
+    view = OrderStatusView(["pending", "delivered"])
+    view.start(memory_db)
+    monkeypatch.setattr(order_transitions, "order_status_view", view)
+    memory_db.stats.reset()
+
+    transition_order(memory_db, "o1", deliver)
+    view.stop()
+
+    assert memory_db.stats.snapshot()["rpcs"] == 1
+
+
+def test_assigning_a_rider_to_a_delivered_order_is_refused(app_db, client):
+    seed_order(app_db, status="delivered")
+
+    response = client.put("/orders/o1/assign_rider", json={"rider_id": "r1", "rider_name": "Rider 1"})
+
+    assert response.status_code == 409
+    assert "rider_id" not in app_db.collection("Orders").document("o1").get().to_dict()
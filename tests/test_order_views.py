@@ -0,0 +1,110 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from order_views import OrderStatusView
+from pagination import DOCUMENT_ID, encode_page_token
+
+NOW = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def page_all(view, status, limit):
+    order_ids, page_token = [], None
+    while True:
+        orders, page_token = view.page(status, limit, page_token)
+        order_ids += [order["order_id"] for order in orders]
+        if not page_token:
+            return order_ids
+
+
+@pytest.fixture
+def view(memory_db):
+    order_status_view = OrderStatusView(["pending"])
+    order_status_view.start(memory_db)
+    yield order_status_view
+    order_status_view.stop()
+
+
+def test_view_requires_statuses(memory_db):
+    with pytest.raises(ValueError):
+        OrderStatusView([]).start(memory_db)
+
+
+def test_view_only_covers_its_statuses(memory_db, view):
+    memory_db.seed("Orders", {"o1": {"order_id": "o1", "order_status": "delivered", "modified_timestamp": NOW}})
+
+    assert view.covers("pending")
+    assert not view.covers("delivered")
+    assert view.get("o1") is None
+
+
+def test_mixed_timestamp_types_are_ordered_like_firestore(memory_db, view):
+    orders = {
+        "aware": NOW,
+        "naive": (NOW + timedelta(minutes=1)).replace(tzinfo=None),
+        "text": "2024-01-01",
+        "number": 5,
+        "flag": True,
+        "list": [1],
+        "missing": None,
+    }
+    # A listener failing on the mixed types would leave the later orders out of the view
+    for order_id, modified_timestamp in orders.items():
+        memory_db.collection("Orders").document(order_id).set(
+            {"order_id": order_id, "order_status": "pending", "modified_timestamp": modified_timestamp})
+
+    assert page_all(view, "pending", 2) == ["text", "naive", "aware", "number", "flag"]
+    assert page_all(view, "pending", None) == ["text", "naive", "aware", "number", "flag"]
+
+
+def test_page_tokens_continue_after_the_cursor(memory_db, view):
+    memory_db.seed("Orders", {f"o{number}": {"order_id": f"o{number}", "order_status": "pending",
+                                             "modified_timestamp": NOW + timedelta(minutes=number)}
+                              for number in range(5)})
+    token = encode_page_token({"modified_timestamp": NOW + timedelta(minutes=3), DOCUMENT_ID: "o3"})
+
+    orders, _ = view.page("pending", 10, token)
+
+    assert [order["order_id"] for order in orders] == ["o2", "o1", "o0"]
+    for bad_token in (encode_page_token({"modified_timestamp": [1], DOCUMENT_ID: "o3"}),
+                      encode_page_token({"modified_timestamp": NOW, DOCUMENT_ID: 3})):
+        with pytest.raises(HTTPException) as error:
+            view.page("pending", 10, bad_token)
+        assert error.value.status_code == 400
+
+
+def test_status_and_rider_changes_are_pushed_to_subscribers(memory_db, view, monkeypatch):
+    monkeypatch.setattr("order_views.SSE_HEARTBEAT_SECONDS", 0.05)
+    memory_db.seed("Orders", {"o1": {"order_id": "o1", "order_status": "pending", "modified_timestamp": NOW}})
+    order_ref = memory_db.collection("Orders").document("o1")
+
+    async def subscribe():
+        events = view.events(["pending"])
+        assert await events.__anext__() == b"retry: 3000\n\n"
+        received = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        # Not visible to dashboards, so not pushed
+        await asyncio.get_running_loop().run_in_executor(None, order_ref.update, {"total_amount": 5})
+        await asyncio.get_running_loop().run_in_executor(None, order_ref.update, {"rider_id": "r1"})
+        rider_event = await received
+        heartbeat = await events.__anext__()
+        await asyncio.get_running_loop().run_in_executor(None, order_ref.update, {"order_status": "delivered"})
+        status_event = await events.__anext__()
+        await events.aclose()
+        return rider_event, heartbeat, status_event
+
+    rider_event, heartbeat, status_event = asyncio.run(subscribe())
+
+    assert rider_event.startswith(b"event: order\ndata: ")
+    assert json.loads(rider_event.split(b"data: ")[1])["rider_id"] == "r1"
+    assert heartbeat == b": keepalive\n\n"
+    # Leaving a subscribed status is still pushed, with the previous status
+    assert json.loads(status_event.split(b"data: ")[1])["previous_status"] == "pending"
+    assert not view._subscribers
+
+
+def test_events_route_needs_the_views(app_db, client):
+    assert client.get("/orders/events").status_code == 404
@@ -0,0 +1,84 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from google.api_core import exceptions
+
+from order_counters import read_status_counts
+from order_write_batcher import OrderWriteBatcher
+
+
+def create(app_db, order_id, status="pending"):
+    order_ref = app_db.collection("Orders").document(order_id)
+    return lambda batch: batch.create(order_ref, {"order_id": order_id, "order_status": status})
+
+
+def test_concurrent_writes_share_one_commit(app_db):
+    batcher = OrderWriteBatcher(max_delay_ms=20)
+    app_db.stats.reset()
+
+    async def submit_all():
+        await asyncio.gather(*(batcher.submit(create(app_db, f"o{number}"), status_deltas={"pending": 1})
+                               for number in range(20)))
+
+    asyncio.run(submit_all())
+
+    assert len(list(app_db.collection("Orders").stream())) == 20
+    assert read_status_counts(app_db) == Counter({"pending": 20})
+    assert "order_write_batches_total 1\n" in batcher.render()
+
+
+def test_rejected_write_only_fails_its_caller(app_db):
+    app_db.seed("Orders", {"taken": {"order_id": "taken"}})
+    batcher = OrderWriteBatcher(max_delay_ms=20)
+    order_ids = ["o1", "taken", "o2"]
+
+    async def submit_all():
+        return await asyncio.gather(*(batcher.submit(create(app_db, order_id), status_deltas={"pending": 1})
+                                      for order_id in order_ids), return_exceptions=True)
+
+    results = asyncio.run(submit_all())
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], exceptions.AlreadyExists)
+    assert read_status_counts(app_db) == Counter({"pending": 2})
+    assert "order_write_batch_fallbacks_total 1\n" in batcher.render()
+
+
+def test_batches_stay_within_the_write_limit(app_db):
+    batcher = OrderWriteBatcher(max_delay_ms=1000, max_writes=10)
+
+    async def submit_all():
+        await asyncio.wait_for(asyncio.gather(*(batcher.submit(create(app_db, f"o{number}"),
+                                                               status_deltas={"pending": 1})
+                                                for number in range(27))), timeout=0.5)
+
+    asyncio.run(submit_all())
+
+    # 9 orders plus the counter write per commit, without waiting for the delay
+    assert "order_write_batches_total 3\n" in batcher.render()
+    assert len(list(app_db.collection("Orders").stream())) == 27
+
+
+def test_close_commits_pending_writes(app_db):
+    batcher = OrderWriteBatcher(max_delay_ms=60_000)
+
+    async def submit_and_close():
+        submitted = asyncio.ensure_future(batcher.submit(create(app_db, "o1")))
+        await asyncio.sleep(0)
+        await batcher.close()
+        await submitted
+
+    asyncio.run(submit_and_close())
+
+    assert app_db.collection("Orders").document("o1").get().exists
+
+
+@pytest.mark.parametrize("batching", [False, True])
+def test_created_orders_are_counted_either_way(app_db, client, monkeypatch, batching):
+    monkeypatch.setattr("main.ORDER_WRITE_BATCHING", batching)
+
+    for _ in range(3):
+        assert client.post("/orders", json={"user_id": "u1"}).status_code == 200
+
+    assert client.get("/order_status_count").json()["pending"] == 3
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import DOCUMENT_ID, decode_page_token, encode_page_token, parse_fields
+
+
+def raw_token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_token_round_trip():
+    values = {"modified_timestamp": datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc), DOCUMENT_ID: "o1"}
+
+    assert decode_page_token(encode_page_token(values), ["modified_timestamp", DOCUMENT_ID]) == values
+
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    raw_token(["o1"]),
+    raw_token({"modified_timestamp": {"ts": "yesterday"}, DOCUMENT_ID: "o1"}),
+    raw_token({"modified_timestamp": {"ts": 5}, DOCUMENT_ID: "o1"}),
+    raw_token({DOCUMENT_ID: "o1"}),
+    raw_token({"modified_timestamp": {"ts": "2024-01-01T00:00:00"}, DOCUMENT_ID: "o1", "user_id": "u1"}),
+])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        decode_page_token(token, ["modified_timestamp", DOCUMENT_ID])
+    assert error.value.status_code == 400
+
+
+def test_parse_fields():
+    assert parse_fields("a, b.c,a") == ["a", "b.c"]
+    with pytest.raises(HTTPException):
+        parse_fields("a,b-c")
+
+
+def test_orders_are_paged_once_each_in_id_order(app_db, client):
+    app_db.seed("Orders", {f"o{number:02d}": {"order_id": f"o{number:02d}", "user_id": "u"} for number in range(7)})
+
+    seen, page_token = [], None
+    while True:
+        params = {"limit": 3, "fields": "user_id"}
+        if page_token:
+            params["page_token"] = page_token
+        body = client.get("/orders/", params=params).json()
+        assert all(order == {"user_id": "u"} for order in body["orders"])
+        seen.append(len(body["orders"]))
+        page_token = body["next_page_token"]
+        if not page_token:
+            break
+    assert seen == [3, 3, 1]
+
+
+def test_bad_page_token_is_a_client_error(app_db, client):
+    token = raw_token({DOCUMENT_ID: "o1", "order_status": "pending"})
+
+    assert client.get("/orders/", params={"page_token": token}).status_code == 400
+    assert client.get("/orders/", params={"page_token": raw_token({DOCUMENT_ID: {"ts": "x"}})}).status_code == 400
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from product_search import ProductSearchIndex
+
+WORDS = ["tea", "team", "green", "greek", "milk", "mild", "masala", "chai", "choco", "chocolate", "dark", "darjeeling",
+         "butter", "buttermilk", "bread", "brown"]
+
+
+def names(products):
+    return [product["product_name"] for product in products]
+
+
+def brute_force_ranking(index, query):
+    # Every product matching all query terms with its score, best first, straight from the postings
+    terms = list(dict.fromkeys(query.split()))
+    per_term = [index._scores(index._matches(term, as_prefix=position == len(terms) - 1 and query[-1].isalnum()))
+                for position, term in enumerate(terms)]
+    slots = set(per_term[0]).intersection(*per_term[1:])
+    scores = {slot: round(sum(term_scores[slot] for term_scores in per_term), 9) for slot in slots}
+    ranked = sorted(slots, key=lambda slot: (-scores[slot], index._name_lengths[slot], slot))
+    return [(index._products[slot]["product_id"], scores[slot]) for slot in ranked]
+
+
+def test_exact_match_outranks_prefix_match():
+    index = ProductSearchIndex({"product_name": 3})
+    index.load([{"product_id": name, "product_name": name} for name in ("team", "green tea", "tea")])
+
+    assert names(index.search("tea", 2)) == ["tea", "green tea"]
+    assert names(index.search("tea", 10)) == ["tea", "green tea", "team"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_matches_brute_force_ranking(seed):
+    rng = random.Random(seed)
+    index = ProductSearchIndex({"product_name": 3, "sub_category_name": 2, "category_name": 1})
+    index.load({"product_id": f"p{number}",
+                "product_name": " ".join(rng.sample(WORDS, rng.randint(1, 4))),
+                "sub_category_name": rng.choice(WORDS),
+                "category_name": rng.choice(WORDS)} for number in range(300))
+
+    for query in ["tea", "te", "mil", "choc dark", "green te", "butter ", "chocolat", "dark chai m"]:
+        expected = brute_force_ranking(index, query)
+        scores = dict(expected)
+        for limit in (1, 3, 10, 50):
+            results = index.search(query, limit)
+            # Equal scores may tie-break differently by float rounding, so compare the scores in order
+            assert [scores[product["product_id"]] for product in results] == \
+                [score for _, score in expected[:limit]], (query, limit)
+
+
+def test_typo_matches_within_one_edit():
+    index = ProductSearchIndex({"product_name": 1})
+    index.load([{"product_id": "1", "product_name": "Chocolate Bar"}, {"product_id": "2", "product_name": "Milk"}])
+
+    assert names(index.search("choclate ")) == ["Chocolate Bar"]
+    assert index.search("chcolatte ") == []
+
+
+def test_sub_category_filter_and_updates():
+    index = ProductSearchIndex({"product_name": 1})
+    index.load([{"product_id": "1", "product_name": "Green Tea", "sub_category_id": "tea"},
+                {"product_id": "2", "product_name": "Green Chilli", "sub_category_id": "vegetables"}])
+
+    assert names(index.search("green", sub_category_id="vegetables")) == ["Green Chilli"]
+    index.load([{"product_id": "2", "product_name": "Red Chilli", "sub_category_id": "vegetables"}])
+    assert names(index.search("green")) == ["Green Tea"]
+    assert names(index.search("red")) == ["Red Chilli"]
+
+
+def test_snapshot_listener_follows_product_writes(memory_db):
+    memory_db.seed("Products", {"1": {"product_id": "1", "product_name": "Basmati Rice"}})
+    index = ProductSearchIndex({"product_name": 1})
+    index.start(memory_db)
+    try:
+        assert index.ready
+        assert names(index.search("basm")) == ["Basmati Rice"]
+        memory_db.collection("Products").document("1").delete()
+        assert index.search("basm") == []
+    finally:
+        index.stop()
@@ -0,0 +1,53 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from order_views import OrderStatusView
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def seed_orders(app_db, count=5):
+    app_db.seed("Orders", {f"o{number}": {
+        "order_id": f"o{number}", "user_id": "u1", "order_status": "pending", "total_amount": number,
+        "customer": {"name": f"c{number}", "phone": "1"}, "modified_timestamp": NOW + timedelta(minutes=number),
+    } for number in range(count)})
+
+
+def test_user_orders_only_return_the_requested_fields(app_db, client):
+    seed_orders(app_db)
+
+    orders = client.get("/orders/user/u1/", params={"fields": "order_id,customer.name"}).json()
+
+    assert orders[0] == {"order_id": "o0", "customer": {"name": "c0"}}
+    assert client.get("/orders/user/u1/", params={"fields": "order_id,"}).status_code == 200
+    assert client.get("/orders/user/u1/", params={"fields": "order id"}).status_code == 400
+    assert client.get("/orders/user/u1/", params={"fields": ","}).status_code == 400
+
+
+def test_streamed_orders_are_projected(app_db, client):
+    seed_orders(app_db)
+
+    response = client.get("/orders/", params={"stream": "true", "fields": "total_amount"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"total_amount": n} for n in range(5)]
+
+
+@pytest.mark.parametrize("params", [{"fields": "order_id,customer.phone"},
+                                    {"fields": "order_id", "limit": 2}])
+def test_status_view_and_firestore_serve_the_same_projection(app_db, client, monkeypatch, params):
+    seed_orders(app_db)
+    params = {"status": "pending", **params}
+    from_firestore = client.get("/get_orders_by_status", params=params).json()
+
+    view = OrderStatusView(["pending"])
+    view.start(app_db)
+    monkeypatch.setattr("main.order_status_view", view)
+    app_db.stats.reset()
+    from_view = client.get("/get_orders_by_status", params=params).json()
+    view.stop()
+
+    assert from_view == from_firestore
+    assert app_db.stats.snapshot()["documents_read"] == 0
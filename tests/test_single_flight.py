@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def counting_fetch(calls, result="value", delay=0.01, error=None):
+    async def fetch():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result
+
+    return fetch
+
+
+def test_concurrent_reads_share_one_fetch():
+    flight, calls = SingleFlight(), []
+
+    async def read_all():
+        return await asyncio.gather(*(flight.do("orders", "o1", counting_fetch(calls)) for _ in range(10)))
+
+    assert asyncio.run(read_all()) == ["value"] * 10
+    assert calls == ["value"]
+    assert "single_flight_coalesced_total 9\n" in flight.render()
+
+
+def test_failures_are_shared_but_not_remembered():
+    flight, calls = SingleFlight(ttl_ms=60_000), []
+
+    async def read_all():
+        results = await asyncio.gather(*(flight.do("orders", "o1", counting_fetch(calls, error=KeyError("o1")))
+                                         for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, KeyError) for result in results)
+        return await flight.do("orders", "o1", counting_fetch(calls, "retried"))
+
+    assert asyncio.run(read_all()) == "retried"
+    assert len(calls) == 2
+
+
+def test_reads_after_a_write_do_not_join_an_older_fetch():
+    flight, calls = SingleFlight(ttl_ms=60_000), []
+
+    async def read_write_read():
+        before = asyncio.ensure_future(flight.do("orders", "o1", counting_fetch(calls, "old")))
+        await asyncio.sleep(0)
+        flight.forget("orders", "o1")
+        after = await flight.do("orders", "o1", counting_fetch(calls, "new"))
+        # The recent result is the newer one, the forgotten fetch is not kept
+        return await before, after, await flight.do("orders", "o1", counting_fetch(calls, "unused"))
+
+    assert asyncio.run(read_write_read()) == ("old", "new", "new")
+    assert calls == ["old", "new"]
+
+
+def test_ttl_results_expire(monkeypatch):
+    flight, calls = SingleFlight(ttl_ms=50), []
+    now = [100.0]
+    monkeypatch.setattr("single_flight.time.monotonic", lambda: now[0])
+
+    async def read():
+        return await flight.do("orders", "o1", counting_fetch(calls, delay=0))
+
+    asyncio.run(read())
+    asyncio.run(read())
+    now[0] += 0.1
+    asyncio.run(read())
+
+    assert len(calls) == 2
+    assert "single_flight_ttl_hits_total 1\n" in flight.render()
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    flight, calls = SingleFlight(), []
+
+    async def cancel_one():
+        first = asyncio.ensure_future(flight.do("orders", "o1", counting_fetch(calls, delay=0.05)))
+        second = asyncio.ensure_future(flight.do("orders", "o1", counting_fetch(calls)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(cancel_one()) == "value"
+    assert len(calls) == 1
+
+
+def test_order_reads_see_their_own_writes(app_db, client, monkeypatch):
+    monkeypatch.setattr("main.single_flight", SingleFlight(ttl_ms=60_000))
+    app_db.seed("Orders", {"o1": {"order_id": "o1", "order_status": "pending"}})
+
+    assert client.get("/orders/o1").json()["order_status"] == "pending"
+    client.put("/orders/o1/status/", params={"new_status": "accepted"})
+    assert client.get("/orders/o1").json()["order_status"] == "accepted"
@@ -0,0 +1,44 @@
+def seed_intake(app_db, products=1):
+    app_db.seed("Products", {f"p{number}": {"product_id": f"p{number}", "sub_category_id": "dairy",
+                                            "current_inventory": 5} for number in range(products)})
+    app_db.seed("ProductRequest", {"r1": {"request_id": "r1", "product_unit_request": 10, "status": "pending"}})
+
+
+def test_bulk_intake_increments_stock_and_records_lines(app_db, client):
+    seed_intake(app_db)
+    lines = [{"product_id": "p0", "request_id": "r1", "add_new_stock_units": 4},
+             {"product_id": "p0", "request_id": "r1", "add_new_stock_units": 6}]
+
+    assert client.post("/add-new-stock-updation/bulk", json=lines).status_code == 200
+    assert app_db.collection("Products").document("p0").get().to_dict()["current_inventory"] == 15
+    assert app_db.collection("ProductRequest").document("r1").get().to_dict()["status"] == "matched"
+    assert len(list(app_db.collection("AddNewStock").stream())) == 2
+
+
+def test_intake_invalidates_cached_products(app_db, client):
+    seed_intake(app_db)
+    params = {"fields": "product_id,current_inventory"}
+    assert client.get("/get_products_based/dairy", params=params).json()[0]["current_inventory"] == 5
+
+    client.post("/add-new-stock-updation", json={"product_id": "p0", "request_id": "r1", "add_new_stock_units": 3})
+    assert client.get("/get_products_based/dairy", params=params).json()[0]["current_inventory"] == 8
+
+
+def test_unknown_request_id_is_rejected(app_db, client):
+    seed_intake(app_db)
+    response = client.post("/add-new-stock-updation/bulk",
+                           json=[{"product_id": "p0", "request_id": "missing", "add_new_stock_units": 1}])
+
+    assert response.status_code == 404
+    assert app_db.collection("Products").document("p0").get().to_dict()["current_inventory"] == 5
+
+
+def test_note_larger_than_one_batch_is_rejected_without_writing(app_db, client):
+    seed_intake(app_db, products=300)
+    lines = [{"product_id": f"p{number}", "request_id": "r1", "add_new_stock_units": 1} for number in range(300)]
+
+    response = client.post("/add-new-stock-updation/bulk", json=lines)
+
+    assert response.status_code == 400
+    assert all(doc.to_dict()["current_inventory"] == 5 for doc in app_db.collection("Products").stream())
+    assert list(app_db.collection("AddNewStock").stream()) == []